@@ -1,4 +1,6 @@
 import argparse
+import hashlib
+import json
 import os
 from os.path import join
 import tarfile
@@ -23,19 +25,52 @@
 parser.add_argument('--reinstall-packages', dest='reinstall_packages', action='store_true', help='If given, all python packages configured inside the configuration file will be reinstalled.')
 parser.add_argument('--reinstall-blender', dest='reinstall_blender', action='store_true', help='If given, the blender installation is deleted and reinstalled. Is ignored, if a "custom_blender_path" is configured in the configuration file.')
 parser.add_argument('--batch_process', help='Renders a batch of house-cam combinations, by reading a file containing the combinations on each line, where each line is the standard placeholder arguments for rendering a single scene separated by spaces. The value of this option is the path to the index file, no need to add placeholder arguments.')
+parser.add_argument('--memory-ceiling', dest='memory_ceiling', type=int, default=None, help='Only used with --batch_process. If the resident memory of blender exceeds this value (in MB) after a scene, all unused data is purged. If that does not suffice, blender is restarted before the next scene.')
+parser.add_argument('--batch-workers', dest='batch_workers', type=int, default=None, help='Only used with --batch_process. If given, this number of blender processes render the lines of the index file at the same time, each one pulls the next line from a shared queue as soon as it is done.')
+parser.add_argument('--batch-gpus', dest='batch_gpus', default=None, help='Only used with --batch-workers. A comma separated list of gpu indices, e.g. "0,1", the workers are distributed over these gpus.')
+parser.add_argument('--batch-threads', dest='batch_threads', type=int, default=None, help='Only used with --batch-workers. The number of cpu threads each blender worker may use.')
+parser.add_argument('--batch-retries', dest='batch_retries', type=int, default=1, help='Only used with --batch-workers. How often a failed line of the index file is retried.')
+parser.add_argument('--serve', dest='serve', type=int, default=None, help='Starts a persistent blender worker, which listens on the given port on localhost for jobs submitted via --submit. Blender and the python packages are only set up once using the given configuration, every job then only runs its pipeline.')
+parser.add_argument('--submit', dest='submit', type=int, default=None, help='Runs the given configuration and arguments on the persistent blender worker listening on the given port, instead of starting a new blender. The exit code is the one of the job.')
+parser.add_argument('--stop-server', dest='stop_server', type=int, default=None, help='Stops the persistent blender worker listening on the given port after its current job.')
+parser.add_argument('--resume', dest='resume', action='store_true', help='Makes a single run resumable: the temporary directory is derived from the config and its arguments and is kept if the run fails. If it contains a checkpoint of a previous failed run (see the "checkpoint" option of each module), the scene is restored from it and all modules up to the checkpoint are skipped. Not supported for batch processing.')
+parser.add_argument('--profile-dir', dest='profile_dir', default=None, help='If given, the wall time, cpu time, render time, peak memory and datablock counts of every module are written as json lines and as chrome trace into this directory after each pipeline run. Use scripts/aggregate_profiles.py to merge many runs. Has no effect with --submit, in that case set it when starting the server.')
+parser.add_argument('--mesh-cache-dir', dest='mesh_cache_dir', default=None, help='If given, every imported .obj and .ply file is stored once as .blend file in this directory and appended from there in all later runs instead of parsing it again. The directory can be shared between many jobs. Has no effect with --submit, in that case set it when starting the server.')
 parser.add_argument('--temp-dir', dest='temp_dir', default=None, help="The path to a directory where all temporary output files should be stored. If it doesn't exist, it is created automatically. Type: string. Default: \"/dev/shm\" or \"/tmp/\" depending on which is available.")
 parser.add_argument('--keep-temp-dir', dest='keep_temp_dir', action='store_true', help="If set, the temporary directory is not removed in the end.")
 parser.add_argument('-h', '--help', dest='help', action='store_true', help='Show this help message and exit.')
 args = parser.parse_args()
 
+if args.stop_server is not None:
+    from src.utility.JobServer import JobServerClient
+    client = JobServerClient(args.stop_server)
+    client.shutdown()
+    client.close()
+    exit(0)
+
 if args.config is None:
     print(parser.format_help())
     exit(0)
 
+if args.profile_dir is not None:
+    # The Profiler inside of blender reads the directory from this environment variable (see src/utility/Profiler.py)
+    os.environ["BLENDER_PROC_PROFILE_DIR"] = os.path.abspath(args.profile_dir)
+if args.mesh_cache_dir is not None:
+    # The MeshImportCache inside of blender reads the directory from this environment variable
+    os.environ["BLENDER_PROC_MESH_CACHE_DIR"] = os.path.abspath(args.mesh_cache_dir)
+
 config_parser = ConfigParser()
-config = config_parser.parse(args.config, args.args, args.help, skip_arg_placeholders=(args.batch_process != None)) # Don't parse placeholder args in batch mode.
+config = config_parser.parse(args.config, args.args, args.help, skip_arg_placeholders=(args.batch_process != None or args.serve is not None)) # Don't parse placeholder args in batch or server mode.
 setup_config = config["setup"]
 
+if args.submit is not None:
+    # Only submit the job to the running blender worker, blender and all packages were already set up by it
+    from src.utility.JobServer import JobServerClient
+    client = JobServerClient(args.submit)
+    exit_code = client.submit(args.config, args.args)
+    client.close()
+    exit(exit_code)
+
 # If blender should be downloaded automatically
 if "custom_blender_path" not in setup_config:
     # Determine path where blender should be installed
@@ -184,52 +219,70 @@ def __call__(self, block_num, block_size, total_size):
         pre_python_package_path = os.path.join(blender_path, major_version, "python", "lib", "site-packages")
     else:
         raise Exception("This system is not supported yet: {}".format(platform))
-    subprocess.Popen([python_bin, "-m", "ensurepip"], env=dict(os.environ, PYTHONPATH="")).wait()
-    # Make sure pip is up-to-date
-    subprocess.Popen([python_bin, "-m", "pip", "install", "--upgrade", "pip"], env=dict(os.environ, PYTHONPATH="")).wait()
-
-    # Make sure to not install into the default site-packages path, as this would overwrite already pre-installed packages
-    if not os.path.exists(packages_path):
-        os.mkdir(packages_path)
-    used_env = dict(os.environ, PYTHONPATH=packages_path + ":" + pre_python_package_path)
-    # Collect already installed packages by calling pip list (outputs: <package name>==<version>)
-    installed_packages = subprocess.check_output([python_bin, "-m", "pip", "list", "--format=freeze",
-                                                "--path={}".format(pre_python_package_path)])
-    installed_packages += subprocess.check_output([python_bin, "-m", "pip", "list", "--format=freeze",
-                                               "--path={}".format(packages_path)])
-
-    # Split up strings into two lists (names and versions)
-    installed_packages_name, installed_packages_versions = zip(*[str(line).lower().split('==') for line in installed_packages.splitlines()])
-    installed_packages_name = [ele[2:] if ele.startswith("b'") else ele for ele in installed_packages_name]
-    installed_packages_versions = [ele[:-1] if ele.endswith("'") else ele for ele in installed_packages_versions]
-
-    # Install all packages
-    for package in required_packages:
-        # Extract name and target version
-        if "==" in package:
-            package_name, package_version = package.lower().split('==')
-        else:
-            package_name, package_version = package.lower(), None
+    # The manifest stores a hash of the requested packages and the used blender, if both did not change since the
+    # last successful installation, the whole installation phase can be skipped
+    packages_manifest_path = os.path.join(os.path.dirname(packages_path), "custom-python-packages-manifest.json")
+    packages_hash = hashlib.sha256(json.dumps({"packages": required_packages, "blender_path": os.path.abspath(blender_path)}).encode()).hexdigest()
+    installed_packages_hash = None
+    if os.path.exists(packages_path) and os.path.exists(packages_manifest_path):
+        with open(packages_manifest_path, "r") as f:
+            installed_packages_hash = json.load(f).get("hash")
+
+    if installed_packages_hash == packages_hash and not args.reinstall_packages:
+        print("All required python packages are already installed, skipping the installation")
+    else:
+        subprocess.Popen([python_bin, "-m", "ensurepip"], env=dict(os.environ, PYTHONPATH="")).wait()
+        # Make sure pip is up-to-date
+        subprocess.Popen([python_bin, "-m", "pip", "install", "--upgrade", "pip"], env=dict(os.environ, PYTHONPATH="")).wait()
+
+        # Make sure to not install into the default site-packages path, as this would overwrite already pre-installed packages
+        if not os.path.exists(packages_path):
+            os.mkdir(packages_path)
+        used_env = dict(os.environ, PYTHONPATH=packages_path + ":" + pre_python_package_path)
+        # Collect already installed packages by calling pip list (outputs: <package name>==<version>)
+        installed_packages = subprocess.check_output([python_bin, "-m", "pip", "list", "--format=freeze",
+                                                    "--path={}".format(pre_python_package_path)])
+        installed_packages += subprocess.check_output([python_bin, "-m", "pip", "list", "--format=freeze",
+                                                   "--path={}".format(packages_path)])
+
+        # Split up strings into two lists (names and versions)
+        installed_packages_name, installed_packages_versions = zip(*[str(line).lower().split('==') for line in installed_packages.splitlines()])
+        installed_packages_name = [ele[2:] if ele.startswith("b'") else ele for ele in installed_packages_name]
+        installed_packages_versions = [ele[:-1] if ele.endswith("'") else ele for ele in installed_packages_versions]
+
+        # Install all packages
+        installation_failed = False
+        for package in required_packages:
+            # Extract name and target version
+            if "==" in package:
+                package_name, package_version = package.lower().split('==')
+            else:
+                package_name, package_version = package.lower(), None
 
-        # Check if package is installed
-        already_installed = package_name in installed_packages_name
+            # Check if package is installed
+            already_installed = package_name in installed_packages_name
 
-        # If version check is necessary
-        if package_version is not None and already_installed:
-            # Check if the correct version is installed
-            already_installed = (package_version == installed_packages_versions[installed_packages_name.index(package_name)])
-            print("{}:{} was installed: {}".format(package_name, package_version, already_installed))
+            # If version check is necessary
+            if package_version is not None and already_installed:
+                # Check if the correct version is installed
+                already_installed = (package_version == installed_packages_versions[installed_packages_name.index(package_name)])
+                print("{}:{} was installed: {}".format(package_name, package_version, already_installed))
 
-            # If there is already a different version installed
-            if not already_installed:
-                # Remove the old version (We have to do this manually, as we are using --target with pip install. There old version are not removed)
-                subprocess.Popen([python_bin, "-m", "pip", "uninstall", package_name, "-y"],
-                                 env=dict(os.environ, PYTHONPATH=packages_path)).wait()
+                # If there is already a different version installed
+                if not already_installed:
+                    # Remove the old version (We have to do this manually, as we are using --target with pip install. There old version are not removed)
+                    subprocess.Popen([python_bin, "-m", "pip", "uninstall", package_name, "-y"],
+                                     env=dict(os.environ, PYTHONPATH=packages_path)).wait()
 
-        # Only install if its not already installed (pip would check this itself, but at first downloads the requested package which of course always takes a while)
-        if not already_installed or args.reinstall_packages:
-            subprocess.Popen([python_bin, "-m", "pip", "install", package, "--target", packages_path,
-                              "--upgrade"], env=dict(os.environ, PYTHONPATH=packages_path)).wait()
+            # Only install if its not already installed (pip would check this itself, but at first downloads the requested package which of course always takes a while)
+            if not already_installed or args.reinstall_packages:
+                installation_failed |= subprocess.Popen([python_bin, "-m", "pip", "install", package, "--target", packages_path,
+                                                         "--upgrade"], env=dict(os.environ, PYTHONPATH=packages_path)).wait() != 0
+
+        # Remember the installed packages, s.t. the next start can skip the installation
+        if not installation_failed:
+            with open(packages_manifest_path, "w") as f:
+                json.dump({"hash": packages_hash, "packages": required_packages}, f)
 
 # Run script
 if platform == "linux" or platform == "linux2":
@@ -255,36 +308,85 @@ def __call__(self, block_num, block_size, total_size):
         temp_dir = os.getenv("TEMP")
 else:
     temp_dir = args.temp_dir
-# Generate unique directory name in temp dir
-temp_dir = os.path.join(temp_dir, "blender_proc_" + str(uuid.uuid4().hex))
+resume = args.resume and not args.batch_process and args.serve is None
+if resume:
+    # The same config and arguments always use the same temp dir, s.t. a rerun finds the checkpoints of a failed run
+    run_hash = hashlib.sha256(json.dumps([os.path.abspath(args.config)] + args.args).encode()).hexdigest()[:16]
+    temp_dir = os.path.join(temp_dir, "blender_proc_resume_" + run_hash)
+else:
+    # Generate unique directory name in temp dir
+    temp_dir = os.path.join(temp_dir, "blender_proc_" + str(uuid.uuid4().hex))
 # Create the temp dir
 print("Using temporary directory: " + temp_dir)
 if not os.path.exists(temp_dir):
     os.makedirs(temp_dir)
 
 
-if not args.batch_process:
-    p = subprocess.Popen([blender_run_path, "--background", "--python-exit-code", "2", "--python", path_src_run, "--", args.config, temp_dir] + args.args,
-                         env=dict(os.environ, PYTHONPATH=""), cwd=repo_root_directory)
-else:  # Pass the index file path containing placeholder args for all input combinations (cam, house, output path)
-    p = subprocess.Popen([blender_run_path, "--background", "--python-exit-code", "2", "--python", path_src_run, "--",  args.config, temp_dir, "--batch-process", args.batch_process],
-                         env=dict(os.environ, PYTHONPATH=""), cwd=repo_root_directory)
-
-
-def clean_temp_dir():
+def clean_temp_dir(failed=False):
     # If temp dir should not be kept and temp dir still exists => remove it
-    if not args.keep_temp_dir and os.path.exists(temp_dir):
+    if resume and failed:
+        print("Keeping the temporary directory, rerun with --resume to continue from the last checkpoint")
+    elif not args.keep_temp_dir and os.path.exists(temp_dir):
         print("Cleaning temporary directory")
         shutil.rmtree(temp_dir)
 
+if args.batch_process and args.batch_workers is not None:
+    from src.utility.BatchScheduler import BatchScheduler
+
+    with open(os.path.join(repo_root_directory, args.batch_process), "r") as f:
+        lines = f.readlines()
+
+    def build_worker_command(worker_temp_dir, queue_address):
+        command = [blender_run_path, "--background", "--python-exit-code", "2", "--python", path_src_run, "--", args.config, worker_temp_dir, "--batch-queue", queue_address]
+        if args.memory_ceiling is not None:
+            command += ["--memory-ceiling", str(args.memory_ceiling)]
+        return command
+
+    gpus = args.batch_gpus.split(",") if args.batch_gpus else None
+    scheduler = BatchScheduler(lines, args.batch_workers, args.batch_retries, gpus, args.batch_threads)
+
+    # Listen for SIGTERM signal, so we can properly cleanup and and terminate all workers
+    def handle_sigterm(signum, frame):
+        scheduler.terminate()
+        clean_temp_dir()
+    signal.signal(signal.SIGTERM, handle_sigterm)
+
+    try:
+        returncode = scheduler.run(build_worker_command, temp_dir, env=dict(os.environ, PYTHONPATH=""), cwd=repo_root_directory)
+    except KeyboardInterrupt:
+        scheduler.terminate()
+        returncode = 1
+
+    clean_temp_dir()
+    exit(returncode)
+
+if not args.batch_process:
+    blender_command = [blender_run_path, "--background", "--python-exit-code", "2", "--python", path_src_run, "--", args.config, temp_dir] + args.args
+else:  # Pass the index file path containing placeholder args for all input combinations (cam, house, output path)
+    blender_command = [blender_run_path, "--background", "--python-exit-code", "2", "--python", path_src_run, "--",  args.config, temp_dir, "--batch-process", args.batch_process]
+    if args.memory_ceiling is not None:
+        blender_command += ["--memory-ceiling", str(args.memory_ceiling)]
+if args.serve is not None:
+    blender_command += ["--serve", str(args.serve)]
+if resume:
+    blender_command += ["--resume"]
+p = subprocess.Popen(blender_command, env=dict(os.environ, PYTHONPATH=""), cwd=repo_root_directory)
+
+
 # Listen for SIGTERM signal, so we can properly cleanup and and terminate the child process
 def handle_sigterm(signum, frame):
-    clean_temp_dir()
+    clean_temp_dir(failed=True)
     p.terminate()
 signal.signal(signal.SIGTERM, handle_sigterm)
 
 try:
     p.wait()
+    # In batch mode, blender exits with code 3 if it has to be restarted as the memory ceiling was exceeded,
+    # the new blender process continues with the next scene of the batch
+    while args.batch_process and p.returncode == 3:
+        print("Restarting blender, as the memory ceiling was exceeded")
+        p = subprocess.Popen(blender_command, env=dict(os.environ, PYTHONPATH=""), cwd=repo_root_directory)
+        p.wait()
 except KeyboardInterrupt:
     try:
         p.terminate()
@@ -293,6 +395,6 @@ def handle_sigterm(signum, frame):
     p.wait()
 
 # Clean up
-clean_temp_dir()
+clean_temp_dir(failed=p.returncode != 0)
 
 exit(p.returncode)
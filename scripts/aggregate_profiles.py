@@ -0,0 +1,99 @@
+""" Merges the profiles of many pipeline runs into percentile tables.
+
+The profiles are written by the Profiler, if the run.py is called with --profile-dir. Every run writes one .jsonl
+file, which contains one line per profiled block (the pipeline, each module and each render call). This script
+collects all of them and prints for each block name the percentiles of all recorded values.
+
+Input parameters:
+    * paths: one or several profile directories or .jsonl files.
+    * -c, --category: only aggregate blocks of this category, e.g. "module". By default all categories are used.
+    * -p, --percentiles: comma separated list of percentiles, by default "50,90,99".
+    * -o, --output: if given, the table is additionally written as .csv file to this path.
+"""
+
+import argparse
+import csv
+import glob
+import json
+import os
+from collections import defaultdict
+
+parser = argparse.ArgumentParser()
+parser.add_argument('paths', nargs='+', help='profile directories or .jsonl files written via --profile-dir')
+parser.add_argument('-c', '--category', dest="category", type=str, default=None, help='only aggregate blocks of this category, e.g. module')
+parser.add_argument('-p', '--percentiles', dest="percentiles", type=str, default="50,90,99", help='comma separated list of percentiles')
+parser.add_argument('-o', '--output', dest="output", type=str, default=None, help='path of an optional .csv file')
+args = parser.parse_args()
+
+# the recorded values, which are aggregated, and the factor to convert them into the printed unit
+values_to_aggregate = [("wall_time", "s", 1.0), ("cpu_time", "s", 1.0), ("render_time", "s", 1.0),
+                       ("post_processing_time", "s", 1.0), ("peak_rss", "MB", 1.0 / 1024 ** 2)]
+percentiles = [float(p) for p in args.percentiles.split(",")]
+
+
+def percentile(sorted_values, p):
+    """ Computes the p-th percentile of the given values by linear interpolation.
+
+    :param sorted_values: The values in ascending order.
+    :param p: The percentile in [0, 100].
+    :return: The percentile.
+    """
+    position = (len(sorted_values) - 1) * p / 100.0
+    lower = int(position)
+    upper = min(lower + 1, len(sorted_values) - 1)
+    return sorted_values[lower] + (sorted_values[upper] - sorted_values[lower]) * (position - lower)
+
+
+# collect all profile files
+profile_files = []
+for path in args.paths:
+    if os.path.isdir(path):
+        profile_files.extend(sorted(glob.glob(os.path.join(path, "*.jsonl"))))
+    else:
+        profile_files.append(path)
+
+# group all records by their block
+records_per_block = defaultdict(list)
+runs = set()
+for profile_file in profile_files:
+    with open(profile_file, "r") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            if args.category is not None and record["category"] != args.category:
+                continue
+            runs.add(record["run_id"])
+            records_per_block[(record["category"], record["name"])].append(record)
+
+header = ["category", "name", "count"]
+for value_name, unit, _ in values_to_aggregate:
+    header += ["{} p{:g} [{}]".format(value_name, p, unit) for p in percentiles]
+rows = []
+for (category, name), records in sorted(records_per_block.items(),
+                                        key=lambda item: -sum(record["wall_time"] for record in item[1])):
+    row = [category, name, len(records)]
+    for value_name, _, factor in values_to_aggregate:
+        values = sorted(record[value_name] * factor for record in records)
+        row += [percentile(values, p) for p in percentiles]
+    rows.append(row)
+
+print("Aggregated {} blocks of {} runs from {} files".format(sum(len(r) for r in records_per_block.values()),
+                                                            len(runs), len(profile_files)))
+for value_name, unit, _ in values_to_aggregate:
+    print()
+    print("{} [{}]".format(value_name, unit))
+    columns = ["p{:g}".format(p) for p in percentiles]
+    print("{:<10} {:<40} {:>7} ".format("category", "name", "count") + " ".join("{:>10}".format(c) for c in columns))
+    offset = 3 + [v[0] for v in values_to_aggregate].index(value_name) * len(percentiles)
+    for row in rows:
+        print("{:<10} {:<40} {:>7} ".format(row[0], row[1], row[2]) +
+              " ".join("{:>10.3f}".format(value) for value in row[offset:offset + len(percentiles)]))
+
+if args.output is not None:
+    with open(args.output, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(header)
+        writer.writerows(rows)
+    print()
+    print("Table written to " + args.output)
@@ -0,0 +1,26 @@
+""" Merges coco annotation shards into one coco annotations .json file.
+
+When the CocoAnnotationsWriter is used with "write_shards", every run only writes its own annotations into a shard
+inside coco_data/shards and updates the small coco_annotations_index.json. This script reads the index and all
+shards of a coco_data/ folder and writes the combined annotations as one regular coco annotations file.
+
+Input parameters:
+    * -p, --path: path to the coco_data/ folder containing the coco_annotations_index.json.
+    * -o, --output: path of the merged .json file, by default coco_annotations.json inside the given folder.
+"""
+
+import argparse
+import os
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+from src.utility.CocoUtility import CocoUtility
+
+parser = argparse.ArgumentParser()
+parser.add_argument('-p', '--path', dest="path", type=str, help='path to a coco_data/ folder with coco annotation shards')
+parser.add_argument('-o', '--output', dest="output", type=str, default=None, help='path of the merged coco annotations .json file')
+
+args = parser.parse_args()
+
+output_path = CocoUtility.compact_coco_shards(args.path, args.output)
+print("Merged coco annotations written to " + output_path)
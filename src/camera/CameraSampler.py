@@ -2,7 +2,6 @@
 import sys
 from collections import defaultdict
 
-import bmesh
 import bpy
 import mathutils
 import numpy as np
@@ -10,8 +9,10 @@
 from src.camera.CameraInterface import CameraInterface
 from src.utility.CameraUtility import CameraUtility
 from src.utility.BlenderUtility import get_all_mesh_objects
+from src.utility.BvhRegistry import BvhRegistry
 from src.utility.Config import Config
 from src.utility.ItemCollection import ItemCollection
+from src.utility.RayCastUtility import RayCastUtility
 
 
 class CameraSampler(CameraInterface):
@@ -153,6 +154,7 @@ def _sample_cam_poses(self, config):
 
         # Set global parameters
         self._is_bvh_tree_inited = False
+        self._last_obstacle_check_hits = None
         self.sqrt_number_of_rays = config.get_int("sqrt_number_of_rays", 10)
         self.max_tries = config.get_int("max_tries", 100000000)
         self.proximity_checks = config.get_raw_dict("proximity_checks", {})
@@ -279,22 +281,21 @@ def _init_bvh_tree(self):
 
         Such a tree is later used for fast raycasting.
         """
-        # Create bmesh which will contain the meshes of all objects
-        bm = bmesh.new()
-        # Go through all mesh objects
-        for obj in get_all_mesh_objects():
-            if obj in self.excluded_objects_in_proximity_check:
-                continue
-            # Add object mesh to bmesh (the newly added vertices will be automatically selected)
-            bm.from_mesh(obj.data)
-            # Apply world matrix to all selected vertices
-            bm.transform(obj.matrix_world, filter={"SELECT"})
-            # Deselect all vertices
-            for v in bm.verts:
-                v.select = False
-
-        # Create tree from bmesh
-        self.bvh_tree = mathutils.bvhtree.BVHTree.FromBMesh(bm)
+        # Remember which objects are part of the tree, to map hits back to their objects
+        self._bvh_objects = [obj for obj in get_all_mesh_objects()
+                             if obj not in self.excluded_objects_in_proximity_check]
+        # The tree is only rebuilt, if one of the objects has changed since the last camera sampler run
+        self.bvh_tree, self._bvh_face_offsets = BvhRegistry.get_merged_tree(self._bvh_objects)
+
+        # The hits of the obstacle check can only be reused for the coverage score, if the tree contains exactly the
+        # geometry the evaluated scene is ray casted against: the tree is built from the undeformed meshes, so this is
+        # only the case if all objects are visible and have no modifiers or shape keys and there is no other geometry.
+        self._reuse_hits_for_coverage = len(self.excluded_objects_in_proximity_check) == 0 and \
+            all(obj.visible_get() and len(obj.modifiers) == 0 and obj.data.shape_keys is None
+                for obj in self._bvh_objects) and \
+            not any(obj.type in ["CURVE", "SURFACE", "META", "FONT"] and obj.visible_get()
+                    for obj in bpy.context.scene.objects)
+        self._ray_order = RayCastUtility.get_coarse_to_fine_order(self.sqrt_number_of_rays)
 
         self._is_bvh_tree_inited = True
 
@@ -311,20 +312,6 @@ def _perform_obstacle_in_view_check(self, cam, cam2world_matrix):
         if not self._is_bvh_tree_inited:
             raise Exception("The bvh tree should be inited before this function is called!")
 
-        # Get position of the corners of the near plane
-        frame = cam.view_frame(scene=bpy.context.scene)
-        # Bring to world space
-        frame = [cam2world_matrix @ v for v in frame]
-
-        # Compute vectors along both sides of the plane
-        vec_x = frame[1] - frame[0]
-        vec_y = frame[3] - frame[0]
-
-        sum = 0.0
-        sum_sq = 0.0
-
-        range_distance = sys.float_info.max
-
         # Input validation
         for operator in self.proximity_checks:
             if (operator == "min" or operator == "max") and not isinstance(self.proximity_checks[operator], numbers.Number):
@@ -337,6 +324,7 @@ def _perform_obstacle_in_view_check(self, cam, cam2world_matrix):
                         or not isinstance(self.proximity_checks[operator]["max"], numbers.Number):
                     raise Exception("Threshold must be a number in perform_obstacle_in_view_check")
 
+        range_distance = sys.float_info.max
 
         # If there are no average or variance operators, we can decrease the ray range distance for efficiency
         if "avg" not in self.proximity_checks and "var" not in self.proximity_checks:
@@ -346,59 +334,79 @@ def _perform_obstacle_in_view_check(self, cam, cam2world_matrix):
             else:
                 range_distance = self.proximity_checks["min"]
 
-        no_range_distance = False
-        if "no_background" in self.proximity_checks and self.proximity_checks["no_background"]:
-            # when no background is on, it can not be combined with a reduced range distance
-            no_range_distance = True
+        no_background = "no_background" in self.proximity_checks and self.proximity_checks["no_background"]
+        # when no background is on, it can not be combined with a reduced range distance
+        if no_background:
+            range_distance = None
 
-        # Go in discrete grid-like steps over plane
+        # Generate the whole ray bundle through the near plane at once
         position = cam2world_matrix.to_translation()
-        for x in range(0, self.sqrt_number_of_rays):
-            for y in range(0, self.sqrt_number_of_rays):
-                # Compute current point on plane
-                end = frame[0] + vec_x * x / float(self.sqrt_number_of_rays - 1) \
-                      + vec_y * y / float(self.sqrt_number_of_rays - 1)
-                # Send ray from the camera position through the current point on the plane
-                if no_range_distance:
-                    _, _, _, dist = self.bvh_tree.ray_cast(position, end - position)
-                else:
-                    _, _, _, dist = self.bvh_tree.ray_cast(position, end - position, range_distance)
-
-                # Check if something was hit and how far it is away
-                if dist is not None:
-                    if "min" in self.proximity_checks and dist <= self.proximity_checks["min"]:
-                        return False
-                    if "max" in self.proximity_checks and dist >= self.proximity_checks["max"]:
-                        return False
-                    if "avg" in self.proximity_checks:
-                        sum += dist
-                    if "var" in self.proximity_checks:
-                        if not "avg" in self.proximity_checks:
-                            sum += dist
-                        sum_sq += dist * dist
-                elif "no_background" in self.proximity_checks and self.proximity_checks["no_background"]:
+        directions = RayCastUtility.get_frustum_ray_directions(cam, cam2world_matrix, self.sqrt_number_of_rays)
+        distances = np.zeros(len(directions))
+        face_indices = np.full(len(directions), -1, dtype=np.int64)
+
+        # The rays are cast coarse to fine, s.t. big obstacles are found after a few rays
+        for ray_index, _, _, face_index, dist in RayCastUtility.cast_rays(self.bvh_tree, position, directions,
+                                                                         range_distance, self._ray_order):
+            # Check if something was hit and how far it is away
+            if dist is not None:
+                if "min" in self.proximity_checks and dist <= self.proximity_checks["min"]:
+                    return False
+                if "max" in self.proximity_checks and dist >= self.proximity_checks["max"]:
                     return False
+                distances[ray_index] = dist
+                face_indices[ray_index] = face_index
+            elif no_background:
+                return False
+
+        # All rays have been cast, so their hits can be reused by the coverage score of this pose
+        self._last_obstacle_check_hits = (cam2world_matrix.copy(), directions, face_indices, range_distance)
 
+        # Rays which did not hit anything count with a distance of zero
+        avg = np.mean(distances)
         if "avg" in self.proximity_checks:
-            avg = sum / (self.sqrt_number_of_rays * self.sqrt_number_of_rays)
             # Check that the average distance is not within the accepted interval
             if avg >= self.proximity_checks["avg"]["max"] or avg <= self.proximity_checks["avg"]["min"]:
                 return False
 
         if "var" in self.proximity_checks:
-            if not "avg" in self.proximity_checks:
-                avg = sum / (self.sqrt_number_of_rays * self.sqrt_number_of_rays)
-            sq_avg = avg * avg
-
-            avg_sq = sum_sq / (self.sqrt_number_of_rays * self.sqrt_number_of_rays)
-
-            var = avg_sq - sq_avg
+            var = np.mean(distances * distances) - avg * avg
             # Check that the variance value of the distance is not within the accepted interval
             if var >= self.proximity_checks["var"]["max"] or var <= self.proximity_checks["var"]["min"]:
                 return False
 
         return True
 
+    def _cast_coverage_rays(self, cam, cam2world_matrix):
+        """ Determines the object hit by each ray of the grid through the near plane of the camera.
+
+        If the obstacle check already cast all rays of this pose against a bvh tree containing the same geometry as the
+        evaluated scene, its hits are reused and only the rays, which did not hit anything inside the reduced range
+        distance, are cast again. Both ways return the same objects.
+
+        :param cam: The camera whose view frame is used (only FOV is relevant, pose of cam is ignored).
+        :param cam2world_matrix: The world matrix which describes the camera orientation to check.
+        :return: For each ray the hit object or None, if nothing was hit.
+        """
+        position = cam2world_matrix.to_translation()
+        if self._last_obstacle_check_hits is not None and self._reuse_hits_for_coverage \
+                and self._last_obstacle_check_hits[0] == cam2world_matrix:
+            _, directions, face_indices, range_distance = self._last_obstacle_check_hits
+            face_indices = face_indices.copy()
+            if range_distance is not None:
+                missed_rays = np.flatnonzero(face_indices < 0)
+                for ray_index, _, _, face_index, _ in RayCastUtility.cast_rays(self.bvh_tree, position, directions,
+                                                                               order=missed_rays):
+                    if face_index is not None:
+                        face_indices[ray_index] = face_index
+            # Map the face indices of the merged tree back to their objects
+            object_indices = np.searchsorted(self._bvh_face_offsets, face_indices, side="right") - 1
+            return [self._bvh_objects[object_index] if face_index >= 0 else None
+                    for face_index, object_index in zip(face_indices, object_indices)]
+
+        directions = RayCastUtility.get_frustum_ray_directions(cam, cam2world_matrix, self.sqrt_number_of_rays)
+        return RayCastUtility.cast_rays_in_scene(position, directions)
+
     def _scene_coverage_score(self, cam, cam2world_matrix):
         """ Evaluate the interestingness/coverage of the scene.
 
@@ -417,48 +425,31 @@ def _scene_coverage_score(self, cam, cam2world_matrix):
         score = 0.0
         objects_hit = defaultdict(int)
 
-        # Get position of the corners of the near plane
-        frame = cam.view_frame(scene=bpy.context.scene)
-        # Bring to world space
-        frame = [cam2world_matrix @ v for v in frame]
-
-        # Compute vectors along both sides of the plane
-        vec_x = frame[1] - frame[0]
-        vec_y = frame[3] - frame[0]
-
-        # Go in discrete grid-like steps over plane
-        position = cam2world_matrix.to_translation()
-        for x in range(0, self.sqrt_number_of_rays):
-            for y in range(0, self.sqrt_number_of_rays):
-                # Compute current point on plane
-                end = frame[0] + vec_x * x / float(self.sqrt_number_of_rays - 1) + vec_y * y / float(self.sqrt_number_of_rays - 1)
-                # Send ray from the camera position through the current point on the plane
-                hit, _, _, _, hit_object, _ = bpy.context.scene.ray_cast(bpy.context.view_layer.depsgraph, position, end - position)
-
-                if hit:
-                    is_of_special_dataset = "is_suncg" in hit_object or "is_3d_front" in hit_object
-                    if is_of_special_dataset and "type" in hit_object and hit_object["type"] == "Object":
-                        # calculate the score based on the type of the object,
-                        # wall, floor and ceiling objects have 0 score
-                        if "coarse_grained_class" in hit_object:
-                            object_class = hit_object["coarse_grained_class"]
-                            objects_hit[object_class] += 1
-                            if object_class in self.special_objects:
-                                score += self.special_objects_weight
-                            else:
-                                score += 1
-                        else:
-                            score += 1
-                    elif "category_id" in hit_object:
-                        object_class = hit_object["category_id"]
+        for hit_object in self._cast_coverage_rays(cam, cam2world_matrix):
+            if hit_object is not None:
+                is_of_special_dataset = "is_suncg" in hit_object or "is_3d_front" in hit_object
+                if is_of_special_dataset and "type" in hit_object and hit_object["type"] == "Object":
+                    # calculate the score based on the type of the object,
+                    # wall, floor and ceiling objects have 0 score
+                    if "coarse_grained_class" in hit_object:
+                        object_class = hit_object["coarse_grained_class"]
+                        objects_hit[object_class] += 1
                         if object_class in self.special_objects:
                             score += self.special_objects_weight
                         else:
                             score += 1
-                        objects_hit[object_class] += 1
                     else:
-                        objects_hit[hit_object] += 1
                         score += 1
+                elif "category_id" in hit_object:
+                    object_class = hit_object["category_id"]
+                    if object_class in self.special_objects:
+                        score += self.special_objects_weight
+                    else:
+                        score += 1
+                    objects_hit[object_class] += 1
+                else:
+                    objects_hit[hit_object] += 1
+                    score += 1
         # For a scene with three different objects, the starting variance is 1.0, increases/decreases by '1/3' for
         # each object more/less, excluding floor, ceiling and walls
         scene_variance = len(objects_hit) / 3.0
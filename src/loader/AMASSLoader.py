@@ -1,14 +1,14 @@
-import glob
 import json
 import os
 import random
 from datetime import datetime
 import numpy as np
-import shutil
 
+import bpy
 import mathutils
 
 from src.loader.LoaderInterface import LoaderInterface
+from src.utility.BvhRegistry import BvhRegistry
 from src.utility.Utility import Utility
 from src.utility.LabelIdMapping import LabelIdMapping
 
@@ -68,6 +68,10 @@ class AMASSLoader(LoaderInterface):
        "subject_id", "Type of motion from which the pose should be extracted, this is dataset dependent parameter. Type: int." 
        "sequence_id", "Sequence id in the dataset, sequences are the motion recorded to represent certain action. Type: int." 
        "frame_id", "Frame id in a selected motion sequence. Type: int."
+       "update_existing_body", "If true and the body created by a previous run of an AMASSLoader with the same gender "
+                               "still exists, the vertices of its mesh are updated in place instead of creating a "
+                               "new object. Useful if many poses of a sequence are generated one after another. "
+                               "Type: bool. Default: False."
     """
 
     # dictionary contains mocap dataset name and path to its sub folder within the main dataset, dictionary will
@@ -78,6 +82,12 @@ class AMASSLoader(LoaderInterface):
     human_skin_colors = ['2D221E', '3C2E28', '4B3932', '5A453C', '695046', '785C50', '87675A', '967264', 'A57E6E',
                          'B48A78', 'C39582', 'D2A18C', 'E1AC96', 'F0B8A0', 'FFC3AA', 'FFCEB4', 'FFDABE', 'FFE5C8']
 
+    # maps the data path and the gender to the loaded parametric body model and its faces
+    _body_models = {}
+
+    # maps the gender to the last body object created for it
+    _body_objects = {}
+
     def __init__(self, config):
         LoaderInterface.__init__(self, config)
         self._data_path = Utility.resolve_path(
@@ -154,8 +164,14 @@ def _get_pose_parameters(self):
     def _load_parametric_body_model(self):
         """ loads the parametric model that is used to generate the mesh object
 
+        The model is only loaded once per gender and then kept in memory.
+
         :return:  parametric model. Type: tuple.
         """
+        model_key = (self._data_path, self._used_body_model_gender)
+        if model_key in AMASSLoader._body_models:
+            return AMASSLoader._body_models[model_key]
+
         bm_path = os.path.join(self._data_path, 'body_models', 'smplh',
                                self._used_body_model_gender, 'model.npz')  # body model
         dmpl_path = os.path.join(self._data_path, 'body_models', 'dmpls',
@@ -168,6 +184,7 @@ def _load_parametric_body_model(self):
         body_model = BodyModel(bm_path=bm_path, num_betas=self._num_betas, num_dmpls=self._num_dmpls, path_dmpl=dmpl_path).to(
             comp_device)
         faces = body_model.f.detach().cpu().numpy()
+        AMASSLoader._body_models[model_key] = (body_model, faces)
         return body_model, faces
 
     @staticmethod
@@ -190,26 +207,61 @@ def _get_supported_mocap_datasets(taxonomy_file_path, data_path):
             raise Exception(
                 "The taxonomy file could not be found: {}".format(taxonomy_file_path))
 
-    def _write_body_mesh_to_obj_file(self, body_represenstation, faces):
-        """ write the generated pose as obj file on the desk.
+    @staticmethod
+    def _convert_to_blender_coordinates(vertices):
+        """ Converts the vertices of the body model from its y-up into the z-up coordinate system of blender.
+
+        This is the same conversion the .obj importer does with its default axis settings.
+
+        :param vertices: The vertices of the body model. Type: numpy.array of shape [N, 3].
+        :return: The flattened vertex coordinates in blender. Type: numpy.array of type float32.
+        """
+        return (vertices[:, [0, 2, 1]] * np.array([1, -1, 1])).astype(np.float32).reshape(-1)
+
+    def _create_body_mesh_object(self, vertices, faces):
+        """ Creates a new object whose mesh is built directly from the generated vertices and faces.
 
-        :param body_represenstation: parameters generated from the BodyModel model which represent the obj pose and shape. Type: torch.Tensor
-        :param faces: face parametric model which is used to generate the face mesh. Type: numpy.array
-        :return: path to generated obj file. Type: string.
+        :param vertices: The vertices of the posed body. Type: numpy.array of shape [N, 3].
+        :param faces: The triangles of the body model. Type: numpy.array of shape [M, 3].
+        :return: The new object. Type: bpy.types.Object.
         """
-        # Get a temporary for the generated mesh
-        temp_dir = Utility.get_temporary_directory(self.config)
-        # Generate temp object with name = timestamp
+        # name the object after the time it was generated
         starttime = datetime.now().replace(microsecond=0)
-        obj_file_name = datetime.strftime(starttime, '%Y%m%d_%H%M') + ".obj"
-        # Write to an .obj file
-        outmesh_path = os.path.join(temp_dir, obj_file_name)
-        with open(outmesh_path, 'w') as fp:
-            fp.write("".join(['v {:f} {:f} {:f}\n'.format(v[0], v[1], v[2])
-                              for v in body_represenstation.v[0].detach().cpu().numpy()]))
-            fp.write("".join(['f {} {} {}\n'.format(
-                f[0], f[1], f[2]) for f in faces + 1]))
-        return outmesh_path
+        name = datetime.strftime(starttime, '%Y%m%d_%H%M')
+
+        mesh = bpy.data.meshes.new(name)
+        mesh.vertices.add(len(vertices))
+        mesh.vertices.foreach_set("co", AMASSLoader._convert_to_blender_coordinates(vertices))
+        # each face is a triangle, so it uses three loops
+        mesh.loops.add(faces.size)
+        mesh.loops.foreach_set("vertex_index", faces.astype(np.int32).reshape(-1))
+        mesh.polygons.add(len(faces))
+        mesh.polygons.foreach_set("loop_start", np.arange(0, faces.size, 3, dtype=np.int32))
+        mesh.polygons.foreach_set("loop_total", np.full(len(faces), 3, dtype=np.int32))
+        # set the shading mode explicitly to smooth
+        mesh.polygons.foreach_set("use_smooth", np.ones(len(faces), dtype=bool))
+        mesh.update(calc_edges=True)
+
+        obj = bpy.data.objects.new(name, mesh)
+        bpy.context.collection.objects.link(obj)
+        return obj
+
+    def _get_existing_body_object(self, number_of_vertices):
+        """ Returns the body object created by a previous run for the same gender, if it can be updated in place.
+
+        :param number_of_vertices: The number of vertices of the new body. Type: int.
+        :return: The object or None. Type: bpy.types.Object.
+        """
+        obj = AMASSLoader._body_objects.get(self._used_body_model_gender)
+        if obj is None:
+            return None
+        try:
+            # the object might have been removed in the meantime
+            if obj.name in bpy.context.scene.objects and len(obj.data.vertices) == number_of_vertices:
+                return obj
+        except ReferenceError:
+            pass
+        return None
 
     def run(self):
         """
@@ -221,16 +273,25 @@ def run(self):
         body_model, faces = self._load_parametric_body_model()
         # Generate Body representations using SMPL model
         body_repr = body_model(pose_body=pose_body, betas=betas)
-        # Generate .obj file represents the selected pose
-        generated_obj = self._write_body_mesh_to_obj_file(body_repr, faces)
-
-        loaded_obj = Utility.import_objects(generated_obj)
+        vertices = body_repr.v[0].detach().cpu().numpy()
+
+        obj = None
+        if self.config.get_bool("update_existing_body", False):
+            obj = self._get_existing_body_object(len(vertices))
+        if obj is not None:
+            # only the vertex coordinates change between poses, the topology stays the same
+            obj.data.vertices.foreach_set("co", AMASSLoader._convert_to_blender_coordinates(vertices))
+            obj.data.update()
+            BvhRegistry.mark_geometry_changed(obj)
+        else:
+            # build the mesh directly from the generated arrays
+            obj = self._create_body_mesh_object(vertices, faces)
+            AMASSLoader._body_objects[self._used_body_model_gender] = obj
+        loaded_obj = [obj]
 
         self._correct_materials(loaded_obj)
 
         self._set_properties(loaded_obj)
-        # set the shading mode explicitly to smooth
-        self.change_shading_mode(loaded_obj, "SMOOTH")
 
         if "void" in LabelIdMapping.label_id_map:  # Check if using an id map
             for obj in loaded_obj:
@@ -1,6 +1,9 @@
+import hashlib
 import math
 import os
+import shutil
 import sys
+import uuid
 from random import choice
 
 import bpy
@@ -44,8 +47,18 @@ class BopLoader(LoaderInterface):
        "obj_ids", "List of object ids to load. Type: list. Default: [] (all objects from the given BOP dataset if "
                   "scene_id is not specified)."
        "model_type", "Optionally, specify type of BOP model. Type: string. Default: "". Available: [reconst, cad or eval]."
+       "model_cache_dir", "If given, the models of ycbv and ruapc are stored in this directory after their ply header "
+                          "was converted, s.t. the conversion is only done once per model. The directory can be "
+                          "shared between many jobs. Type: string. Default: The temporary directory of this run."
+       "link_duplicated_meshes", "If true, duplicated instances of a model share its mesh data instead of copying "
+                                 "it. This saves memory and time, but the mesh data can then not be changed per "
+                                 "instance, e.g. object.PhysicsPositioning can not apply the scale of such objects. "
+                                 "Type: bool. Default: False."
     """
 
+    # maps the model path to the first object loaded from it, is shared between all BopLoader modules
+    _loaded_models = {}
+
     def __init__(self, config):
         LoaderInterface.__init__(self, config)
         sys_paths = self.config.get_list("sys_paths")
@@ -72,6 +85,12 @@ def __init__(self, config):
         self.scale = 0.001 if self.config.get_bool("mm2m", False) else 1
         self.bop_dataset_name = os.path.basename(self.bop_dataset_path)
         self._has_external_texture = self.bop_dataset_name in ["ycbv", "ruapc"]
+        if self.config.has_param("model_cache_dir"):
+            self._model_cache_dir = Utility.resolve_path(self.config.get_string("model_cache_dir"))
+        else:
+            # without a cache dir the converted models are only kept during this run
+            self._model_cache_dir = self._temp_dir
+        self._link_duplicated_meshes = self.config.get_bool("link_duplicated_meshes", False)
 
     def run(self):
         """ Load BOP data """
@@ -253,11 +272,60 @@ def _get_loaded_obj(self, model_path):
         :param model_path: Model path of the new object. Type: string.
         :return: Object if found, else return None. Type: bpy.types.Object/None.
         """
-        for loaded_obj in bpy.context.scene.objects:
-            if 'model_path' in loaded_obj and loaded_obj['model_path'] == model_path:
-                return loaded_obj
+        loaded_obj = BopLoader._loaded_models.get(model_path)
+        if loaded_obj is not None:
+            try:
+                # the object might have been removed in the meantime
+                if loaded_obj.name in bpy.context.scene.objects and loaded_obj.get('model_path') == model_path:
+                    return loaded_obj
+            except ReferenceError:
+                pass
+            del BopLoader._loaded_models[model_path]
         return
 
+    def _get_converted_model_path(self, model_path):
+        """ Returns the path to a copy of the given ply model, whose header can be read by the blender ply importer.
+
+        The ycbv and ruapc models name their uv coordinates texture_u and texture_v, instead of s and t. The converted
+        copy is stored in the model_cache_dir, so each model is only converted once per run or, if a model_cache_dir
+        is given, only once at all. The copy has the same file name as the original model, so the imported object
+        gets the same name.
+
+        :param model_path: The path to the original ply model. Type: string.
+        :return: The path to the converted model and the path to its texture file. Type: string, string.
+        """
+        with open(model_path, "rb") as file:
+            header_lines = []
+            while not header_lines or header_lines[-1].strip() != b"end_header":
+                line = file.readline()
+                if not line:
+                    raise Exception("The ply file has no valid header: {}".format(model_path))
+                header_lines.append(line)
+            header = b"".join(header_lines).decode("ascii")
+
+            texture_pos = header.find("comment TextureFile ") + len("comment TextureFile ")
+            texture_file_name = header[texture_pos:header.find("\n", texture_pos)].strip()
+            texture_file_path = os.path.join(os.path.dirname(model_path), texture_file_name)
+
+            # the model path, its size and its modification time identify the converted model
+            model_stat = os.stat(model_path)
+            model_key = "{}|{}|{}".format(os.path.abspath(model_path), model_stat.st_size, model_stat.st_mtime_ns)
+            # the key is used as directory, s.t. the converted model keeps the file name and therefore its object name
+            converted_model_path = os.path.join(self._model_cache_dir, self.bop_dataset_name,
+                                                hashlib.sha1(model_key.encode()).hexdigest(),
+                                                os.path.basename(model_path))
+            if not os.path.exists(converted_model_path):
+                header = header.replace("property float texture_u", "property float s")
+                header = header.replace("property float texture_v", "property float t")
+                os.makedirs(os.path.dirname(converted_model_path), exist_ok=True)
+                # another job might convert the same model at the same time, so it is only moved in place when done
+                tmp_ply_file = "{}.{}.tmp".format(converted_model_path, uuid.uuid4().hex)
+                with open(tmp_ply_file, "wb") as converted_file:
+                    # only the header is changed, the (maybe binary) body is copied as it is
+                    converted_file.write(header.encode("ascii"))
+                    shutil.copyfileobj(file, converted_file)
+                os.replace(tmp_ply_file, converted_model_path)
+        return converted_model_path, texture_file_path
 
     def _load_mesh(self, obj_id, model_p, scale=1):
         """ Loads BOP mesh and sets category_id.
@@ -270,6 +338,7 @@ def _load_mesh(self, obj_id, model_p, scale=1):
         model_path = model_p['model_tpath'].format(**{'obj_id': obj_id})
 
         texture_file_path = ""  # only needed for ycbv objects
+        is_linked_duplicate = False
 
         # Gets the objects if it is already loaded         
         cur_obj = self._get_loaded_obj(model_path)
@@ -277,34 +346,26 @@ def _load_mesh(self, obj_id, model_p, scale=1):
         if cur_obj is None:
             if self._has_external_texture:
                 if os.path.exists(model_path):
-                    new_file_ply_content = ""
-                    with open(model_path, "r") as file:
-                        new_file_ply_content = file.read()
-                        texture_pos = new_file_ply_content.find("comment TextureFile ") + len("comment TextureFile ")
-                        texture_file_name = new_file_ply_content[texture_pos:
-                                                                 new_file_ply_content.find("\n", texture_pos)]
-                        texture_file_path = os.path.join(os.path.dirname(model_path), texture_file_name)
-                        new_file_ply_content = new_file_ply_content.replace("property float texture_u",
-                                                                            "property float s")
-                        new_file_ply_content = new_file_ply_content.replace("property float texture_v",
-                                                                            "property float t")
-                    model_name = os.path.basename(model_path)
-                    tmp_ply_file = os.path.join(self._temp_dir, model_name)
-                    with open(tmp_ply_file, "w") as file:
-                        file.write(new_file_ply_content)
-                    bpy.ops.import_mesh.ply(filepath=tmp_ply_file)
-                    cur_obj = bpy.context.selected_objects[-1]
+                    converted_model_path, texture_file_path = self._get_converted_model_path(model_path)
+                    cur_obj = Utility.import_objects(converted_model_path)[0]
             else:
-                bpy.ops.import_mesh.ply(filepath=model_path)
-                cur_obj = bpy.context.selected_objects[-1]
+                cur_obj = Utility.import_objects(model_path)[0]
+            BopLoader._loaded_models[model_path] = cur_obj
         elif self.allow_duplication:
-            bpy.ops.object.duplicate({"object": cur_obj, "selected_objects": [cur_obj]})
-            cur_obj = bpy.context.selected_objects[-1]
+            # the duplicate shares the materials of the original object, like the duplicate operator does
+            new_obj = cur_obj.copy()
+            if self._link_duplicated_meshes:
+                # the shared mesh data keeps the material of the original
+                is_linked_duplicate = True
+            else:
+                new_obj.data = cur_obj.data.copy()
+            bpy.context.collection.objects.link(new_obj)
+            cur_obj = new_obj
 
         cur_obj.scale = Vector((scale, scale, scale))
         cur_obj['category_id'] = obj_id
         cur_obj['model_path'] = model_path
-        if not self._has_external_texture:
+        if not self._has_external_texture and not is_linked_duplicate:
             mat = self._load_materials(cur_obj)
             self._link_col_node(mat)
         elif texture_file_path != "":
@@ -329,12 +390,7 @@ def _load_materials(self, cur_obj):
 
         mat.use_nodes = True
 
-        if cur_obj.data.materials:
-            # assign to 1st material slot
-            cur_obj.data.materials[0] = mat
-        else:
-            # no slots
-            cur_obj.data.materials.append(mat)
+        self._set_first_material(cur_obj, mat)
 
         return mat
 
@@ -361,14 +417,27 @@ def _load_texture(self, cur_obj, texture_file_path):
         principled = Utility.get_the_one_node_with_type(nodes, "BsdfPrincipled")
         links.new(color_image.outputs["Color"], principled.inputs["Base Color"])
 
+        self._set_first_material(cur_obj, mat)
+
+    def _set_first_material(self, cur_obj, mat):
+        """ Assigns the given material to the first material slot of the object.
+
+        The material replaced by it, e.g. the default material added by the ply import, is removed if it is not used
+        anymore.
+
+        :param cur_obj: The object to use. Type: bpy.types.Object.
+        :param mat: The material to assign. Type: bpy.types.Material.
+        """
         if cur_obj.data.materials:
             # assign to 1st material slot
+            replaced_mat = cur_obj.data.materials[0]
             cur_obj.data.materials[0] = mat
+            if replaced_mat is not None and replaced_mat != mat and replaced_mat.users == 0:
+                bpy.data.materials.remove(replaced_mat)
         else:
             # no slots
             cur_obj.data.materials.append(mat)
 
-
     def _link_col_node(self, mat):
         """ Links a color attribute node to a Principled BSDF node.
 
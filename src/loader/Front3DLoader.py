@@ -11,7 +11,7 @@
 from src.loader.LoaderInterface import LoaderInterface
 from src.utility.Utility import Utility
 from src.utility.Config import Config
-from src.utility.BlenderUtility import duplicate_objects
+from src.utility.BlenderUtility import duplicate_objects, duplicate_objects_linked
 from src.utility.LabelIdMapping import LabelIdMapping
 
 class Front3DLoader(LoaderInterface):
@@ -39,6 +39,12 @@ class Front3DLoader(LoaderInterface):
                         "Type: str. Default: resources/front_3D/3D_front_mapping.csv"
         "ceiling_light_strength", "Strength of the emission shader used in the ceiling. Type: float. Default: 0.8"
         "lamp_light_strength", "Strength of the emission shader used in each lamp. Type: float. Default: 7.0"
+        "link_duplicated_meshes", "If true, each furniture model is only imported once per house and all further "
+                                  "instances of it are linked duplicates, which share the mesh data and the materials "
+                                  "with the first instance. This saves memory and time, but as the material slots "
+                                  "belong to the shared mesh, changing the material of one instance (e.g. via "
+                                  "cf_randomize_materials of the EntityManipulator) changes it for all instances of "
+                                  "the same model. Type: bool. Default: False."
    """
 
     def __init__(self, config: Config):
@@ -54,6 +60,7 @@ def __init__(self, config: Config):
         _, self.mapping = LabelIdMapping.read_csv_mapping(self.mapping_file)
         # a list of all newly created objects
         self.created_objects = []
+        self.link_duplicated_meshes = self.config.get_bool("link_duplicated_meshes", False)
 
 
 
@@ -91,10 +98,11 @@ def _create_mesh_objects_from_file(self, data: dir):
         :param data: json data dir. Must contain "material" and "mesh"
         """
         # extract all used materials -> there are more materials defined than used
-        used_materials = []
+        # they are stored by their uid, if a uid is used twice the first material is used
+        used_materials = {}
         for mat in data["material"]:
-            used_materials.append({"uid": mat["uid"], "texture": mat["texture"],
-                                   "normaltexture": mat["normaltexture"], "color": mat["color"]})
+            used_materials.setdefault(mat["uid"], {"uid": mat["uid"], "texture": mat["texture"],
+                                                   "normaltexture": mat["normaltexture"], "color": mat["color"]})
 
         col = bpy.data.collections.get("Collection")
         for mesh_data in data["mesh"]:
@@ -116,12 +124,7 @@ def _create_mesh_objects_from_file(self, data: dir):
 
             # get the material uid of the current mesh data
             current_mat = mesh_data["material"]
-            used_mat = None
-            # search in the used materials after this uid
-            for u_mat in used_materials:
-                if u_mat["uid"] == current_mat:
-                    used_mat = u_mat
-                    break
+            used_mat = used_materials.get(current_mat)
             # If there should be a material used
             if used_mat:
                 if used_mat["texture"]:
@@ -229,75 +232,88 @@ def _load_furniture_objs(self, data: dir):
         """
         # collect all loaded furniture objects
         all_objs = []
+        # maps the jid to the objects loaded for its first furniture element
+        objs_per_jid = {}
         # for each furniture element
         for ele in data["furniture"]:
             # create the paths based on the "jid"
             folder_path = os.path.join(self.future_model_path, ele["jid"])
             obj_file = os.path.join(folder_path, "raw_model.obj")
+            if self.link_duplicated_meshes and ele["jid"] in objs_per_jid:
+                # the same model was already loaded, the duplicates share the mesh data and the materials with it
+                objs = duplicate_objects_linked(objs_per_jid[ele["jid"]])
+                materials_are_set_up = True
             # if the object exists load it -> a lot of object do not exist
             # we are unsure why this is -> we assume that not all objects have been made public
-            if os.path.exists(obj_file):
+            elif os.path.exists(obj_file):
                 # load all objects from this .obj file
                 objs = Utility.import_objects(filepath=obj_file)
-                # extract the name, which serves as category id
-                used_obj_name = ele["category"]
-                for obj in objs:
-                    obj.name = used_obj_name
-                    # add some custom properties
-                    obj["uid"] = ele["uid"]
-                    # this custom property determines if the object was used before
-                    # is needed to only clone the second appearance of this object
-                    obj["is_used"] = False
-                    obj["is_3D_future"] = True
-                    obj["type"] = "Non-Object"  # is an non object used for the interesting score
-                    # set the category id based on the used obj name
-                    obj["category_id"] = self.mapping[used_obj_name.lower()]
-                    # walk over all material slots
-                    for slot in obj.material_slots:
-                        mat = slot.material
-                        nodes = mat.node_tree.nodes
-                        links = mat.node_tree.links
+                objs_per_jid[ele["jid"]] = objs
+                materials_are_set_up = False
+            else:
+                continue
+
+            # extract the name, which serves as category id
+            used_obj_name = ele["category"]
+            for obj in objs:
+                obj.name = used_obj_name
+                # add some custom properties
+                obj["uid"] = ele["uid"]
+                # this custom property determines if the object was used before
+                # is needed to only clone the second appearance of this object
+                obj["is_used"] = False
+                obj["is_3D_future"] = True
+                obj["type"] = "Non-Object"  # is an non object used for the interesting score
+                # set the category id based on the used obj name
+                obj["category_id"] = self.mapping[used_obj_name.lower()]
+                if materials_are_set_up:
+                    continue
+                # walk over all material slots
+                for slot in obj.material_slots:
+                    mat = slot.material
+                    nodes = mat.node_tree.nodes
+                    links = mat.node_tree.links
+
+                    principled_node = Utility.get_nodes_with_type(nodes, "BsdfPrincipled")
+                    is_lamp = "lamp" in used_obj_name.lower()
+                    if len(principled_node) == 0 and is_lamp:
+                        # this material has already been transformed
+                        continue
+                    elif len(principled_node) == 1:
+                        principled_node = principled_node[0]
+                    else:
+                        raise Exception("The amount of principle nodes can not be more than 1, "
+                                        "for obj: {}!".format(obj.name))
+
+                    # For each a texture node
+                    image_node = nodes.new(type='ShaderNodeTexImage')
+                    # and load the texture.png
+                    base_image_path = os.path.join(folder_path, "texture.png")
+                    image_node.image = bpy.data.images.load(base_image_path, check_existing=True)
+                    links.new(image_node.outputs['Color'], principled_node.inputs['Base Color'])
+                    # if the object is a lamp, do the same as for the ceiling and add an emission shader
+                    if is_lamp:
+                        mix_node = nodes.new(type='ShaderNodeMixShader')
+                        output = Utility.get_the_one_node_with_type(nodes, 'OutputMaterial')
+                        Utility.insert_node_instead_existing_link(links, principled_node.outputs['BSDF'],
+                                                                  mix_node.inputs[2], mix_node.outputs['Shader'],
+                                                                  output.inputs['Surface'])
 
-                        principled_node = Utility.get_nodes_with_type(nodes, "BsdfPrincipled")
-                        is_lamp = "lamp" in used_obj_name.lower()
-                        if len(principled_node) == 0 and is_lamp:
-                            # this material has already been transformed
-                            continue
-                        elif len(principled_node) == 1:
-                            principled_node = principled_node[0]
-                        else:
-                            raise Exception("The amount of principle nodes can not be more than 1, "
-                                            "for obj: {}!".format(obj.name))
-
-                        # For each a texture node
-                        image_node = nodes.new(type='ShaderNodeTexImage')
-                        # and load the texture.png
-                        base_image_path = os.path.join(folder_path, "texture.png")
-                        image_node.image = bpy.data.images.load(base_image_path, check_existing=True)
-                        links.new(image_node.outputs['Color'], principled_node.inputs['Base Color'])
-                        # if the object is a lamp, do the same as for the ceiling and add an emission shader
-                        if is_lamp:
-                            mix_node = nodes.new(type='ShaderNodeMixShader')
-                            output = Utility.get_the_one_node_with_type(nodes, 'OutputMaterial')
-                            Utility.insert_node_instead_existing_link(links, principled_node.outputs['BSDF'],
-                                                                      mix_node.inputs[2], mix_node.outputs['Shader'],
-                                                                      output.inputs['Surface'])
-
-                            # The light path node returns 1, if the material is hit by a ray coming from the camera,
-                            # else it returns 0. In this way the mix shader will use the principled shader for
-                            # rendering the color of the lightbulb itself, while using the emission shader
-                            # for lighting the scene.
-                            lightPath_node = nodes.new(type='ShaderNodeLightPath')
-                            links.new(lightPath_node.outputs['Is Camera Ray'], mix_node.inputs['Fac'])
-
-                            emission_node = nodes.new(type='ShaderNodeEmission')
-                            lamp_light_strength = self.config.get_float("lamp_light_strength", 7.0)
-                            emission_node.inputs["Strength"].default_value = lamp_light_strength
-                            links.new(image_node.outputs['Color'], emission_node.inputs['Color'])
-
-                            links.new(emission_node.outputs["Emission"], mix_node.inputs[1])
-
-                all_objs.extend(objs)
+                        # The light path node returns 1, if the material is hit by a ray coming from the camera,
+                        # else it returns 0. In this way the mix shader will use the principled shader for
+                        # rendering the color of the lightbulb itself, while using the emission shader
+                        # for lighting the scene.
+                        lightPath_node = nodes.new(type='ShaderNodeLightPath')
+                        links.new(lightPath_node.outputs['Is Camera Ray'], mix_node.inputs['Fac'])
+
+                        emission_node = nodes.new(type='ShaderNodeEmission')
+                        lamp_light_strength = self.config.get_float("lamp_light_strength", 7.0)
+                        emission_node.inputs["Strength"].default_value = lamp_light_strength
+                        links.new(image_node.outputs['Color'], emission_node.inputs['Color'])
+
+                        links.new(emission_node.outputs["Emission"], mix_node.inputs[1])
+
+            all_objs.extend(objs)
         return all_objs
 
     def _move_and_duplicate_furniture(self, data: dir, all_loaded_furniture: list):
@@ -312,29 +328,35 @@ def _move_and_duplicate_furniture(self, data: dir, all_loaded_furniture: list):
         blender_rot_mat = mathutils.Matrix.Rotation(radians(-90), 4, 'X')
         if "scene" not in data:
             raise Exception("There is no scene data in this json file: {}".format(self.json_path))
+        # maps the uid to all loaded furniture objects with this uid
+        furniture_per_uid = {}
+        for obj in all_loaded_furniture:
+            furniture_per_uid.setdefault(obj["uid"], []).append(obj)
         # for each room
         for room_id, room in enumerate(data["scene"]["room"]):
             # for each object in that room
             for child in room["children"]:
                 if "furniture" in child["instanceid"]:
-                    # find the object where the uid matches the child ref id
-                    for obj in all_loaded_furniture:
-                        if obj["uid"] == child["ref"]:
-                            # if the object was used before, duplicate the object and move that duplicated obj
-                            if obj["is_used"]:
-                                new_obj = duplicate_objects(obj)[0]
-                            else:
-                                # if it is the first time use the object directly
-                                new_obj = obj
-                            self.created_objects.append(new_obj)
-                            new_obj["is_used"] = True
-                            new_obj["room_id"] = room_id
-                            new_obj["type"] = "Object"  # is an object used for the interesting score
-                            new_obj["coarse_grained_class"] = new_obj["category_id"]
-                            # this flips the y and z coordinate to bring it to the blender coordinate system
-                            new_obj.location = mathutils.Vector(child["pos"]).xzy
-                            new_obj.scale = child["scale"]
-                            # extract the quaternion and convert it to a rotation matrix
-                            rotation_mat = mathutils.Quaternion(child["rot"]).to_euler().to_matrix().to_4x4()
-                            # transform it into the blender coordinate system and then to an euler
-                            new_obj.rotation_euler = (blender_rot_mat @ rotation_mat).to_euler()
+                    # find the objects where the uid matches the child ref id
+                    for obj in furniture_per_uid.get(child["ref"], []):
+                        # if the object was used before, duplicate the object and move that duplicated obj
+                        if obj["is_used"] and self.link_duplicated_meshes:
+                            # the duplicate shares the mesh data and the materials with the object
+                            new_obj = duplicate_objects_linked(obj)[0]
+                        elif obj["is_used"]:
+                            new_obj = duplicate_objects(obj)[0]
+                        else:
+                            # if it is the first time use the object directly
+                            new_obj = obj
+                        self.created_objects.append(new_obj)
+                        new_obj["is_used"] = True
+                        new_obj["room_id"] = room_id
+                        new_obj["type"] = "Object"  # is an object used for the interesting score
+                        new_obj["coarse_grained_class"] = new_obj["category_id"]
+                        # this flips the y and z coordinate to bring it to the blender coordinate system
+                        new_obj.location = mathutils.Vector(child["pos"]).xzy
+                        new_obj.scale = child["scale"]
+                        # extract the quaternion and convert it to a rotation matrix
+                        rotation_mat = mathutils.Quaternion(child["rot"]).to_euler().to_matrix().to_4x4()
+                        # transform it into the blender coordinate system and then to an euler
+                        new_obj.rotation_euler = (blender_rot_mat @ rotation_mat).to_euler()
@@ -3,6 +3,7 @@
 import warnings
 
 from src.loader.LoaderInterface import LoaderInterface
+from src.utility.AssetCatalog import AssetCatalog
 from src.utility.Utility import Utility
 
 
@@ -22,6 +23,10 @@ class IKEALoader(LoaderInterface):
                         "Available: ['bed', 'bookcase', 'chair', 'desk', 'sofa', 'table', 'wardrobe']"
             "obj_style", "The IKEA style to use for example: 'hemnes'. Type: string. Default: None."
                          "See data_dir for other options."
+            "use_asset_catalog", "If true, the found objects are stored in a persistent catalog and the data_dir is "
+                                 "only walked again, if a category folder or a folder inside of it was added or "
+                                 "removed. Changes deeper inside of the data_dir are not detected. See AssetCatalog. "
+                                 "Type: bool. Default: False."
         """
 
     def __init__(self, config):
@@ -40,16 +45,32 @@ def _generate_object_dict(self):
             Generates a dictionary of all available objects, i.e. all .obj files that have an associated .mtl file.
             dict: {IKEA_<type>_<style> : [<path_to_obj_file>, ...]}
         """
-        counter = 0
+        if self.config.get_bool("use_asset_catalog", False):
+            # the category folders contain one folder per object, so they change whenever an object is added
+            watched_paths = [self._data_dir]
+            if os.path.isdir(self._data_dir):
+                watched_paths += [os.path.join(self._data_dir, name) for name in os.listdir(self._data_dir)]
+            objects = AssetCatalog(self._data_dir).get_assets("objects", watched_paths, self._find_objects)
+        else:
+            objects = self._find_objects()
+        for category, obj_path in objects:
+            self._obj_dict.setdefault(category, []).append(obj_path)
+        print('Found {} object files in dataset belonging to {} categories'.format(len(objects), len(self._obj_dict)))
+
+    def _find_objects(self):
+        """
+            Walks over the whole data_dir and collects all .obj files that have an associated .mtl file.
+            :return: (list) list of tuples of category and path to the object file
+        """
+        objects = []
         for path, subdirs, files in os.walk(self._data_dir):
             for name in files:
                 if '.obj' in name:
                     category = [s for s in path.split('/') if 'IKEA_' in s][0]
                     obj_path = os.path.join(path, name)
                     if self._check_material_file(obj_path):
-                        self._obj_dict.setdefault(category, []).append(obj_path)
-                        counter += 1
-        print('Found {} object files in dataset belonging to {} categories'.format(counter, len(self._obj_dict)))
+                        objects.append((category, obj_path))
+        return objects
 
     @staticmethod
     def _check_material_file(path):
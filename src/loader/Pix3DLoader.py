@@ -4,6 +4,7 @@
 import random
 
 from src.loader.LoaderInterface import LoaderInterface
+from src.utility.AssetCatalog import AssetCatalog
 from src.utility.Utility import Utility
 from src.utility.LabelIdMapping import LabelIdMapping
 
@@ -30,6 +31,9 @@ class Pix3DLoader(LoaderInterface):
        "category", "The category to use for example: 'bed', check the data_path/model folder for more categories."
                    "Type: string. Available: ['bed', 'bookcase', 'chair', 'desk', 'misc', 'sofa', 'table', 'tool'"
                    ", 'wardrobe']"
+       "use_asset_catalog", "If true, the .obj files of the category are stored in a persistent catalog and the "
+                            "pix3d.json is only parsed again, if it changed. See AssetCatalog. Type: bool. "
+                            "Default: False."
     """
 
     def __init__(self, config):
@@ -39,8 +43,17 @@ def __init__(self, config):
         self._used_category = self.config.get_string("used_category")
 
         annotation_file_path = os.path.join(self._data_path, "pix3d.json")
-        self._files_with_fitting_category = Pix3DLoader.get_files_with_category(self._used_category, annotation_file_path,
-                                                                               self._data_path)
+        if self.config.get_bool("use_asset_catalog", False):
+            # the category is used as partition, so each category is only parsed once
+            assets = AssetCatalog(self._data_path).get_assets(
+                self._used_category, [annotation_file_path],
+                lambda: [(self._used_category, path) for path in Pix3DLoader.get_files_with_category(
+                    self._used_category, annotation_file_path, self._data_path)])
+            self._files_with_fitting_category = [path for _, path in assets]
+        else:
+            self._files_with_fitting_category = Pix3DLoader.get_files_with_category(self._used_category,
+                                                                                   annotation_file_path,
+                                                                                   self._data_path)
 
     @staticmethod
     def get_files_with_category(used_category, path_to_annotation_file, data_path):
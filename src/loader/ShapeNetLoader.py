@@ -4,6 +4,7 @@
 import random
 
 from src.loader.LoaderInterface import LoaderInterface
+from src.utility.AssetCatalog import AssetCatalog
 from src.utility.Utility import Utility
 from src.utility.LabelIdMapping import LabelIdMapping
 
@@ -28,6 +29,9 @@ class ShapeNetLoader(LoaderInterface):
 
        "data_path", "The path to the ShapeNetCore.v2 folder. Type: string."
        "used_synset_id", "The synset id for example: '02691156', check the data_path folder for more ids. Type: int."
+       "use_asset_catalog", "If true, the found .obj files are stored in a persistent catalog and the synset folders "
+                            "are only scanned again, if a model folder was added or removed. Changes inside of an "
+                            "existing model folder are not detected. See AssetCatalog. Type: bool. Default: False."
     """
 
     def __init__(self, config):
@@ -37,16 +41,18 @@ def __init__(self, config):
         self._used_synset_id = self.config.get_string("used_synset_id")
 
         taxonomy_file_path = os.path.join(self._data_path, "taxonomy.json")
+        catalog = AssetCatalog(self._data_path) if self.config.get_bool("use_asset_catalog", False) else None
         self._files_with_fitting_synset = ShapeNetLoader.get_files_with_synset(self._used_synset_id, taxonomy_file_path,
-                                                                               self._data_path)
+                                                                               self._data_path, catalog)
 
     @staticmethod
-    def get_files_with_synset(used_synset_id, path_to_taxonomy_file, data_path):
+    def get_files_with_synset(used_synset_id, path_to_taxonomy_file, data_path, catalog=None):
         """
         Returns a list of a .obj file for the given synset_id
         :param used_synset_id: the id of the category something like: '02691156', see the data_path folder for more ids
         :param path_to_taxonomy_file: path to the taxonomy.json file, should be in the data_path, too
         :param data_path: path to the ShapeNetCore.v2 folder
+        :param catalog: if given, the .obj files of each synset are read from this asset catalog. Type: AssetCatalog.
         :return: list of .obj files, which are in the synset_id folder, based on the given taxonomy
         """
         if os.path.exists(path_to_taxonomy_file):
@@ -58,7 +64,14 @@ def get_files_with_synset(used_synset_id, path_to_taxonomy_file, data_path):
                         synset_id = block["synsetId"]
                         if synset_id == used_synset_id or used_synset_id in block["children"]:
                             id_path = os.path.join(data_path, synset_id)
-                            files.extend(glob.glob(os.path.join(id_path, "*", "models", "*.obj")))
+                            if catalog is not None:
+                                # a new model folder changes the modification time of the synset folder
+                                assets = catalog.get_assets(synset_id, [id_path], lambda: [
+                                    (synset_id, path) for path in
+                                    glob.glob(os.path.join(id_path, "*", "models", "*.obj"))])
+                                files.extend(path for _, path in assets)
+                            else:
+                                files.extend(glob.glob(os.path.join(id_path, "*", "models", "*.obj")))
             # Sort files to make random choice deterministic
             files.sort()
             return files
@@ -71,6 +71,41 @@ def add_to_config_before_init(key, value):
         else:
             raise RuntimeError("This fct. should only be called before the GlobalStorage was inited!")
 
+    @staticmethod
+    def reset():
+        """
+        Removes all stored values and the global config, s.t. the next pipeline run in this blender process starts
+        from scratch.
+        """
+        GlobalStorage._storage_dict = {}
+        GlobalStorage._global_config = None
+        GlobalStorage._add_to_global_config_at_init = {}
+
+    @staticmethod
+    def get_checkpoint_state():
+        """
+        Returns all stored values and the data of the global config, s.t. they can be restored in a new blender
+        process via restore_checkpoint_state().
+
+        :return: A dict containing the storage dict and the data of the global config (None if it was not inited).
+        """
+        return {
+            "storage": dict(GlobalStorage._storage_dict),
+            "global_config": GlobalStorage._global_config.data if GlobalStorage._global_config is not None else None
+        }
+
+    @staticmethod
+    def restore_checkpoint_state(storage, global_config):
+        """
+        Restores the stored values and the global config of a checkpoint, this replaces the current values.
+
+        :param storage: The storage dict of the checkpoint.
+        :param global_config: The global config of the checkpoint, should be of type src.utility.Config or None.
+        """
+        GlobalStorage._storage_dict = dict(storage)
+        GlobalStorage._global_config = global_config
+        GlobalStorage._add_to_global_config_at_init = {}
+
     @staticmethod
     def add(key, value):
         """
@@ -27,6 +27,11 @@ class Module:
                          "the output_dir is used. Type: bool."
        "output_dir", "The path to a directory where all persistent output files should be stored. If it doesn't exist,"
                      "it is created automatically. Type: string. Default: ""."
+       "free_orphan_datablocks", "If True, all datablocks created while running this module, which are not used by "
+                                 "anything at its end, are removed again. Type: bool. Default: False."
+       "checkpoint", "If True, the scene, the global storage and the registered outputs are saved into the temp_dir "
+                     "after this module, s.t. a failed run can be continued from here via run.py --resume. Type: "
+                     "bool. Default: False."
     """
 
     def __init__(self, config):
@@ -1,4 +1,7 @@
 
+import hashlib
+import json
+import pickle
 import shutil
 import os
 import bpy
@@ -6,10 +9,15 @@
 from src.utility.ConfigParser import ConfigParser
 from src.utility.Utility import Utility, Config
 from src.main.GlobalStorage import GlobalStorage
+from src.main.Provider import Provider
+from src.utility.MemoryUtility import MemoryUtility
+from src.utility.BvhRegistry import BvhRegistry
+from src.utility.Profiler import Profiler
 
 class Pipeline:
 
-    def __init__(self, config_path, args, working_dir, temp_dir, should_perform_clean_up=True, avoid_rendering=False):
+    def __init__(self, config_path, args, working_dir, temp_dir, should_perform_clean_up=True, avoid_rendering=False,
+                 resume=False, track_memory=False):
         """
         Inits the pipeline, by calling the constructors of all modules mentioned in the config.
 
@@ -21,8 +29,17 @@ def __init__(self, config_path, args, working_dir, temp_dir, should_perform_clea
         :param avoid_rendering if this is true all renderes are not executed (except the RgbRenderer,
                                where only the rendering call to blender is avoided) with this it is possible to debug
                                properly
+        :param resume if this is true and the temp dir contains a checkpoint of the same config, the scene and the
+                      global storage are restored from it and all modules up to the checkpoint are skipped
+        :param track_memory if this is true, the datablocks created by each module and the memory growth are reported,
+                            e.g. if a memory ceiling is used. This is always done if profiling is enabled.
         """
         Utility.working_dir = working_dir
+        self._config_path = config_path
+        self._track_memory = track_memory
+        Profiler.start_run()
+        # Cached provider results have to be dropped whenever the scene changes
+        Provider.register_cache_invalidation_handlers()
 
         # Clean up example scene or scene created by last run when debugging pipeline inside blender
         if should_perform_clean_up:
@@ -37,12 +54,22 @@ def __init__(self, config_path, args, working_dir, temp_dir, should_perform_clea
         Utility.temp_dir = Utility.resolve_path(temp_dir)
         os.makedirs(Utility.temp_dir, exist_ok=True)
 
-        self.modules = Utility.initialize_modules(config["modules"])
+        # Checkpoints are only valid for the exact same config and arguments
+        self._config_hash = hashlib.sha256(json.dumps(config, sort_keys=True, default=str).encode()).hexdigest()
+        self._checkpoint_dir = os.path.join(Utility.temp_dir, "checkpoint")
+        self._first_module_index = 0
+        if resume:
+            # Has to be done before the modules are created, as they might already access the scene
+            self._first_module_index = self._load_checkpoint()
+
+        with Profiler.Block("initialize_modules", "init"):
+            self.modules = Utility.initialize_modules(config["modules"])
 
 
     def _cleanup(self):
         """ Cleanup the scene by removing objects, orphan data and custom properties """
         self._remove_all_objects()
+        BvhRegistry.clear()
         self._remove_orphan_data()
         self._remove_custom_properties()
 
@@ -56,31 +83,103 @@ def _remove_all_objects(self):
 
     def _remove_orphan_data(self):
         """ Remove all data blocks which are not used anymore. """
-        data_structures = [
-            bpy.data.meshes,
-            bpy.data.materials,
-            bpy.data.textures,
-            bpy.data.images,
-            bpy.data.brushes,
-            bpy.data.cameras,
-            bpy.data.actions,
-            bpy.data.lights
-        ]
-
-        for data_structure in data_structures:
-            for block in data_structure:
-                # If no one uses this block => remove it
-                if block.users == 0:
-                    data_structure.remove(block)
+        MemoryUtility.remove_orphan_data()
 
     def _remove_custom_properties(self):
         """ Remove all custom properties registered at global entities like the scene. """
         for key in bpy.context.scene.keys():
             del bpy.context.scene[key]
 
+    def _save_checkpoint(self, next_module_index):
+        """ Saves the current scene, the global storage and the registered outputs into the temp dir.
+
+        :param next_module_index: The index of the first module, which has not been run yet.
+        """
+        with Utility.BlockStopWatch("Saving checkpoint"):
+            os.makedirs(self._checkpoint_dir, exist_ok=True)
+            blend_file_name = "checkpoint_{:03d}.blend".format(next_module_index)
+            # copy=True keeps the path of the currently opened file
+            bpy.ops.wm.save_as_mainfile(filepath=os.path.join(self._checkpoint_dir, blend_file_name), copy=True)
+
+            global_storage_state = GlobalStorage.get_checkpoint_state()
+            storage = {}
+            for key, value in global_storage_state["storage"].items():
+                try:
+                    pickle.dumps(value)
+                    storage[key] = value
+                except Exception:
+                    print("Warning: The global storage value of the key {} can not be stored in the checkpoint, "
+                          "it will be missing after resuming.".format(key))
+            state = {
+                "config_hash": self._config_hash,
+                "next_module_index": next_module_index,
+                "blend_file": blend_file_name,
+                "storage": storage,
+                "global_config": global_storage_state["global_config"],
+                "output": [output.to_dict() for output in bpy.context.scene["output"]]
+                          if "output" in bpy.context.scene else None
+            }
+            # The state is replaced last, s.t. an interrupted save leaves the previous checkpoint intact
+            state_path = os.path.join(self._checkpoint_dir, "checkpoint.pickle")
+            with open(state_path + ".tmp", "wb") as f:
+                pickle.dump(state, f)
+            os.replace(state_path + ".tmp", state_path)
+
+            # Remove the blend files of previous checkpoints
+            for file_name in os.listdir(self._checkpoint_dir):
+                if file_name.startswith("checkpoint_") and file_name != blend_file_name:
+                    os.remove(os.path.join(self._checkpoint_dir, file_name))
+
+    def _load_checkpoint(self):
+        """ Restores the scene, the global storage and the registered outputs from the checkpoint in the temp dir.
+
+        :return: The index of the first module, which still has to be run. 0 if there is no valid checkpoint.
+        """
+        state_path = os.path.join(self._checkpoint_dir, "checkpoint.pickle")
+        if not os.path.exists(state_path):
+            print("No checkpoint found, running the whole pipeline")
+            return 0
+        with open(state_path, "rb") as f:
+            state = pickle.load(f)
+        if state["config_hash"] != self._config_hash:
+            print("The checkpoint was created with a different config or different arguments, ignoring it")
+            return 0
+
+        with Utility.BlockStopWatch("Loading checkpoint"):
+            bpy.ops.wm.open_mainfile(filepath=os.path.join(self._checkpoint_dir, state["blend_file"]), load_ui=False)
+            # all results cached for the previous scene are invalid now
+            Provider.invalidate_cache()
+            global_config = Config(state["global_config"]) if state["global_config"] is not None else None
+            GlobalStorage.restore_checkpoint_state(state["storage"], global_config)
+            if state["output"] is not None:
+                bpy.context.scene["output"] = state["output"]
+        print("Resuming from checkpoint, skipping the first {} modules".format(state["next_module_index"]))
+        return state["next_module_index"]
+
     def run(self):
         """ Runs each module and measuring their execution time. """
-        with Utility.BlockStopWatch("Running blender pipeline"):
-            for module in self.modules:
-                with Utility.BlockStopWatch("Running module " + module.__class__.__name__):
-                    module.run()
+        # scanning the datablocks costs time, so it is only done if someone is interested in the result
+        track_datablocks = self._track_memory or Profiler.is_enabled()
+        try:
+            with Utility.BlockStopWatch("Running blender pipeline"), \
+                    Profiler.Block("pipeline", "pipeline",
+                                   MemoryUtility.DatablockTracker("pipeline") if track_datablocks else None):
+                for module_index, module in enumerate(self.modules):
+                    if module_index < self._first_module_index:
+                        print("Skipping module " + module.__class__.__name__ + " (restored from checkpoint)")
+                        continue
+                    # the datablocks are counted once by the tracker, the profiler only records its counts
+                    free_orphans = module.config.get_bool("free_orphan_datablocks", False)
+                    datablock_tracker = None
+                    if track_datablocks or free_orphans:
+                        datablock_tracker = MemoryUtility.DatablockTracker(module.__class__.__name__, free_orphans)
+                    with Utility.BlockStopWatch("Running module " + module.__class__.__name__), \
+                            Profiler.Block(module.__class__.__name__, "module", datablock_tracker):
+                        # a module must never see the cached selections of the previous module
+                        Provider.invalidate_cache()
+                        module.run()
+                    if module.config.get_bool("checkpoint", False):
+                        self._save_checkpoint(module_index + 1)
+        finally:
+            # the profile is also written if a module failed, as those runs are the most interesting ones
+            Profiler.write_run(self._config_path)
@@ -1,9 +1,104 @@
+import bpy
+
 
 class Provider:
-    """ A provider returns parameter values dynamically based on its configuration. """
+    """ A provider returns parameter values dynamically based on its configuration.
+
+    Providers are either stochastic (default) or pure. A pure provider always returns the same result as long as the
+    scene does not change, e.g. a getter without random sampling. The results of pure providers are cached until the
+    scene changes, stochastic providers are run on every access and can return several samples at once via
+    run_batch(). A batch always contains the same samples as the same number of calls of run().
+
+    The cache is invalidated, when a datablock is added or removed, when the depsgraph is updated, when the frame
+    changes and before each module. Code which changes the properties a pure provider selects on, without any of
+    those, has to call Provider.invalidate_cache() itself.
+    """
+
+    # is increased whenever the scene might have changed, cached results are only valid for the same revision
+    _scene_revision = 0
 
     def __init__(self, config):
         self.config = config
+        self._cached_result = None
+        self._cached_revision = None
 
     def run(self):
-        raise NotImplementedError("Please implement this method")
\ No newline at end of file
+        raise NotImplementedError("Please implement this method")
+
+    def is_pure(self):
+        """ Returns whether this provider always returns the same result for an unchanged scene.
+
+        :return: True, if the result of run() can be cached.
+        """
+        return False
+
+    def run_batch(self, number_of_samples):
+        """ Returns several results of this provider at once.
+
+        Stochastic providers can overwrite this to draw all samples at once, but they have to use the same random
+        number generator as run(), s.t. the samples are the same as the ones of the same number of run() calls.
+
+        :param number_of_samples: The number of results to return.
+        :return: A list of results.
+        """
+        return [self.run() for _ in range(number_of_samples)]
+
+    def get_value(self):
+        """ Returns the result of this provider, for pure providers the cached result is used if still valid.
+
+        :return: The result of run().
+        """
+        if not self.is_pure():
+            return self.run()
+        revision = Provider.get_scene_revision()
+        if getattr(self, "_cached_revision", None) != revision:
+            self._cached_result = self.run()
+            self._cached_revision = revision
+        # callers are allowed to change the returned list
+        if isinstance(self._cached_result, list):
+            return list(self._cached_result)
+        return self._cached_result
+
+    @staticmethod
+    def contains_provider(data):
+        """ Checks if the given config data contains a nested provider.
+
+        :param data: A value of a config, e.g. a dict or a list.
+        :return: True, if a provider or the config of a provider is found.
+        """
+        if isinstance(data, Provider):
+            return True
+        if isinstance(data, dict):
+            return "provider" in data or any(Provider.contains_provider(value) for value in data.values())
+        if isinstance(data, list):
+            return any(Provider.contains_provider(value) for value in data)
+        return False
+
+    @staticmethod
+    def get_scene_revision(datablocks=None):
+        """ Returns a key, which changes whenever the scene might have changed.
+
+        :param datablocks: The collections of datablocks, whose size is part of the key, e.g. [bpy.data.materials].
+                           Default: objects, meshes, materials, textures and images.
+        :return: A tuple of the revision counter and the number of datablocks of the relevant types.
+        """
+        if datablocks is None:
+            datablocks = [bpy.data.objects, bpy.data.meshes, bpy.data.materials, bpy.data.textures, bpy.data.images]
+        return (Provider._scene_revision,) + tuple(len(collection) for collection in datablocks)
+
+    @staticmethod
+    @bpy.app.handlers.persistent
+    def invalidate_cache(*args):
+        """ Invalidates the cached results of all pure providers.
+
+        Can also be used as a bpy.app handler, therefore it accepts and ignores any arguments. The handler is
+        persistent, s.t. it is kept when a new .blend file is loaded, e.g. when resuming from a checkpoint.
+        """
+        Provider._scene_revision += 1
+
+    @staticmethod
+    def register_cache_invalidation_handlers():
+        """ Makes sure the cached results are invalidated whenever the depsgraph is updated or the frame changes. """
+        for handlers in [bpy.app.handlers.depsgraph_update_post, bpy.app.handlers.frame_change_post]:
+            if Provider.invalidate_cache not in handlers:
+                handlers.append(Provider.invalidate_cache)
@@ -7,6 +7,7 @@
 import src.utility.BlenderUtility as BlenderUtility
 from src.loader.LoaderInterface import LoaderInterface
 from src.main.Module import Module
+from src.main.Provider import Provider
 from src.provider.getter.Material import Material
 from src.utility.Config import Config
 from mathutils import Matrix
@@ -245,13 +246,19 @@ def run(self):
             print("Amount of objects to modify: {}.".format(len(entities)))
 
         # get raw value from the set parameters if it is to be sampled once for all selected entities
+        params_per_entity = None
         if op_mode == "once_for_all":
             params = self._get_the_set_params(params_conf)
+        elif self._can_sample_params_in_batch(params_conf):
+            # the values of all entities are drawn at once, they are the same as when sampling them per entity
+            params_per_entity = self._get_the_set_params_batch(params_conf, len(entities))
 
-        for entity in entities:
+        for entity_index, entity in enumerate(entities):
 
             # get raw value from the set parameters if it is to be sampled anew for each selected entity
-            if op_mode == "once_for_each":
+            if params_per_entity is not None:
+                params = params_per_entity[entity_index]
+            elif op_mode == "once_for_each":
                 params = self._get_the_set_params(params_conf)
 
             for key, value in params.items():
@@ -293,9 +300,55 @@ def run(self):
                 # but if the name is new then new custom property will be created
                 elif requested_cp:
                     entity[key_copy] = value
+
+            # the changed entity might now be selected differently by the getters used for the next entity
+            Provider.invalidate_cache()
                     
         bpy.context.view_layer.update()
 
+    @staticmethod
+    def _can_sample_params_in_batch(params_conf):
+        """ Checks if the parameters of all entities can be sampled at once without changing the sampled values.
+
+        This is the case, if there are no custom functions and only one parameter is a sampler, which does not
+        contain any other provider. Otherwise the order of the random draws or the state of the scene a provider sees
+        would differ from sampling the parameters entity by entity.
+
+        :param params_conf: Object with all user-defined data. Type: Config.
+        :return: True, if get_raw_value_batch() can be used for all parameters.
+        """
+        number_of_samplers = 0
+        for key, value in params_conf.data.items():
+            if key.startswith("cf_"):
+                return False
+            if isinstance(value, Provider):
+                provider_name = type(value).__module__
+                provider_data = value.config.data
+            elif isinstance(value, dict) and "provider" in value:
+                provider_name = "src.provider." + value["provider"]
+                provider_data = {name: data for name, data in value.items() if name != "provider"}
+            elif Provider.contains_provider(value):
+                return False
+            else:
+                continue
+            if not provider_name.startswith("src.provider.sampler.") or Provider.contains_provider(provider_data):
+                return False
+            number_of_samplers += 1
+        return number_of_samplers <= 1
+
+    def _get_the_set_params_batch(self, params_conf, number_of_entities):
+        """ Extracts the values to set for several entities at once, samplers return all of them in one batch.
+
+        :param params_conf: Object with all user-defined data, without custom functions. Type: Config.
+        :param number_of_entities: The number of entities to extract values for. Type: int.
+        :return: For each entity the parameters to set as {name of the parameter: it's value} pairs. Type: list.
+        """
+        params_per_entity = [{} for _ in range(number_of_entities)]
+        for key in params_conf.data.keys():
+            for params, value in zip(params_per_entity, params_conf.get_raw_value_batch(key, number_of_entities)):
+                params[key] = value
+        return params_per_entity
+
     def _get_the_set_params(self, params_conf):
         """ Extracts actual values to set from a Config object.
 
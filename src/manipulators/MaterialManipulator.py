@@ -4,6 +4,7 @@
 import bpy
 
 from src.main.Module import Module
+from src.main.Provider import Provider
 from src.utility.Config import Config
 from src.utility.Utility import Utility
 
@@ -176,6 +177,9 @@ def run(self):
                     # set the value
                     setattr(material, key_copy, value)
 
+            # the changed material might now be selected differently by the getters used for the next material
+            Provider.invalidate_cache()
+
     def _get_the_set_params(self, params_conf):
         """ Extracts actual values to set from a Config object.
 
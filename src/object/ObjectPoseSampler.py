@@ -1,7 +1,9 @@
 import bpy
 
 from src.main.Module import Module
-from src.utility.BlenderUtility import check_intersection, check_bb_intersection, get_all_mesh_objects
+from src.main.Provider import Provider
+from src.utility.BlenderUtility import check_intersection, get_all_mesh_objects
+from src.utility.SpatialHashGrid import SpatialHashGrid
 
 
 class ObjectPoseSampler(Module):
@@ -57,44 +59,51 @@ def run(self):
         2. If no collisions are found keep the point.
         """
         # While we have objects remaining and have not run out of tries - sample a point
-        # List of successfully placed objects
-        placed = []
+        # Broad phase over the bounding boxes of all placed objects, s.t. only the neighbours of an object are checked
+        placed = SpatialHashGrid()
         # After this many tries we give up on current object and continue with the rest
         max_tries = self.config.get_int("max_iterations", 1000)
         objects = self.config.get_list("objects_to_sample", get_all_mesh_objects())
 
-        # cache to fasten collision detection
-        bvh_cache = {}
-
         # for every selected object
         for obj in objects:
             if obj.type == "MESH":
                 no_collision = True
+                # Without a parent or constraints the world matrix is the basis matrix, which does not require an
+                # update of the view layer
+                needs_view_layer_update = obj.parent is not None or len(obj.constraints) > 0
 
                 # Try max_iter amount of times
                 for i in range(max_tries):
 
+                    # The objects have been moved since the samplers were last used, so cached getters are outdated
+                    Provider.invalidate_cache()
                     # Put the top object in queue at the sampled point in space
                     position = self.config.get_vector3d("pos_sampler")
                     rotation = self.config.get_vector3d("rot_sampler")
                     # assign it a new pose
                     obj.location = position
                     obj.rotation_euler = rotation
-                    bpy.context.view_layer.update()
-                    # Remove bvh cache, as object has changed
-                    if obj.name in bvh_cache:
-                        del bvh_cache[obj.name]
+                    if needs_view_layer_update:
+                        bpy.context.view_layer.update()
+                        matrix_world = obj.matrix_world
+                    else:
+                        matrix_world = obj.matrix_basis
+
+                    # Only the placed objects, whose bounding boxes collide, are candidates for a collision
+                    aabb_min, aabb_max = SpatialHashGrid.get_world_aabb(obj, matrix_world)
+                    candidates = placed.query(aabb_min, aabb_max)
+                    if candidates and not needs_view_layer_update:
+                        # the refined check needs the correct matrix_world
+                        bpy.context.view_layer.update()
 
                     no_collision = True
 
-                    # Now check for collisions
-                    for already_placed in placed:
-                        # First check if bounding boxes collides
-                        intersection = check_bb_intersection(obj, already_placed)
-                        # if they do
-                        if intersection:
-                            # then check for more refined collisions
-                            intersection, bvh_cache = check_intersection(obj, already_placed, bvh_cache=bvh_cache)
+                    # Now check for more refined collisions
+                    for already_placed in candidates:
+                        # the bvh trees of the already placed objects are taken from the registry, only the tree of
+                        # the moved object is rebuilt
+                        intersection, _ = check_intersection(obj, already_placed)
 
                         if intersection:
                             no_collision = False
@@ -104,7 +113,8 @@ def run(self):
                     if no_collision:
                         break
 
-                placed.append(obj)
+                bpy.context.view_layer.update()
+                placed.insert(obj, *SpatialHashGrid.get_world_aabb(obj))
 
                 if not no_collision:
                     print("Could not place " + obj.name + " without a collision.")
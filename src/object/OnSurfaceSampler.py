@@ -2,7 +2,9 @@
 import mathutils
 
 from src.main.Module import Module
+from src.main.Provider import Provider
 from src.utility.BlenderUtility import check_intersection, check_bb_intersection, get_bounds
+from src.utility.BvhRegistry import BvhRegistry
 
 
 class OnSurfaceSampler(Module):
@@ -89,8 +91,8 @@ def collision(first_obj, second_obj):
         """
         intersection = check_bb_intersection(first_obj, second_obj)
         if intersection:
-            # check for more refined collisions
-            intersection, cache = check_intersection(first_obj, second_obj)
+            # check for more refined collisions, the bvh trees are cached in the registry
+            intersection, _ = check_intersection(first_obj, second_obj)
 
         return intersection
 
@@ -140,6 +142,8 @@ def run(self):
                 placed_successfully = False
 
                 for i in range(max_tries):
+                    # The objects have been moved since the samplers were last used, so cached getters are outdated
+                    Provider.invalidate_cache()
                     position = self.config.get_vector3d("pos_sampler")
                     rotation = self.config.get_vector3d("rot_sampler")
 
@@ -177,6 +181,7 @@ def run(self):
 
                 if not placed_successfully:
                     print("Giving up on {}, deleting...".format(obj.name))
+                    BvhRegistry.remove(obj.name)
                     bpy.ops.object.select_all(action='DESELECT')
                     obj.select_set(True)
                     bpy.ops.object.delete()
@@ -3,7 +3,8 @@
 import numpy as np
 
 from src.main.Module import Module
-from src.utility.BlenderUtility import get_all_mesh_objects, get_bound_volume
+from src.utility.BlenderUtility import get_all_mesh_objects, get_bound_volume, get_center_of_volume, \
+    get_mesh_vertices, set_mesh_vertices
 
 
 class PhysicsPositioning(Module):
@@ -41,6 +42,12 @@ class PhysicsPositioning(Module):
         "friction", "Resistance of object to movement. Type: float in [0, inf]. Default: 0.5"
         "angular_damping", "Amount of angular velocity that is lost over time. Type: float in [0, 1]. Default: 0.1"
         "linear_damping", "Amount of linear velocity that is lost over time. Type: float in [0, 1]. Default: 0.04"
+        "origin_shift_on_mesh_data", "If True, the origins of the active objects are moved to their center of volume "
+                                     "and back by changing their mesh data directly instead of calling blender "
+                                     "operators per object, which is much faster for many objects. Objects with a "
+                                     "shared mesh, shape keys, a parent or a negative scale always use the operators. "
+                                     "The center of volume is computed like blender does it, but small numerical "
+                                     "differences to the operators are possible. Type: bool. Default: False."
         
     """
 
@@ -60,6 +67,7 @@ def __init__(self, config):
         self.friction = self.config.get_float("friction", 0.5)
         self.angular_damping = self.config.get_float("angular_damping",0.1)
         self.linear_damping = self.config.get_float("linear_damping",0.04)
+        self.origin_shift_on_mesh_data = self.config.get_bool("origin_shift_on_mesh_data", False)
         
     def run(self):
         """ Performs physics simulation in the scene. """
@@ -85,18 +93,23 @@ def run(self):
         # reset origin point of all active objects to the total shift location of the 3D cursor
         for obj in get_all_mesh_objects():
             if obj.rigid_body.type == "ACTIVE":
-                bpy.context.view_layer.objects.active = obj
-                obj.select_set(True)
                 # compute relative object rotation before and after simulation
                 R_obj_before_sim = mathutils.Euler(obj_poses_before_sim[obj.name]['rotation']).to_matrix()
                 R_obj_after = mathutils.Euler(obj_poses_after_sim[obj.name]['rotation']).to_matrix()
                 R_obj_rel = R_obj_before_sim @ R_obj_after.transposed()
                 # compute origin shift in object coordinates
                 origin_shift[obj.name] = R_obj_rel.transposed() @ origin_shift[obj.name]
-                # set 3d cursor location to the total shift of the object
-                bpy.context.scene.cursor.location = origin_shift[obj.name] + obj_poses_after_sim[obj.name]['location']
-                bpy.ops.object.origin_set(type='ORIGIN_CURSOR', center='MEDIAN')
-                obj.select_set(False)
+                # the new origin is the total shift of the object
+                new_origin = origin_shift[obj.name] + obj_poses_after_sim[obj.name]['location']
+                if obj.name in self._objects_shifted_on_mesh_data:
+                    self._set_origin_on_mesh_data(obj, obj.matrix_world.inverted() @ new_origin)
+                else:
+                    bpy.context.view_layer.objects.active = obj
+                    obj.select_set(True)
+                    # set 3d cursor location to the total shift of the object
+                    bpy.context.scene.cursor.location = new_origin
+                    bpy.ops.object.origin_set(type='ORIGIN_CURSOR', center='MEDIAN')
+                    obj.select_set(False)
 
         # reset 3D cursor location
         bpy.context.scene.cursor.location = mathutils.Vector([0, 0, 0])
@@ -117,6 +130,9 @@ def _add_rigidbody(self):
         :return: Object locations after origin point shift. Type: dict.
         """
         locations_after_origin_shift = {}
+        self._objects_shifted_on_mesh_data = set()
+        # the world matrices have to be up to date to shift the origins on the mesh data
+        bpy.context.view_layer.update()
         for obj in get_all_mesh_objects():
             bpy.context.view_layer.objects.active = obj
             bpy.ops.rigidbody.object_add()
@@ -135,17 +151,62 @@ def _add_rigidbody(self):
             obj.rigid_body.angular_damping = self.angular_damping
             obj.rigid_body.linear_damping = self.linear_damping
             if obj.rigid_body.type == "ACTIVE":
-                bpy.ops.object.origin_set(type='ORIGIN_CENTER_OF_VOLUME', center='MEDIAN')
-                bpy.ops.object.transform_apply(location=False, rotation=False, scale=True)
+                if self.origin_shift_on_mesh_data and self._can_shift_origin_on_mesh_data(obj):
+                    self._shift_origin_to_center_of_volume_on_mesh_data(obj)
+                    self._objects_shifted_on_mesh_data.add(obj.name)
+                else:
+                    bpy.ops.object.origin_set(type='ORIGIN_CENTER_OF_VOLUME', center='MEDIAN')
+                    bpy.ops.object.transform_apply(location=False, rotation=False, scale=True)
                 locations_after_origin_shift.update({obj.name: obj.location.copy()})
 
-            if self.mass_scaling:
-                obj.rigid_body.mass = get_bound_volume(obj) * self.mass_factor
-
             obj.select_set(False)
 
+        if self.mass_scaling:
+            # the bounding boxes of the changed meshes are only updated with the view layer
+            bpy.context.view_layer.update()
+            for obj in get_all_mesh_objects():
+                obj.rigid_body.mass = get_bound_volume(obj) * self.mass_factor
+
         return locations_after_origin_shift
 
+    def _can_shift_origin_on_mesh_data(self, obj):
+        """ Checks if the origin of the given object can be shifted by changing its mesh data directly.
+
+        For all other objects the blender operators are used, which also handle or reject these special cases.
+
+        :param obj: The active object.
+        :return: True, if the mesh data path gives the same result as the operators.
+        """
+        return obj.data.users == 1 and obj.data.shape_keys is None and obj.parent is None \
+               and all(value > 0 for value in obj.scale) and all(value == 1 for value in obj.delta_scale)
+
+    def _shift_origin_to_center_of_volume_on_mesh_data(self, obj):
+        """ Moves the origin of the given object to its center of volume and applies its scale.
+
+        This does the same as the ORIGIN_CENTER_OF_VOLUME origin_set and the scale transform_apply operator, but
+        without any depsgraph evaluation.
+
+        :param obj: The active object.
+        """
+        vertices = get_mesh_vertices(obj.data)
+        center = get_center_of_volume(obj.data, vertices)
+        # move the object, s.t. the mesh stays at the same place in world space
+        obj.location += obj.matrix_world.to_3x3() @ mathutils.Vector(center)
+        scale = np.array(obj.scale)
+        set_mesh_vertices(obj.data, (vertices - center) * scale)
+        obj.scale = [1, 1, 1]
+
+    def _set_origin_on_mesh_data(self, obj, new_origin):
+        """ Moves the origin of the given object to the given point without moving its mesh in world space.
+
+        This does the same as the ORIGIN_CURSOR origin_set operator.
+
+        :param obj: The object.
+        :param new_origin: The new origin in the local coordinates of the object.
+        """
+        set_mesh_vertices(obj.data, get_mesh_vertices(obj.data) - np.array(new_origin))
+        obj.location += obj.matrix_world.to_3x3() @ new_origin
+
     def _remove_rigidbody(self):
         """ Removes the rigidbody element from all mesh objects. """
         for obj in get_all_mesh_objects():
@@ -171,7 +232,8 @@ def _frames_to_seconds(self, frames):
     def _do_simulation(self):
         """ Perform the simulation.
 
-        This method bakes the simulation for the configured number of iterations and returns all object positions at the last frame.
+        This method steps the simulation forward until all objects have stopped moving or the configured maximum time
+        has been reached and returns all object positions at the last frame.
 
         :return: Dict of form {obj_name:{'location':[x, y, z], 'rotation':[x_rot, y_rot, z_rot]}}.
         """
@@ -186,16 +248,24 @@ def _do_simulation(self):
         if min_simulation_time >= max_simulation_time:
             raise Exception("max_simulation_iterations has to be bigger than min_simulation_iterations")
 
+        # The simulation is stepped forward in place and the stepped frames are kept in the cache, so every interval
+        # only simulates its new frames instead of baking everything from the first frame again
+        point_cache.frame_end = self._seconds_to_frames(max_simulation_time)
+        # Jumping to the start frame resets the simulation
+        bpy.context.scene.frame_set(point_cache.frame_start)
+        simulated_frame = point_cache.frame_start
+
         # Run simulation starting from min to max in the configured steps
         for current_time in np.arange(min_simulation_time, max_simulation_time, check_object_interval):
             current_frame = self._seconds_to_frames(current_time)
             print("Running simulation up to " + str(current_time) + " seconds (" + str(current_frame) + " frames)")
 
-            # Simulate current interval
-            point_cache.frame_end = current_frame
-            bpy.ops.ptcache.bake({"point_cache": point_cache}, bake=True)
+            # Simulate current interval, the rigid body world is only stepped if the frames are set one after another
+            for frame in range(simulated_frame + 1, current_frame + 1):
+                bpy.context.scene.frame_set(frame)
+            simulated_frame = max(simulated_frame, current_frame)
 
-            # Go to second last frame and get poses
+            # Go to second last frame and get poses (this frame is read from the cache)
             bpy.context.scene.frame_set(current_frame - self._seconds_to_frames(1))
             old_poses = self._get_pose()
 
@@ -203,9 +273,6 @@ def _do_simulation(self):
             bpy.context.scene.frame_set(current_frame)
             new_poses = self._get_pose()
 
-            # Free bake (this will not completely remove the simulation cache, so further simulations can reuse the already calculated frames)
-            bpy.ops.ptcache.free_bake({"point_cache": point_cache})
-
             # If objects have stopped moving between the last two frames, then stop here
             if self._have_objects_stopped_moving(old_poses, new_poses):
                 print("Objects have stopped moving after " + str(current_time) + "  seconds (" + str(current_frame) + " frames)")
@@ -222,8 +289,9 @@ def _get_pose(self):
         objects_poses = {}
         for obj in get_all_mesh_objects():
             if obj.rigid_body.type == 'ACTIVE':
-                location = bpy.context.scene.objects[obj.name].matrix_world.translation.copy()
-                rotation = mathutils.Vector(bpy.context.scene.objects[obj.name].matrix_world.to_euler())
+                matrix_world = obj.matrix_world
+                location = matrix_world.translation.copy()
+                rotation = mathutils.Vector(matrix_world.to_euler())
                 objects_poses.update({obj.name: {'location': location, 'rotation': rotation}})
 
         return objects_poses
@@ -233,9 +301,11 @@ def _set_pose(self, pose_dict):
 
         :param pose_dict: Dict of form {obj_name:{'location':[x, y, z], 'rotation':[x_rot, y_rot, z_rot]}}.
         """
+        objects = bpy.context.scene.objects
         for obj_name in pose_dict:
-            bpy.context.scene.objects[obj_name].location = pose_dict[obj_name]['location']
-            bpy.context.scene.objects[obj_name].rotation_euler = pose_dict[obj_name]['rotation']
+            obj = objects[obj_name]
+            obj.location = pose_dict[obj_name]['location']
+            obj.rotation_euler = pose_dict[obj_name]['rotation']
 
 
     def _have_objects_stopped_moving(self, last_poses, new_poses):
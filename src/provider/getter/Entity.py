@@ -1,10 +1,10 @@
-import re
 from random import sample
 
 import bpy
 import mathutils
 
 from src.main.Provider import Provider
+from src.utility.AttributeIndex import AttributeIndex
 from src.utility.Config import Config
 
 
@@ -99,106 +99,146 @@ class Entity(Provider):
                                               "bounding box to infinity in that direction. Type: float."
     """
 
+    # the index over all objects in the scene and the scene revision it was built for
+    _index = None
+    _index_revision = None
+
     def __init__(self, config):
         Provider.__init__(self, config)
 
+    def is_pure(self):
+        """ Without random sampling the selection only depends on the scene, so its result can be cached.
+
+        :return: True, if neither random_samples nor any nested provider is used.
+        """
+        return not self.config.get_int("random_samples", 0) and \
+               not Provider.contains_provider(self.config.data.get("conditions"))
+
+    @staticmethod
+    def _get_index():
+        """ Returns the index over all objects in the scene, it is rebuilt whenever the scene has changed.
+
+        :return: The index. Type: AttributeIndex.
+        """
+        revision = (Provider.get_scene_revision(), bpy.context.scene.name, len(bpy.context.scene.objects))
+        if Entity._index is None or Entity._index_revision != revision:
+            Entity._index = AttributeIndex(bpy.context.scene.objects, ["name", "type"])
+            Entity._index_revision = revision
+        return Entity._index
+
+    @staticmethod
+    def _parse_bounding_box(value):
+        """ Parses the configuration of an inside/outside custom function.
+
+        :param value: The configuration of the custom function. Type: dict.
+        :return: The lower and the upper border along each axis and whether a position on a border is outside.
+        """
+        conditions = Config(value)
+        if conditions.has_param("min") and conditions.has_param("max"):
+            if any(conditions.has_param(key) for key in ["x_min", "x_max", "y_min", "y_max", "z_min", "z_max"]):
+                raise RuntimeError("An inside/outside condition cannot mix the min/max vector syntax with "
+                                   "the x_min/x_max/y_min/... syntax.")
+            return list(conditions.get_vector3d("min")), list(conditions.get_vector3d("max")), True
+        else:
+            if any(conditions.has_param(key) for key in ["min", "max"]):
+                raise RuntimeError("An inside/outside condition cannot mix the min/max syntax with "
+                                   "the x_min/x_max/y_min/... syntax.")
+            lower = [float("-inf")] * 3
+            upper = [float("inf")] * 3
+            for axis_index in range(3):
+                axis_name = "xyz"[axis_index]
+                if axis_name + "_min" in value:
+                    lower[axis_index] = float(value[axis_name + "_min"])
+                if axis_name + "_max" in value:
+                    upper[axis_index] = float(value[axis_name + "_max"])
+            return lower, upper, False
+
+    @staticmethod
+    def _check_condition(obj, key, value, bounding_box=None):
+        """ Checks if the given object fulfills a single condition.
+
+        :param obj: The object to check.
+        :param key: The key of the condition.
+        :param value: The value of the condition.
+        :param bounding_box: The parsed bounding box, if the condition is an inside/outside custom function.
+        :return: True, if the condition is fulfilled.
+        """
+        # check if the key is a requested custom property
+        requested_custom_property = False
+        requested_custom_function = False
+        if key.startswith('cp_'):
+            requested_custom_property = True
+            key = key[3:]
+        if key.startswith('cf_'):
+            requested_custom_function = True
+            key = key[3:]
+
+        # check if an attribute with this name exists and the key was not a requested custom property
+        if hasattr(obj, key) and not requested_custom_property:
+            attribute = getattr(obj, key)
+            # check if the type of the value of attribute matches desired
+            if isinstance(attribute, type(value)):
+                new_value = value
+            # if not, try to enforce some mathutils-specific type
+            else:
+                if isinstance(attribute, mathutils.Vector):
+                    new_value = mathutils.Vector(value)
+                elif isinstance(attribute, mathutils.Euler):
+                    new_value = mathutils.Euler(value)
+                elif isinstance(attribute, mathutils.Color):
+                    new_value = mathutils.Color(value)
+                # raise an exception if it is none of them
+                else:
+                    raise Exception("Types are not matching: %s and %s !" % (type(attribute), type(value)))
+            # or check for equality
+            return (isinstance(attribute, str) and
+                    AttributeIndex.compile_pattern(value).fullmatch(attribute) is not None) or attribute == new_value
+        # check if a custom property with this name exists
+        elif key in obj and requested_custom_property:
+            # check if the type of the value of such custom property matches desired
+            if isinstance(obj[key], type(value)) or (isinstance(obj[key], int) and isinstance(value, bool)):
+                # if is a string and if the whole string matches the given pattern
+                return (isinstance(obj[key], str) and
+                        AttributeIndex.compile_pattern(value).fullmatch(obj[key]) is not None) or obj[key] == value
+            # raise an exception if not
+            else:
+                raise Exception("Types are not matching: {} and {} for key: {}".format(type(obj[key]),
+                                                                                       type(value), key))
+        elif requested_custom_function and any([key == "inside", key == "outside"]):
+            lower, upper, borders_are_outside = bounding_box
+            if borders_are_outside:
+                is_inside = all(lower[i] < obj.location[i] < upper[i] for i in range(3))
+            else:
+                is_inside = all(lower[i] <= obj.location[i] <= upper[i] for i in range(3))
+            return (key == "inside" and is_inside) or (key == "outside" and not is_inside)
+        return False
+
     def perform_and_condition_check(self, and_condition, objects):
         """ Checks all objects in the scene if all given conditions are true for an object, it is added to the list.
 
+        The name, the type and the custom properties are looked up in an index over all objects, all other
+        conditions are only checked for the objects which fulfilled the previous conditions.
+
         :param and_condition: Given conditions. Type: dict.
         :param objects: Objects, that are already in the return list. Type: list.
         :return: Objects that fulfilled given conditions. Type: list.
         """
-        new_objects = []
-        # through every object
-        for obj in bpy.context.scene.objects:
-            # if object is in list, skip it
-            if obj in objects:
-                continue
-            select_object = True
-            # run over all conditions and check if any one of them holds, if one does not work -> go to next obj
-            for key, value in and_condition.items():
-                # check if the key is a requested custom property
-                requested_custom_property = False
-                requested_custom_function = False
-                if key.startswith('cp_'):
-                    requested_custom_property = True
-                    key = key[3:]
-                if key.startswith('cf_'):
-                    requested_custom_function = True
-                    key = key[3:]
-
-                # check if an attribute with this name exists and the key was not a requested custom property
-                if hasattr(obj, key) and not requested_custom_property:
-                    # check if the type of the value of attribute matches desired
-                    if isinstance(getattr(obj, key), type(value)):
-                        new_value = value
-                    # if not, try to enforce some mathutils-specific type
-                    else:
-                        if isinstance(getattr(obj, key), mathutils.Vector):
-                            new_value = mathutils.Vector(value)
-                        elif isinstance(getattr(obj, key), mathutils.Euler):
-                            new_value = mathutils.Euler(value)
-                        elif isinstance(getattr(obj, key), mathutils.Color):
-                            new_value = mathutils.Color(value)
-                        # raise an exception if it is none of them
-                        else:
-                            raise Exception("Types are not matching: %s and %s !"
-                                            % (type(getattr(obj, key)), type(value)))
-                    # or check for equality
-                    if not ((isinstance(getattr(obj, key), str) and re.fullmatch(value, getattr(obj, key)) is not None)
-                            or getattr(obj, key) == new_value):
-                        select_object = False
-                        break
-                # check if a custom property with this name exists
-                elif key in obj and requested_custom_property:
-                    # check if the type of the value of such custom property matches desired
-                    if isinstance(obj[key], type(value)) or (isinstance(obj[key], int) and isinstance(value, bool)):
-                        # if is a string and if the whole string matches the given pattern
-                        if not ((isinstance(obj[key], str) and re.fullmatch(value, obj[key]) is not None) or
-                                obj[key] == value):
-                            select_object = False
-                            break
-                    # raise an exception if not
-                    else:
-                        raise Exception("Types are not matching: {} and {} for key: {}".format(type(obj[key]),
-                                                                                               type(value), key))
-                elif requested_custom_function and any([key == "inside", key == "outside"]):
-                    conditions = Config(value)
-                    if conditions.has_param("min") and conditions.has_param("max"):
-                        if any(conditions.has_param(key) for key in
-                               ["x_min", "x_max", "y_min", "y_max", "z_min", "z_max"]):
-                            raise RuntimeError("An inside/outside condition cannot mix the min/max vector syntax with "
-                                               "the x_min/x_max/y_min/... syntax.")
-
-                        bb_min = conditions.get_vector3d("min")
-                        bb_max = conditions.get_vector3d("max")
-                        is_inside = all(bb_min[i] < obj.location[i] < bb_max[i] for i in range(3))
-                    else:
-                        if any(conditions.has_param(key) for key in ["min", "max"]):
-                            raise RuntimeError("An inside/outside condition cannot mix the min/max syntax with "
-                                               "the x_min/x_max/y_min/... syntax.")
-                        is_inside = True
-                        for axis_index in range(3):
-                            axis_name = "xyz"[axis_index]
-                            for direction in ["min", "max"]:
-                                key_name = "{}_{}".format(axis_name, direction)
-                                if key_name in value:
-                                    real_position = obj.location[axis_index]
-                                    border_position = float(value[key_name])
-                                    if (direction == "max" and real_position > border_position) or (
-                                            direction == "min" and real_position < border_position):
-                                        is_inside = False
-
-                    if (key == "inside" and not is_inside) or (key == "outside" and is_inside):
-                        select_object = False
-                        break
-                else:
-                    select_object = False
-                    break
-            if select_object:
-                new_objects.append(obj)
-        return new_objects
+        index = Entity._get_index()
+        # objects which are already in the list are skipped
+        candidates = index.all_indices - index.get_indices(objects)
+        # run over all conditions, each one reduces the set of objects which fulfill all of them
+        for key, value in and_condition.items():
+            if not candidates:
+                break
+            selection = index.select(key, value, candidates)
+            if selection is None:
+                bounding_box = None
+                if key in ["cf_inside", "cf_outside"]:
+                    bounding_box = Entity._parse_bounding_box(value)
+                selection = {i for i in candidates if Entity._check_condition(index.items[i], key, value,
+                                                                              bounding_box)}
+            candidates = selection
+        return index.get_items(candidates)
 
     def run(self):
         """ Processes defined conditions and compiles a list of objects.
@@ -1,9 +1,10 @@
-import re
 from random import sample
 
+import bpy
 import mathutils
 
 from src.main.Provider import Provider
+from src.utility.AttributeIndex import AttributeIndex
 from src.utility.BlenderUtility import get_all_materials
 from src.utility.Utility import Utility
 
@@ -92,127 +93,152 @@ class Material(Provider):
                                                   "amount of principled bsdf nodes. Type: int."
     """
 
+    # the index over all materials and the scene revision it was built for
+    _index = None
+    _index_revision = None
+
     def __init__(self, config):
         Provider.__init__(self, config)
 
+    def is_pure(self):
+        """ Without random sampling the selection only depends on the scene, so its result can be cached.
+
+        :return: True, if neither random_samples nor any nested provider is used.
+        """
+        return not self.config.get_int("random_samples", 0) and \
+               not Provider.contains_provider(self.config.data.get("conditions"))
+
+    @staticmethod
+    def _get_index(used_materials_to_check=None):
+        """ Returns the index over all materials, it is rebuilt whenever a datablock was added or removed.
+
+        :param used_materials_to_check: If given, a temporary index over only these materials is returned.
+        :return: The index. Type: AttributeIndex.
+        """
+        if used_materials_to_check is not None:
+            # materials which appear several times or are None are never selected twice or at all
+            return AttributeIndex(dict.fromkeys(material for material in used_materials_to_check
+                                                if material is not None), ["name"])
+        revision = Provider.get_scene_revision([bpy.data.materials])
+        if Material._index is None or Material._index_revision != revision:
+            Material._index = AttributeIndex(get_all_materials(), ["name"])
+            Material._index_revision = revision
+        return Material._index
+
+    @staticmethod
+    def _get_amount_of_nodes(index, item_index, node_type):
+        """ Returns the amount of nodes of the given type inside of a material.
+
+        The amount is cached in the index, until the number of nodes of the material changes.
+
+        :param index: The index containing the material. Type: AttributeIndex.
+        :param item_index: The index of the material inside the index.
+        :param node_type: The type of the nodes to count, e.g. "TexImage".
+        :return: The amount of nodes.
+        """
+        nodes = index.items[item_index].node_tree.nodes
+        cached = index.derived_values.get((item_index, node_type))
+        if cached is None or cached[0] != len(nodes):
+            found_nodes = Utility.get_nodes_with_type(nodes, node_type)
+            cached = (len(nodes), len(found_nodes) if found_nodes is not None else 0)
+            index.derived_values[(item_index, node_type)] = cached
+        return cached[1]
+
+    @staticmethod
+    def _check_condition(index, item_index, key, value):
+        """ Checks if the given material fulfills a single condition.
+
+        :param index: The index containing the material. Type: AttributeIndex.
+        :param item_index: The index of the material inside the index.
+        :param key: The key of the condition.
+        :param value: The value of the condition.
+        :return: True, if the condition is fulfilled.
+        """
+        material = index.items[item_index]
+        # check if the key is a requested custom property
+        requested_custom_property = False
+        requested_custom_function = False
+        if key.startswith('cp_'):
+            requested_custom_property = True
+            key = key[3:]
+        if key.startswith('cf_'):
+            requested_custom_function = True
+            key = key[3:]
+        if hasattr(material, key) and not requested_custom_property:
+            attribute = getattr(material, key)
+            # check if the type of the value of attribute matches desired
+            if isinstance(attribute, type(value)):
+                new_value = value
+            # if not, try to enforce some mathutils-specific type
+            else:
+                if isinstance(attribute, mathutils.Vector):
+                    new_value = mathutils.Vector(value)
+                elif isinstance(attribute, mathutils.Euler):
+                    new_value = mathutils.Euler(value)
+                elif isinstance(attribute, mathutils.Color):
+                    new_value = mathutils.Color(value)
+                # raise an exception if it is none of them
+                else:
+                    raise Exception("Types are not matching: %s and %s !" % (type(attribute), type(value)))
+            # or check for equality
+            return (isinstance(attribute, str) and
+                    AttributeIndex.compile_pattern(value).fullmatch(attribute) is not None) or attribute == new_value
+        # check if a custom property with this name exists
+        elif key in material and requested_custom_property:
+            # check if the type of the value of such custom property matches desired
+            if isinstance(material[key], type(value)) or (isinstance(material[key], int) and isinstance(value, bool)):
+                # if it is a string and if the whole string matches the given pattern
+                return (isinstance(material[key], str) and
+                        AttributeIndex.compile_pattern(value).fullmatch(material[key]) is not None) or \
+                       material[key] == value
+            else:
+                # raise an exception if not
+                raise Exception("Types are not matching: {} and {} !".format(type(material[key]), type(value)))
+        elif requested_custom_function:
+            if key.startswith("texture_amount_"):
+                node_type = "TexImage"
+            elif key.startswith("principled_bsdf_amount_"):
+                node_type = "BsdfPrincipled"
+            else:
+                return False
+            if not material.use_nodes:
+                return False
+            value = int(value)
+            amount_of_nodes = Material._get_amount_of_nodes(index, item_index, node_type)
+            if "min" in key:
+                return amount_of_nodes >= value
+            elif "max" in key:
+                return amount_of_nodes <= value
+            elif "eq" in key:
+                return amount_of_nodes == value
+            else:
+                raise Exception("This type of key is unknown: {}".format(key))
+        return False
+
     @staticmethod
     def perform_and_condition_check(and_condition, materials, used_materials_to_check=None):
         """ Checks for all materials in the scene if all given conditions are true, collects them in the return list.
 
+        The name and the custom properties are looked up in an index over all materials, all other conditions are
+        only checked for the materials which fulfilled the previous conditions.
+
         :param and_condition: Given conditions. Type: dict.
         :param materials: Materials, that are already in the return list. Type: list.
         :param used_materials_to_check: a list of materials to perform the check on. Type: list. Default: all materials
         :return: Materials that fulfilled given conditions. Type: list.
         """
-        new_materials = []
-        if used_materials_to_check is None:
-            used_materials_to_check = get_all_materials()
-
-        # through every material
-        for material in used_materials_to_check:
-            if material in new_materials or material in materials:
-                continue
-
-            select_material = True
-            for key, value in and_condition.items():
-                # check if the key is a requested custom property
-                requested_custom_property = False
-                requested_custom_function = False
-                if key.startswith('cp_'):
-                    requested_custom_property = True
-                    key = key[3:]
-                if key.startswith('cf_'):
-                    requested_custom_function = True
-                    key = key[3:]
-                if hasattr(material, key) and not requested_custom_property:
-                    # check if the type of the value of attribute matches desired
-                    if isinstance(getattr(material, key), type(value)):
-                        new_value = value
-                    # if not, try to enforce some mathutils-specific type
-                    else:
-                        if isinstance(getattr(material, key), mathutils.Vector):
-                            new_value = mathutils.Vector(value)
-                        elif isinstance(getattr(material, key), mathutils.Euler):
-                            new_value = mathutils.Euler(value)
-                        elif isinstance(getattr(material, key), mathutils.Color):
-                            new_value = mathutils.Color(value)
-                        # raise an exception if it is none of them
-                        else:
-                            raise Exception("Types are not matching: %s and %s !"
-                                            % (type(getattr(material, key)), type(value)))
-                    # or check for equality
-                    if not ((isinstance(getattr(material, key), str) and re.fullmatch(value, getattr(material, key)) is not None)
-                            or getattr(material, key) == new_value):
-                        select_material = False
-                        break
-                # check if a custom property with this name exists
-                elif key in material and requested_custom_property:
-                    # check if the type of the value of such custom property matches desired
-                    if isinstance(material[key], type(value)) or (isinstance(material[key], int) and isinstance(value, bool)):
-                        # if it is a string and if the whole string matches the given pattern
-                        if not ((isinstance(material[key], str) and re.fullmatch(value, material[key]) is not None) or
-                                material[key] == value):
-                            select_material = False
-                            break
-                    else:
-                        # raise an exception if not
-                        raise Exception("Types are not matching: {} and {} !".format(type(material[key]), type(value)))
-                elif requested_custom_function:
-                    if key.startswith("texture_amount_"):
-                        if material.use_nodes:
-                            value = int(value)
-                            nodes = material.node_tree.nodes
-                            texture_nodes = Utility.get_nodes_with_type(nodes, "TexImage")
-                            amount_of_texture_nodes = len(texture_nodes) if texture_nodes is not None else 0
-                            if "min" in key:
-                                if not (amount_of_texture_nodes >= value):
-                                    select_material = False
-                                    break
-                            elif "max" in key:
-                                if not (amount_of_texture_nodes <= value):
-                                    select_material = False
-                                    break
-                            elif "eq" in key:
-                                if not (amount_of_texture_nodes == value):
-                                    select_material = False
-                                    break
-                            else:
-                                raise Exception("This type of key is unknown: {}".format(key))
-                        else:
-                            select_material = False
-                            break
-                    elif key.startswith("principled_bsdf_amount_"):
-                        if material.use_nodes:
-                            value = int(value)
-                            nodes = material.node_tree.nodes
-                            principled = Utility.get_nodes_with_type(nodes, "BsdfPrincipled")
-                            amount_of_principled_bsdf_nodes = len(principled) if principled is not None else 0
-                            if "min" in key:
-                                if not (amount_of_principled_bsdf_nodes >= value):
-                                    select_material = False
-                                    break
-                            elif "max" in key:
-                                if not (amount_of_principled_bsdf_nodes <= value):
-                                    select_material = False
-                                    break
-                            elif "eq" in key:
-                                if not (amount_of_principled_bsdf_nodes == value):
-                                    select_material = False
-                                    break
-                            else:
-                                raise Exception("This type of key is unknown: {}".format(key))
-                        else:
-                            select_material = False
-                            break
-                    else:
-                        select_material = False
-                        break
-                else:
-                    select_material = False
-                    break
-            if select_material:
-                new_materials.append(material)
-        return new_materials
+        index = Material._get_index(used_materials_to_check)
+        # materials which are already in the list are skipped
+        candidates = index.all_indices - index.get_indices(materials)
+        # run over all conditions, each one reduces the set of materials which fulfill all of them
+        for key, value in and_condition.items():
+            if not candidates:
+                break
+            selection = index.select(key, value, candidates)
+            if selection is None:
+                selection = {i for i in candidates if Material._check_condition(index, i, key, value)}
+            candidates = selection
+        return index.get_items(candidates)
 
     def run(self):
         """ Processes defined conditions and compiles a list of materials.
@@ -1,9 +1,10 @@
-import re
 from random import sample
 
+import bpy
 import mathutils
 
 from src.main.Provider import Provider
+from src.utility.AttributeIndex import AttributeIndex
 from src.utility.BlenderUtility import get_all_textures
 
 
@@ -80,9 +81,21 @@ class Texture(Provider):
 
     """
 
+    # the index over all textures and the scene revision it was built for
+    _index = None
+    _index_revision = None
+
     def __init__(self, config):
         Provider.__init__(self, config)
 
+    def is_pure(self):
+        """ Without random sampling the selection only depends on the scene, so its result can be cached.
+
+        :return: True, if neither random_samples nor any nested provider is used.
+        """
+        return not self.config.get_int("random_samples", 0) and \
+               not Provider.contains_provider(self.config.data.get("conditions"))
+
     def run(self):
         conditions = self.config.get_raw_dict('conditions')
 
@@ -107,75 +120,91 @@ def run(self):
 
         return textures
 
+    @staticmethod
+    def _get_index(used_textures_to_check=None):
+        """ Returns the index over all textures, it is rebuilt whenever a datablock was added or removed.
+
+        :param used_textures_to_check: If given, a temporary index over only these textures is returned.
+        :return: The index. Type: AttributeIndex.
+        """
+        if used_textures_to_check is not None:
+            return AttributeIndex(dict.fromkeys(texture for texture in used_textures_to_check
+                                                if texture is not None), ["name", "type"])
+        revision = Provider.get_scene_revision([bpy.data.textures])
+        if Texture._index is None or Texture._index_revision != revision:
+            Texture._index = AttributeIndex(get_all_textures(), ["name", "type"])
+            Texture._index_revision = revision
+        return Texture._index
+
+    @staticmethod
+    def _check_condition(texture, key, value):
+        """ Checks if the given texture fulfills a single condition.
+
+        :param texture: The texture to check.
+        :param key: The key of the condition.
+        :param value: The value of the condition.
+        :return: True, if the condition is fulfilled.
+        """
+        # check if the key is a requested custom property
+        requested_custom_property = False
+        if key.startswith('cp_'):
+            requested_custom_property = True
+            key = key[3:]
+        if hasattr(texture, key) and not requested_custom_property:
+            attribute = getattr(texture, key)
+            # check if the type of the value of attribute matches desired
+            if isinstance(attribute, type(value)):
+                new_value = value
+            # if not, try to enforce some mathutils-specific type
+            else:
+                if isinstance(attribute, mathutils.Vector):
+                    new_value = mathutils.Vector(value)
+                elif isinstance(attribute, mathutils.Euler):
+                    new_value = mathutils.Euler(value)
+                elif isinstance(attribute, mathutils.Color):
+                    new_value = mathutils.Color(value)
+                # raise an exception if it is none of them
+                else:
+                    raise Exception("Types are not matching: %s and %s !" % (type(attribute), type(value)))
+            # or check for equality
+            return (isinstance(attribute, str) and
+                    AttributeIndex.compile_pattern(value).fullmatch(attribute) is not None) or attribute == new_value
+        # check if a custom property with this name exists
+        elif key in texture and requested_custom_property:
+            # check if the type of the value of such custom property matches desired
+            if isinstance(texture[key], type(value)) or (isinstance(texture[key], int) and isinstance(value, bool)):
+                # if it is a string and if the whole string matches the given pattern
+                return (isinstance(texture[key], str) and
+                        AttributeIndex.compile_pattern(value).fullmatch(texture[key]) is not None) or \
+                       texture[key] == value
+            else:
+                # raise an exception if not
+                raise Exception("Types are not matching: {} and {} !".format(type(texture[key]), type(value)))
+        return False
+
     @staticmethod
     def perform_and_condition_check(and_condition, textures, used_textures_to_check=None):
         """ Checks for all textures and if all given conditions are true, collects them in the return list.
 
+        The name, the type and the custom properties are looked up in an index over all textures, all other
+        conditions are only checked for the textures which fulfilled the previous conditions.
+
         :param and_condition: Given conditions. Type: dict.
         :param textures: Textures, that are already in the return list. Type: list.
         :param used_textures_to_check: Textures to perform the check on. Type: list. Default: all materials
         :return: Textures that comply with given conditions. Type: list.
         """
-        new_textures = []
-        if used_textures_to_check is None:
-            used_textures_to_check = get_all_textures()
-
-        for texture in used_textures_to_check:
-            if texture in new_textures or texture in textures:
-                continue
-
-            select_texture = True
-            for key, value in and_condition.items():
-                # check if the key is a requested custom property
-                requested_custom_property = False
-                #requested_custom_function = False
-                if key.startswith('cp_'):
-                    requested_custom_property = True
-                    key = key[3:]
-                if key.startswith('cf_'):
-                    #requested_custom_function = True
-                    #key = key[3:]
-                    raise RuntimeError("Custom functions for texture objects are yet to be implemented!")
-                if hasattr(texture, key) and not requested_custom_property:
-                    # check if the type of the value of attribute matches desired
-                    if isinstance(getattr(texture, key), type(value)):
-                        new_value = value
-                    # if not, try to enforce some mathutils-specific type
-                    else:
-                        if isinstance(getattr(texture, key), mathutils.Vector):
-                            new_value = mathutils.Vector(value)
-                        elif isinstance(getattr(texture, key), mathutils.Euler):
-                            new_value = mathutils.Euler(value)
-                        elif isinstance(getattr(texture, key), mathutils.Color):
-                            new_value = mathutils.Color(value)
-                        # raise an exception if it is none of them
-                        else:
-                            raise Exception("Types are not matching: %s and %s !"
-                                            % (type(getattr(texture, key)), type(value)))
-                    # or check for equality
-                    if not ((isinstance(getattr(texture, key), str) and
-                             re.fullmatch(value, getattr(texture, key)) is not None)
-                            or getattr(texture, key) == new_value):
-                        select_texture = False
-                        break
-                    # check if a custom property with this name exists
-                elif key in texture and requested_custom_property:
-                    # check if the type of the value of such custom property matches desired
-                    if isinstance(texture[key], type(value)) or (
-                            isinstance(texture[key], int) and isinstance(value, bool)):
-                        # if it is a string and if the whole string matches the given pattern
-                        if not ((isinstance(texture[key], str) and re.fullmatch(value, texture[key]) is not None) or
-                                texture[key] == value):
-                            select_texture = False
-                            break
-                    else:
-                        # raise an exception if not
-                        raise Exception("Types are not matching: {} and {} !".format(type(texture[key]), type(value)))
-                else:
-                    select_texture = False
-                    break
-
-            if select_texture:
-                new_textures.append(texture)
-
-        return new_textures
+        index = Texture._get_index(used_textures_to_check)
+        # textures which are already in the list are skipped
+        candidates = index.all_indices - index.get_indices(textures)
+        # run over all conditions, each one reduces the set of textures which fulfill all of them
+        for key, value in and_condition.items():
+            if not candidates:
+                break
+            if key.startswith('cf_'):
+                raise RuntimeError("Custom functions for texture objects are yet to be implemented!")
+            selection = index.select(key, value, candidates)
+            if selection is None:
+                selection = {i for i in candidates if Texture._check_condition(index.items[i], key, value)}
+            candidates = selection
+        return index.get_items(candidates)
@@ -42,3 +42,28 @@ def run(self):
             position[i] = random.uniform(min[i], max[i])
 
         return position
+
+    def run_batch(self, number_of_samples):
+        """ Samples several vectors at once, the min and max values are only read once.
+
+        The vectors are drawn in the same order as by run(), so the result is the same as the one of calling run()
+        number_of_samples times.
+
+        :param number_of_samples: The number of vectors to sample.
+        :return: Sampled values. Type: list of Mathutils Vector
+        """
+        if Provider.contains_provider(self.config.data):
+            # nested providers have to be sampled anew for each vector
+            return Provider.run_batch(self, number_of_samples)
+        # minimum values vector
+        min = self.config.get_vector3d("min")
+        # maximum values vector
+        max = self.config.get_vector3d("max")
+
+        positions = []
+        for _ in range(number_of_samples):
+            position = mathutils.Vector()
+            for i in range(3):
+                position[i] = random.uniform(min[i], max[i])
+            positions.append(position)
+        return positions
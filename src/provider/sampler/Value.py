@@ -82,3 +82,31 @@ def run(self):
             raise Exception("Cannot sample this type: " + val_type)
 
         return val
+
+    def run_batch(self, number_of_samples):
+        """ Samples several values at once.
+
+        The numpy random generator returns the same values for one vectorized call as for the same number of single
+        calls, so the result is the same as the one of calling run() number_of_samples times.
+
+        :param number_of_samples: The number of values to sample.
+        :return: Sampled values. Type: list
+        """
+        if Provider.contains_provider(self.config.data):
+            # nested providers have to be sampled anew for each value
+            return Provider.run_batch(self, number_of_samples)
+        val_type = self.config.get_string("type").lower()
+        mode = self.config.get_string("mode", "uniform")
+        if val_type == 'bool' or val_type == 'boolean':
+            return [bool(val) for val in np.random.randint(0, 2, size=number_of_samples)]
+        elif val_type == 'int' and mode == "uniform":
+            return np.random.randint(self.config.get_int('min'), self.config.get_int('max'),
+                                     size=number_of_samples).tolist()
+        elif val_type == 'float' and mode == "uniform":
+            return np.random.uniform(self.config.get_float('min'), self.config.get_float('max'),
+                                     size=number_of_samples).tolist()
+        elif val_type == 'float' and mode == "normal":
+            return np.random.normal(loc=self.config.get_float('mean'), scale=self.config.get_float('std_dev'),
+                                    size=number_of_samples).tolist()
+        # unknown types and modes raise the same errors as run()
+        return Provider.run_batch(self, number_of_samples)
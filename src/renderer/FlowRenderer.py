@@ -98,7 +98,7 @@ def run(self):
                     if get_forward_flow:
 
                         file_path = temporary_fwd_flow_file_path + "%04d" % frame + ".exr"
-                        fwd_flow_field = load_image(file_path, num_channels=4).astype(np.float32)
+                        fwd_flow_field = load_image(file_path, num_channels=4, dtype=np.float32)
 
                         if not self.config.get_bool('blender_image_coordinate_style', False):
                             fwd_flow_field[:, :, 1] = fwd_flow_field[:, :, 1] * -1
@@ -111,7 +111,7 @@ def run(self):
 
                     if get_backward_flow:
                         file_path = temporary_bwd_flow_file_path + "%04d" % frame + ".exr"
-                        bwd_flow_field = load_image(file_path, num_channels=4).astype(np.float32)
+                        bwd_flow_field = load_image(file_path, num_channels=4, dtype=np.float32)
 
                         if not self.config.get_bool('blender_image_coordinate_style', False):
                             bwd_flow_field[:, :, 1] = bwd_flow_field[:, :, 1] * -1
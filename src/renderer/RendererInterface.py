@@ -9,6 +9,7 @@
 from src.main.Module import Module
 from src.utility.BlenderUtility import get_all_mesh_objects
 from src.utility.Utility import Utility
+from src.utility.Profiler import Profiler
 
 
 class RendererInterface(Module):
@@ -296,7 +297,8 @@ def _render(self, default_prefix, custom_file_path=None):
             # blender will render all frames in [frame_start, frame_ned]
             bpy.context.scene.frame_end -= 1
             if not self._avoid_rendering:
-                bpy.ops.render.render(animation=True, write_still=True)
+                with Profiler.Block("render", "render"):
+                    bpy.ops.render.render(animation=True, write_still=True)
             # Revert changes
             bpy.context.scene.frame_end += 1
 
@@ -225,7 +225,7 @@ def run(self):
                     list_of_used_attributes = []
                     used_channels = []
                     for channel_id in range(result_channels):
-                        resulting_map = np.empty((segmap.shape[0], segmap.shape[1]))
+                        resulting_map = None
                         was_used = False
                         current_attribute = used_attributes[channel_id]
                         org_attribute = current_attribute
@@ -258,6 +258,9 @@ def run(self):
                             last_state_save_in_csv = None
                             # this avoids that for certain attributes only the default value is written
                             non_default_value_was_used = False
+                            # lookup table mapping each object id to its value, the whole frame is then mapped at
+                            # once, instead of doing one pass over the image per object
+                            attribute_lut = np.empty(max_id + 1)
                             # iterate over all object ids
                             for object_id in used_object_ids:
                                 is_default_value = False
@@ -289,7 +292,7 @@ def run(self):
                                 # check if the value should be saved as an image or in the csv file
                                 save_in_csv = False
                                 try:
-                                    resulting_map[segmap == object_id] = used_value
+                                    attribute_lut[object_id] = used_value
                                     was_used = True
                                     if not is_default_value:
                                         non_default_value_was_used = True
@@ -310,6 +313,9 @@ def run(self):
                                         save_in_csv_attributes[object_id][used_attribute] = used_value
                                     else:
                                         save_in_csv_attributes[object_id] = {used_attribute: used_value}
+                            if was_used:
+                                # map every pixel to the value of its object in one gather
+                                resulting_map = attribute_lut[segmap]
                         if was_used and non_default_value_was_used:
                             used_channels.append(org_attribute)
                             combined_result_map.append(resulting_map)
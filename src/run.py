@@ -23,26 +23,112 @@
 # Read args
 argv = sys.argv
 batch_index_file = None
+batch_queue_address = None
+server_port = None
+memory_ceiling = None
+resume = "--resume" in argv
+if resume:
+    # the flag is appended after the placeholder arguments, so remove it before they are read
+    argv = argv[:len(argv) - 1 - argv[::-1].index("--resume")] + argv[len(argv) - argv[::-1].index("--resume"):]
 
 if "--batch-process" in argv:
     batch_index_file = argv[argv.index("--batch-process") + 1]
+if "--batch-queue" in argv:
+    batch_queue_address = argv[argv.index("--batch-queue") + 1]
+if "--serve" in argv:
+    server_port = int(argv[argv.index("--serve") + 1])
+if "--memory-ceiling" in argv:
+    # the memory ceiling is given in MB
+    memory_ceiling = int(argv[argv.index("--memory-ceiling") + 1]) * 1024 ** 2
 
 argv = argv[argv.index("--") + 1:]
 working_dir = os.path.dirname(os.path.abspath(__file__))
 
 from src.main.Pipeline import Pipeline
 from src.utility.Utility import Utility
+from src.utility.MemoryUtility import MemoryUtility
 
 config_path = argv[0]
 temp_dir = argv[1]
-if batch_index_file == None:
-    pipeline = Pipeline(config_path, argv[2:], working_dir, temp_dir)
+if server_port is not None:
+    # Persistent worker: run all jobs submitted via the JobServerClient in this blender process
+    import shutil
+    import traceback
+    import uuid
+    from src.main.GlobalStorage import GlobalStorage
+    from src.utility.JobServer import JobServer
+
+    def run_job(job_config_path, job_args):
+        job_temp_dir = os.path.join(temp_dir, "job_" + uuid.uuid4().hex)
+        try:
+            # Make sure no values of the previous job are left
+            GlobalStorage.reset()
+            pipeline = Pipeline(job_config_path, job_args, working_dir, job_temp_dir)
+            pipeline.run()
+            pipeline._cleanup()
+            return 0
+        except Exception:
+            traceback.print_exc()
+            return 1
+        finally:
+            shutil.rmtree(job_temp_dir, ignore_errors=True)
+
+    JobServer(server_port).serve(run_job)
+elif batch_queue_address is not None:
+    # Worker of a multi process batch: pull the lines from the queue of the scheduler in run.py
+    import traceback
+    from src.utility.BatchScheduler import BatchWorkerClient
+
+    client = BatchWorkerClient(batch_queue_address)
+    next_line = client.next_line()
+    while next_line is not None:
+        line_index, line = next_line
+        try:
+            pipeline = Pipeline(config_path, line.split(" "), working_dir, temp_dir,
+                                track_memory=memory_ceiling is not None)
+            pipeline.run()
+            client.report(line_index, 0)
+        except Exception:
+            traceback.print_exc()
+            client.report(line_index, 1)
+            pipeline = None
+
+        if memory_ceiling is not None and MemoryUtility.get_rss() > memory_ceiling:
+            print("Memory ceiling exceeded, purging all data")
+            if pipeline is not None:
+                pipeline._cleanup()
+            if MemoryUtility.get_rss() > memory_ceiling:
+                # Purging did not suffice, the scheduler restarts this worker
+                client.close()
+                sys.exit(3)
+        next_line = client.next_line()
+    client.close()
+elif batch_index_file == None:
+    pipeline = Pipeline(config_path, argv[2:], working_dir, temp_dir, resume=resume)
     pipeline.run()
 else:
     with open(Utility.resolve_path(batch_index_file), "r") as f:
         lines = f.readlines()
 
-        for line in lines:
-            args = line.split(" ")
-            pipeline = Pipeline(config_path, args, working_dir, temp_dir)
-            pipeline.run()
+    # If blender was restarted because of the memory ceiling, continue with the next scene
+    batch_progress_path = os.path.join(temp_dir, "batch_progress")
+    start_line = 0
+    if os.path.exists(batch_progress_path):
+        with open(batch_progress_path, "r") as f:
+            start_line = int(f.read())
+
+    for line_index in range(start_line, len(lines)):
+        args = lines[line_index].split(" ")
+        pipeline = Pipeline(config_path, args, working_dir, temp_dir, track_memory=memory_ceiling is not None)
+        pipeline.run()
+
+        rss = MemoryUtility.get_rss()
+        print("Memory after scene {}: {:.1f} MB".format(line_index, rss / 1024 ** 2))
+        if memory_ceiling is not None and rss > memory_ceiling and line_index + 1 < len(lines):
+            print("Memory ceiling exceeded, purging all data")
+            pipeline._cleanup()
+            if MemoryUtility.get_rss() > memory_ceiling:
+                # Purging did not suffice, so exit and let run.py restart blender with the next scene
+                with open(batch_progress_path, "w") as f:
+                    f.write(str(line_index + 1))
+                sys.exit(3)
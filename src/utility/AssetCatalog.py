@@ -0,0 +1,102 @@
+import hashlib
+import json
+import os
+import sqlite3
+import warnings
+
+
+class AssetCatalog:
+    """ A persistent on-disk catalog of the asset files of a dataset, stored as sqlite database.
+
+    Scanning the directory tree of a big dataset can take a long time, especially if it is stored on a network drive.
+    The loaders therefore store the result of a scan in the catalog and only repeat it, if one of the watched paths
+    has changed. A catalog is split into partitions, e.g. one per category, each of them is validated and rebuilt
+    separately. A partition is valid as long as the modification times of its watched paths did not change. As the
+    modification time of a directory only changes if a direct child is added or removed, the loaders watch the
+    directories which contain the asset folders. Adding or removing files inside of an existing asset folder is
+    therefore not detected, in that case the catalog has to be deleted.
+
+    The catalog is only used if a loader enables it via use_asset_catalog. The catalogs are stored in the directory
+    given by the environment variable BLENDER_PROC_CATALOG_DIR, by default in ~/.cache/blender_proc/asset_catalogs.
+    If the catalog can not be used, the scan is performed on every call.
+    """
+
+    # Name of the environment variable, which contains the directory the catalogs are stored in
+    ENV_NAME = "BLENDER_PROC_CATALOG_DIR"
+
+    # increase this, if the layout of the database changes
+    VERSION = 1
+
+    def __init__(self, data_path):
+        """
+        :param data_path: The root directory of the dataset, each dataset gets its own catalog.
+        """
+        self.data_path = os.path.abspath(data_path)
+        catalog_dir = os.environ.get(AssetCatalog.ENV_NAME,
+                                     os.path.join(os.path.expanduser("~"), ".cache", "blender_proc", "asset_catalogs"))
+        catalog_name = hashlib.sha1(self.data_path.encode()).hexdigest() + "_v{}.sqlite".format(AssetCatalog.VERSION)
+        self.catalog_path = os.path.join(catalog_dir, catalog_name)
+
+    @staticmethod
+    def _get_signature(watched_paths):
+        """ Returns the modification time of all watched paths.
+
+        :param watched_paths: The list of files and directories to watch.
+        :return: The signature as json string.
+        """
+        signature = []
+        for path in sorted(watched_paths):
+            signature.append([path, os.stat(path).st_mtime_ns if os.path.exists(path) else None])
+        return json.dumps(signature)
+
+    def _connect(self):
+        """ Opens the catalog and creates its tables, if they do not exist yet.
+
+        :return: The connection to the database.
+        """
+        os.makedirs(os.path.dirname(self.catalog_path), exist_ok=True)
+        # many jobs might open the same catalog at the same time
+        connection = sqlite3.connect(self.catalog_path, timeout=60)
+        connection.execute("CREATE TABLE IF NOT EXISTS partitions (name TEXT PRIMARY KEY, signature TEXT)")
+        connection.execute("CREATE TABLE IF NOT EXISTS assets (partition TEXT, category TEXT, path TEXT)")
+        connection.execute("CREATE INDEX IF NOT EXISTS assets_partition ON assets (partition)")
+        connection.commit()
+        return connection
+
+    def get_assets(self, partition, watched_paths, scan_function):
+        """ Returns all assets of the given partition, the partition is only scanned if it has changed.
+
+        :param partition: The name of the partition, e.g. the category of the assets.
+        :param watched_paths: The list of files and directories, whose modification invalidates the partition.
+        :param scan_function: Is called without arguments, if the partition has to be scanned. It has to return a
+                              list of tuples of category and asset path.
+        :return: The list of tuples of category and asset path in the order the scan_function returned them.
+        """
+        signature = AssetCatalog._get_signature(watched_paths)
+        try:
+            connection = self._connect()
+        except (sqlite3.Error, OSError) as e:
+            warnings.warn("The asset catalog {} could not be opened: {}".format(self.catalog_path, e))
+            return scan_function()
+
+        assets = None
+        try:
+            row = connection.execute("SELECT signature FROM partitions WHERE name = ?", (partition,)).fetchone()
+            if row is not None and row[0] == signature:
+                return [(category, path) for category, path in connection.execute(
+                    "SELECT category, path FROM assets WHERE partition = ? ORDER BY rowid", (partition,))]
+
+            print("Scanning {} of {} for the asset catalog".format(partition, self.data_path))
+            assets = scan_function()
+            with connection:
+                connection.execute("DELETE FROM assets WHERE partition = ?", (partition,))
+                connection.executemany("INSERT INTO assets (partition, category, path) VALUES (?, ?, ?)",
+                                       [(partition, category, path) for category, path in assets])
+                connection.execute("INSERT OR REPLACE INTO partitions (name, signature) VALUES (?, ?)",
+                                   (partition, signature))
+            return assets
+        except sqlite3.Error as e:
+            warnings.warn("The asset catalog {} could not be used: {}".format(self.catalog_path, e))
+            return assets if assets is not None else scan_function()
+        finally:
+            connection.close()
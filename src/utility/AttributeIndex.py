@@ -0,0 +1,179 @@
+import re
+from functools import lru_cache
+
+
+class AttributeIndex:
+    """ An index over the string attributes and the custom properties of a list of datablocks, e.g. all objects.
+
+    The getters use it to evaluate their conditions as set operations on item indices: each distinct attribute or
+    custom property value is only matched once against a condition, instead of once per datablock. The results of
+    already evaluated conditions are cached in the index, s.t. many selectors with the same conditions are cheap.
+
+    An index is only valid as long as the indexed datablocks and their attributes do not change, the getters
+    therefore rebuild it whenever the scene revision of the Provider changes.
+    """
+
+    def __init__(self, items, attribute_names):
+        """
+        :param items: The datablocks to index, the position of each datablock in this list is its index.
+        :param attribute_names: The names of the string attributes, which should be indexed, e.g. ["name", "type"].
+        """
+        self.items = list(items)
+        self.all_indices = frozenset(range(len(self.items)))
+        self._positions = {item: index for index, item in enumerate(self.items)}
+
+        # maps the attribute name to a dict, which maps each of its values to the indices of all items having it
+        self._attributes = {name: {} for name in attribute_names}
+        for index, item in enumerate(self.items):
+            for name, values in self._attributes.items():
+                values.setdefault(getattr(item, name), set()).add(index)
+
+        # maps the custom property key to a dict, which maps (type, value) to the indices of all items having it
+        self._custom_properties = {}
+        # maps the custom property key to a dict, which maps each type of its values to the indices of all items
+        self._custom_property_types = {}
+        # maps the custom property key to the indices of all items, whose value can not be hashed (e.g. arrays)
+        self._unindexed_custom_properties = {}
+        for index, item in enumerate(self.items):
+            for key in item.keys():
+                value = item[key]
+                self._custom_property_types.setdefault(key, {}).setdefault(type(value), set()).add(index)
+                if isinstance(value, (str, int, float, bool)):
+                    # the type is part of the key, as 1, 1.0 and True are equal in a dict
+                    self._custom_properties.setdefault(key, {}).setdefault((type(value), value), set()).add(index)
+                else:
+                    self._unindexed_custom_properties.setdefault(key, set()).add(index)
+
+        # maps an already evaluated condition to the indices of all items fulfilling it
+        self._selection_cache = {}
+        # can be used by the getters to cache values, which are expensive to derive from an item, e.g. node counts
+        self.derived_values = {}
+
+    @staticmethod
+    @lru_cache(maxsize=None)
+    def compile_pattern(pattern):
+        """ Compiles the given regular expression only once.
+
+        :param pattern: The regular expression.
+        :return: The compiled pattern.
+        """
+        return re.compile(pattern)
+
+    def get_indices(self, items):
+        """ Returns the indices of the given items, items which are not part of the index are ignored.
+
+        :param items: A list of items.
+        :return: The indices of the items. Type: set.
+        """
+        return {self._positions[item] for item in items if item in self._positions}
+
+    def get_items(self, indices):
+        """ Returns the items with the given indices in the order of the index.
+
+        :param indices: A set of item indices.
+        :return: The list of items.
+        """
+        return [self.items[index] for index in sorted(indices)]
+
+    def select(self, key, value, candidates):
+        """ Returns all candidates, which fulfill the given condition.
+
+        :param key: The key of the condition, either an indexed attribute name or a custom property with the prefix
+                    `cp_`.
+        :param value: The value of the condition. Strings are treated as regular expressions.
+        :param candidates: The indices of the items to check. Type: set.
+        :return: The indices of all candidates fulfilling the condition or None, if the condition can not be evaluated
+                 via this index.
+        """
+        if key.startswith("cp_") and not key[3:].startswith("cf_"):
+            selection, mismatching = self._select_custom_property(key[3:], value)
+            mismatching = mismatching & candidates
+            if mismatching:
+                property_value = self.items[min(mismatching)][key[3:]]
+                raise Exception("Types are not matching: {} and {} for key: {}".format(type(property_value),
+                                                                                       type(value), key[3:]))
+        elif key in self._attributes and isinstance(value, str):
+            selection = self._select_attribute(key, value)
+        else:
+            return None
+        return selection & candidates
+
+    def _select_attribute(self, name, pattern):
+        """ Returns all items, whose string attribute matches the given pattern.
+
+        :param name: The name of the attribute.
+        :param pattern: The regular expression the whole value has to match.
+        :return: The indices of all matching items. Type: set.
+        """
+        cache_key = ("attribute", name, pattern)
+        if cache_key not in self._selection_cache:
+            values = self._attributes[name]
+            if re.escape(pattern) == pattern:
+                # a pattern without special characters only matches itself
+                selection = set(values.get(pattern, set()))
+            else:
+                compiled_pattern = AttributeIndex.compile_pattern(pattern)
+                selection = set()
+                for value, indices in values.items():
+                    if (isinstance(value, str) and compiled_pattern.fullmatch(value) is not None) or value == pattern:
+                        selection.update(indices)
+            self._selection_cache[cache_key] = selection
+        return self._selection_cache[cache_key]
+
+    def _select_custom_property(self, key, value):
+        """ Returns all items, whose custom property matches the given value.
+
+        :param key: The key of the custom property.
+        :param value: The value to match, strings are treated as regular expressions.
+        :return: The indices of all matching items and the indices of all items, whose custom property has a type
+                 which can not be compared with the value. Type: set, set.
+        """
+        try:
+            cache_key = ("custom_property", key, type(value), value)
+            hash(cache_key)
+        except TypeError:
+            cache_key = None
+        if cache_key is not None and cache_key in self._selection_cache:
+            return self._selection_cache[cache_key]
+
+        if isinstance(value, str) and re.escape(value) == value:
+            # a pattern without special characters only matches itself and only strings can be compared with it
+            selection = set(self._custom_properties.get(key, {}).get((str, value), set()))
+            mismatching = set().union(*[indices for property_type, indices in
+                                        self._custom_property_types.get(key, {}).items() if property_type is not str])
+            self._selection_cache[cache_key] = (selection, mismatching)
+            return selection, mismatching
+
+        selection, mismatching = set(), set()
+        for (_, property_value), indices in self._custom_properties.get(key, {}).items():
+            matches = AttributeIndex._custom_property_matches(property_value, value)
+            if matches is None:
+                mismatching.update(indices)
+            elif matches:
+                selection.update(indices)
+        for index in self._unindexed_custom_properties.get(key, set()):
+            matches = AttributeIndex._custom_property_matches(self.items[index][key], value)
+            if matches is None:
+                mismatching.add(index)
+            elif matches:
+                selection.add(index)
+
+        if cache_key is not None:
+            self._selection_cache[cache_key] = (selection, mismatching)
+        return selection, mismatching
+
+    @staticmethod
+    def _custom_property_matches(property_value, value):
+        """ Checks if the value of a custom property matches the given value.
+
+        :param property_value: The value of the custom property.
+        :param value: The value to match, strings are treated as regular expressions.
+        :return: True, if the values match. None, if the types of both values are not matching.
+        """
+        # check if the type of the value of such custom property matches desired
+        if isinstance(property_value, type(value)) or (isinstance(property_value, int) and isinstance(value, bool)):
+            # if is a string and if the whole string matches the given pattern
+            return (isinstance(property_value, str) and
+                    AttributeIndex.compile_pattern(value).fullmatch(property_value) is not None) or \
+                   property_value == value
+        return None
@@ -0,0 +1,237 @@
+import json
+import os
+import subprocess
+import threading
+from collections import deque
+from multiprocessing.connection import Listener, Client
+
+
+class BatchScheduler:
+    """ Runs the lines of a batch index file on several blender worker processes at the same time.
+
+    The scheduler holds the queue of all lines, every worker connects to it via a local socket and pulls the next line
+    as soon as it is done with the previous one. Each worker gets its own temp dir and optionally its own gpu or
+    number of cpu threads. Lines which fail are retried, if a worker process dies it is restarted as long as there are
+    lines left.
+
+    This class does not depend on bpy, so it can be used from the run.py outside of blender.
+    """
+
+    # Name of the environment variable, which is used to hand the authentication key to the workers
+    AUTHKEY_ENV_NAME = "BLENDER_PROC_BATCH_AUTHKEY"
+
+    def __init__(self, lines, num_workers, max_retries=1, gpus=None, threads_per_worker=None):
+        """
+        :param lines: The lines of the batch index file.
+        :param num_workers: The number of blender processes which run at the same time.
+        :param max_retries: How often a failed line is retried.
+        :param gpus: A list of gpu indices, the workers are distributed over them. If None, no gpu is assigned.
+        :param threads_per_worker: The number of cpu threads each worker may use. If None, blender decides.
+        """
+        self.lines = lines
+        self.num_workers = num_workers
+        self.max_retries = max_retries
+        self.gpus = gpus
+        self.threads_per_worker = threads_per_worker
+
+        self._queue = deque(range(len(lines)))
+        self._attempts = [0] * len(lines)
+        # per line exit code, 0 on success, None if the line was not finished yet
+        self.exit_codes = [None] * len(lines)
+        self._lock = threading.Lock()
+        self._authkey = os.urandom(32)
+        self._processes = [None] * num_workers
+
+    def _next_line(self):
+        """ Pops the index of the next line which should be processed.
+
+        :return: The index of the line or None, if the queue is empty.
+        """
+        with self._lock:
+            return self._queue.popleft() if self._queue else None
+
+    def _report(self, line_index, exit_code):
+        """ Stores the result of a line and requeues it, if it failed and can still be retried.
+
+        :param line_index: The index of the line.
+        :param exit_code: The exit code of the line, 0 if it succeeded.
+        """
+        with self._lock:
+            self._attempts[line_index] += 1
+            self.exit_codes[line_index] = exit_code
+            if exit_code != 0:
+                if self._attempts[line_index] <= self.max_retries:
+                    print("Line {} failed with exit code {}, retrying it".format(line_index, exit_code))
+                    self._queue.append(line_index)
+                else:
+                    print("Line {} failed with exit code {}, giving up".format(line_index, exit_code))
+
+    def _has_open_lines(self):
+        """ Checks whether there are lines left in the queue.
+
+        :return: True, if there is at least one line which still needs to be processed.
+        """
+        with self._lock:
+            return len(self._queue) > 0
+
+    def _accept_worker(self, listener, process):
+        """ Waits until the given worker process connects to the given listener.
+
+        :param listener: The listener, which was created for this worker process.
+        :param process: The worker process.
+        :return: The connection to the worker. If the process exited without connecting, a connection which is
+                 already closed on the other side is returned.
+        """
+        accepted = threading.Event()
+
+        def unblock_accept():
+            process.wait()
+            if not accepted.is_set():
+                # the process died before connecting, so connect ourselves to stop waiting
+                try:
+                    Client(listener.address, authkey=self._authkey).close()
+                except (OSError, EOFError):
+                    pass
+
+        threading.Thread(target=unblock_accept, daemon=True).start()
+        connection = listener.accept()
+        accepted.set()
+        return connection
+
+    def _serve_worker(self, connection):
+        """ Answers the requests of one connected worker until it disconnects.
+
+        :param connection: The connection to the worker.
+        :return: The index of the line the worker was working on when it disconnected and the number of lines it
+                 finished.
+        """
+        current_line = None
+        finished_lines = 0
+        try:
+            while True:
+                message = json.loads(connection.recv_bytes().decode())
+                if message["type"] == "result":
+                    self._report(message["line_index"], message["exit_code"])
+                    current_line = None
+                    finished_lines += 1
+                elif message["type"] == "next":
+                    current_line = self._next_line()
+                    if current_line is None:
+                        connection.send_bytes(json.dumps(None).encode())
+                    else:
+                        connection.send_bytes(json.dumps({"line_index": current_line,
+                                                          "line": self.lines[current_line]}).encode())
+        except (EOFError, OSError):
+            pass
+        finally:
+            connection.close()
+        return current_line, finished_lines
+
+    def _run_worker_slot(self, worker_id, build_command, temp_dir, env, cwd):
+        """ Runs blender worker processes for one slot, until there are no lines left.
+
+        :param worker_id: The index of this worker slot.
+        :param build_command: A function mapping the temp dir and the queue address to the blender command.
+        :param temp_dir: The temp dir of this worker.
+        :param env: The environment used for the blender process.
+        :param cwd: The working directory of the blender process.
+        """
+        worker_env = dict(env)
+        worker_env[BatchScheduler.AUTHKEY_ENV_NAME] = self._authkey.hex()
+        if self.gpus:
+            worker_env["CUDA_VISIBLE_DEVICES"] = str(self.gpus[worker_id % len(self.gpus)])
+        failed_starts = 0
+        while self._has_open_lines() and failed_starts <= self.max_retries:
+            os.makedirs(temp_dir, exist_ok=True)
+            # every process gets a fresh listener, s.t. no stale connection of a previous process can be accepted
+            with Listener(("localhost", 0), authkey=self._authkey) as listener:
+                command = build_command(temp_dir, "{}:{}".format(*listener.address))
+                if self.threads_per_worker is not None:
+                    # blender expects its own arguments in front of the python script
+                    command = command[:1] + ["--threads", str(self.threads_per_worker)] + command[1:]
+                process = subprocess.Popen(command, env=worker_env, cwd=cwd)
+                self._processes[worker_id] = process
+                pending_line, finished_lines = self._serve_worker(self._accept_worker(listener, process))
+            process.wait()
+            if pending_line is not None:
+                # the worker died while working on this line
+                self._report(pending_line, process.returncode if process.returncode != 0 else 1)
+            # avoid restarting a worker forever, which fails before it can process any line
+            if finished_lines == 0 and process.returncode != 0:
+                failed_starts += 1
+            else:
+                failed_starts = 0
+
+    def run(self, build_command, temp_dir, env=None, cwd=None):
+        """ Processes all lines with the configured number of workers.
+
+        :param build_command: A function mapping the temp dir of a worker and the address of the queue to the command,
+                              which starts the blender worker.
+        :param temp_dir: The temp dir, each worker gets a sub directory in it.
+        :param env: The environment used for the blender processes.
+        :param cwd: The working directory of the blender processes.
+        :return: The exit code for the whole batch, 0 if all lines succeeded.
+        """
+        if env is None:
+            env = os.environ
+        threads = []
+        for worker_id in range(self.num_workers):
+            worker_temp_dir = os.path.join(temp_dir, "worker_{}".format(worker_id))
+            thread = threading.Thread(target=self._run_worker_slot,
+                                      args=(worker_id, build_command, worker_temp_dir, env, cwd))
+            thread.start()
+            threads.append(thread)
+        for thread in threads:
+            thread.join()
+
+        # lines which were never finished, e.g. because all workers failed to start, count as failed
+        failed_lines = [i for i, exit_code in enumerate(self.exit_codes) if exit_code != 0]
+        print("Batch finished: {} of {} lines succeeded".format(len(self.lines) - len(failed_lines), len(self.lines)))
+        for line_index in failed_lines:
+            print("Line {} failed with exit code {}: {}".format(line_index, self.exit_codes[line_index],
+                                                                self.lines[line_index].strip()))
+        return 1 if failed_lines else 0
+
+    def terminate(self):
+        """ Terminates all running worker processes. """
+        with self._lock:
+            self._queue.clear()
+        for process in self._processes:
+            if process is not None and process.poll() is None:
+                process.terminate()
+
+
+class BatchWorkerClient:
+    """ The counterpart of the BatchScheduler, used inside of each blender worker to pull the lines. """
+
+    def __init__(self, address):
+        """
+        :param address: The address of the scheduler queue in the form "host:port".
+        """
+        host, port = address.rsplit(":", 1)
+        authkey = bytes.fromhex(os.environ[BatchScheduler.AUTHKEY_ENV_NAME])
+        self._connection = Client((host, int(port)), authkey=authkey)
+
+    def next_line(self):
+        """ Requests the next line from the scheduler.
+
+        :return: A tuple of the line index and the line, or None if there are no lines left.
+        """
+        self._connection.send_bytes(json.dumps({"type": "next"}).encode())
+        message = json.loads(self._connection.recv_bytes().decode())
+        if message is None:
+            return None
+        return message["line_index"], message["line"]
+
+    def report(self, line_index, exit_code):
+        """ Reports the result of a line to the scheduler.
+
+        :param line_index: The index of the processed line.
+        :param exit_code: 0 if the line succeeded, otherwise an error code.
+        """
+        self._connection.send_bytes(json.dumps({"type": "result", "line_index": line_index,
+                                                "exit_code": exit_code}).encode())
+
+    def close(self):
+        """ Closes the connection to the scheduler. """
+        self._connection.close()
@@ -5,6 +5,8 @@
 
 import numpy as np
 
+from src.utility.BvhRegistry import BvhRegistry
+
 
 def local_to_world(cords, world):
     """
@@ -74,25 +76,28 @@ def check_intersection(obj1, obj2, skip_inside_check=False, bvh_cache=None):
     :param obj1: object 1 to check for intersection, must be a mesh
     :param obj2: object 2 to check for intersection, must be a mesh
     :param skip_inside_check: Disables checking whether one object is completely inside the other.
+    :param bvh_cache: A dict mapping object names to their bvh trees in world space. If None, the scene-wide
+                      BvhRegistry is used, which rebuilds the trees only if the objects have changed.
     :return: True, if they are intersecting
     """
 
     if bvh_cache is None:
-        bvh_cache = {}
-
-    # create bvhtree for obj1
-    if obj1.name not in bvh_cache:
-        obj1_BVHtree = create_bvh_tree_for_object(obj1)
-        bvh_cache[obj1.name] = obj1_BVHtree
-    else:
-        obj1_BVHtree = bvh_cache[obj1.name]
-
-    # create bvhtree for obj2
-    if obj2.name not in bvh_cache:
-        obj2_BVHtree = create_bvh_tree_for_object(obj2)
-        bvh_cache[obj2.name] = obj2_BVHtree
+        obj1_BVHtree = BvhRegistry.get_world_tree(obj1)
+        obj2_BVHtree = BvhRegistry.get_world_tree(obj2)
     else:
-        obj2_BVHtree = bvh_cache[obj2.name]
+        # create bvhtree for obj1
+        if obj1.name not in bvh_cache:
+            obj1_BVHtree = create_bvh_tree_for_object(obj1)
+            bvh_cache[obj1.name] = obj1_BVHtree
+        else:
+            obj1_BVHtree = bvh_cache[obj1.name]
+
+        # create bvhtree for obj2
+        if obj2.name not in bvh_cache:
+            obj2_BVHtree = create_bvh_tree_for_object(obj2)
+            bvh_cache[obj2.name] = obj2_BVHtree
+        else:
+            obj2_BVHtree = bvh_cache[obj2.name]
 
     # Check whether both meshes intersect
     inter = len(obj1_BVHtree.overlap(obj2_BVHtree)) > 0
@@ -288,26 +293,39 @@ def get_all_textures():
     return list(bpy.data.textures)
 
 
-def load_image(file_path, num_channels=3):
+def load_image(file_path, num_channels=3, dtype=None):
     """ Load the image at the given path returns its pixels as a numpy array.
 
+    The pixels are copied directly into a preallocated buffer via foreach_get and the image datablock is removed
+    afterwards again, s.t. no images are piling up in bpy.data.images.
+
     The alpha channel is neglected.
 
     :param file_path: The path to the image.
     :param num_channels: Number of channels to return.
+    :param dtype: The dtype of the returned array. If None, .png and .jpg images are returned as uint8 in [0, 255] and
+                  all other images as float64.
     :return: The numpy array
     """
     # load image with blender function
     img = bpy.data.images.load(file_path, check_existing=False)
-    # convert image to proper size
-    size = img.size
-    channels = img.channels
-    img = np.array(img.pixels).reshape(size[1], size[0], channels)
-    img = np.flip(img, axis=0)
+    try:
+        # convert image to proper size
+        size = img.size
+        channels = img.channels
+        pixels = np.empty(size[0] * size[1] * channels, dtype=np.float32)
+        img.pixels.foreach_get(pixels)
+    finally:
+        bpy.data.images.remove(img)
+    # blender stores the rows from bottom to top, only keep the requested channels
+    pixels = np.flip(pixels.reshape(size[1], size[0], channels), axis=0)[:, :, :num_channels]
     if file_path.endswith('.png') or file_path.endswith('.jpg'):
-        # convert the 0 to 1 space to 0 ... 255 and save it as uint8
-        img = (img * 255).astype(np.uint8)
-    return img[:, :, :num_channels]
+        if dtype is None or dtype == np.uint8:
+            # convert the 0 to 1 space to 0 ... 255 and save it as uint8
+            return (pixels.astype(np.float64) * 255).astype(np.uint8)
+    if dtype is None:
+        dtype = np.float64
+    return pixels.astype(dtype, copy=False)
 
 
 def get_bound_volume(obj):
@@ -348,3 +366,93 @@ def duplicate_objects(objects):
     duplicates = bpy.context.selected_objects
     bpy.ops.object.select_all(action='DESELECT')
     return duplicates
+
+
+def duplicate_objects_linked(objects):
+    """
+    Creates duplicates of objects, which share their mesh data and materials with the original objects.
+
+    In contrast to duplicate_objects no operator is used and no data is copied, so the memory used by the duplicates
+    does not grow with their mesh size. Changing the mesh data or the materials of a duplicate changes the original.
+
+    :param objects: an object or a list of objects to be duplicated
+    :return: a list of objects
+    """
+    if not isinstance(objects, list):
+        objects = [objects]
+
+    duplicates = []
+    for obj in objects:
+        duplicate = obj.copy()
+        # link the duplicate into the same collections as the original, like the duplicate operator does
+        for collection in obj.users_collection:
+            collection.objects.link(duplicate)
+        duplicates.append(duplicate)
+    return duplicates
+
+
+def get_mesh_vertices(mesh):
+    """ Returns the coordinates of all vertices of the given mesh.
+
+    :param mesh: The mesh.
+    :return: The vertex coordinates. Type: np.array of shape [N, 3] and type float64.
+    """
+    vertices = np.empty(len(mesh.vertices) * 3, dtype=np.float32)
+    mesh.vertices.foreach_get("co", vertices)
+    return vertices.reshape(-1, 3).astype(np.float64)
+
+
+def set_mesh_vertices(mesh, vertices):
+    """ Overwrites the coordinates of all vertices of the given mesh.
+
+    :param mesh: The mesh.
+    :param vertices: The new vertex coordinates. Type: np.array of shape [N, 3].
+    """
+    mesh.vertices.foreach_set("co", np.asarray(vertices, dtype=np.float32).reshape(-1))
+    mesh.update()
+
+
+def get_center_of_volume(mesh, vertices=None):
+    """ Computes the center of volume of the given mesh in the same way as blender's ORIGIN_CENTER_OF_VOLUME.
+
+    The polygons are fan triangulated and the centroids of the tetrahedrons between the triangles and the median of
+    all polygon corners are weighted by their signed volume. If the mesh has no volume, the median is returned.
+
+    :param mesh: The mesh, should be closed.
+    :param vertices: The vertex coordinates of the mesh, if they were already read. Type: np.array of shape [N, 3].
+    :return: The center of volume in the local coordinates of the mesh. Type: np.array.
+    """
+    if len(mesh.polygons) == 0:
+        return np.zeros(3)
+    if vertices is None:
+        vertices = get_mesh_vertices(mesh)
+    loop_vertices = np.empty(len(mesh.loops), dtype=np.int64)
+    mesh.loops.foreach_get("vertex_index", loop_vertices)
+    loop_start = np.empty(len(mesh.polygons), dtype=np.int64)
+    mesh.polygons.foreach_get("loop_start", loop_start)
+    loop_total = np.empty(len(mesh.polygons), dtype=np.int64)
+    mesh.polygons.foreach_get("loop_total", loop_total)
+
+    # Use the median of all polygon corners as reference, to avoid numeric instability far away from the origin
+    median = np.mean(vertices[loop_vertices], axis=0)
+    relative_vertices = vertices - median
+
+    # Fan triangulation: triangle i of a polygon consists of its first, its (i + 1)-th and its (i + 2)-th corner
+    triangles_per_polygon = np.maximum(loop_total - 2, 0)
+    polygon_of_triangle = np.repeat(np.arange(len(loop_total)), triangles_per_polygon)
+    first_triangle = np.cumsum(triangles_per_polygon) - triangles_per_polygon
+    corner = np.arange(len(polygon_of_triangle)) - first_triangle[polygon_of_triangle] + 2
+    start = loop_start[polygon_of_triangle]
+    pivot = relative_vertices[loop_vertices[start]]
+    step1 = relative_vertices[loop_vertices[start + corner - 1]]
+    step2 = relative_vertices[loop_vertices[start + corner]]
+
+    # six times the signed volume of each tetrahedron
+    volumes = np.einsum("ij,ij->i", np.cross(pivot, step1), step2)
+    total_volume = np.sum(volumes)
+    if total_volume == 0:
+        return median
+    center = np.sum(volumes[:, np.newaxis] * (pivot + step1 + step2), axis=0) * 0.25 / total_volume
+    if not np.all(np.isfinite(center)):
+        return median
+    return center + median
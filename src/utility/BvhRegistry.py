@@ -0,0 +1,112 @@
+import bmesh
+import mathutils
+import numpy as np
+
+
+class BvhRegistry:
+    """ A scene-wide cache of bvh trees, which is shared between all samplers and checks.
+
+    For each object a tree in world space is cached, additionally merged trees of several objects can be requested.
+    The trees are keyed by the object name and are only rebuilt if the geometry or the matrix_world of the object
+    changed.
+
+    A change of the geometry is detected via the mesh datablock and its number of vertices and polygons. If the vertex
+    coordinates of a mesh are changed in place, mark_geometry_changed() has to be called for the object.
+    """
+
+    # maps the object name to its geometry revision counter, which is increased by mark_geometry_changed()
+    _geometry_revisions = {}
+
+    # maps the object name to a tuple of the geometry key, the matrix_world and the tree in world space
+    _world_trees = {}
+
+    # maps a tuple of object names to a tuple of the key of all objects, the tree and the face offsets
+    _merged_trees = {}
+
+    @staticmethod
+    def _geometry_key(obj):
+        """ Returns a key, which changes whenever the geometry of the given object changes.
+
+        :param obj: The mesh object.
+        :return: A tuple identifying the current geometry of the object.
+        """
+        return (obj.data.as_pointer(), len(obj.data.vertices), len(obj.data.polygons),
+                BvhRegistry._geometry_revisions.get(obj.name, 0))
+
+    @staticmethod
+    def mark_geometry_changed(obj):
+        """ Marks the geometry of the given object as changed, s.t. all its trees are rebuilt on the next request.
+
+        :param obj: The mesh object, whose vertices have been changed.
+        """
+        BvhRegistry._geometry_revisions[obj.name] = BvhRegistry._geometry_revisions.get(obj.name, 0) + 1
+
+    @staticmethod
+    def get_world_tree(obj):
+        """ Returns the bvh tree of the given object in world space.
+
+        :param obj: The mesh object.
+        :return: The bvh tree.
+        """
+        geometry_key = BvhRegistry._geometry_key(obj)
+        cached = BvhRegistry._world_trees.get(obj.name)
+        if cached is not None and cached[0] == geometry_key and cached[1] == obj.matrix_world:
+            return cached[2]
+
+        bm = bmesh.new()
+        bm.from_mesh(obj.data)
+        bm.transform(obj.matrix_world)
+        tree = mathutils.bvhtree.BVHTree.FromBMesh(bm)
+        bm.free()
+        BvhRegistry._world_trees[obj.name] = (geometry_key, obj.matrix_world.copy(), tree)
+        return tree
+
+    @staticmethod
+    def get_merged_tree(objects):
+        """ Returns one bvh tree in world space, which contains the meshes of all given objects.
+
+        :param objects: The list of mesh objects.
+        :return: The bvh tree and the index of the first face of each object inside the tree. Type: np.array.
+        """
+        names = tuple(obj.name for obj in objects)
+        key = [(BvhRegistry._geometry_key(obj), obj.matrix_world.copy()) for obj in objects]
+        cached = BvhRegistry._merged_trees.get(names)
+        if cached is not None and cached[0] == key:
+            return cached[1], cached[2]
+
+        # Create bmesh which will contain the meshes of all objects
+        bm = bmesh.new()
+        face_offsets = []
+        for obj in objects:
+            face_offsets.append(len(bm.faces))
+            # Add object mesh to bmesh (the newly added vertices will be automatically selected)
+            bm.from_mesh(obj.data)
+            # Apply world matrix to all selected vertices
+            bm.transform(obj.matrix_world, filter={"SELECT"})
+            # Deselect all vertices
+            for v in bm.verts:
+                v.select = False
+        tree = mathutils.bvhtree.BVHTree.FromBMesh(bm)
+        bm.free()
+        face_offsets = np.array(face_offsets, dtype=np.int64)
+        # only the last merged tree of a set of objects is kept, as each of them can get big
+        BvhRegistry._merged_trees[names] = (key, tree, face_offsets)
+        return tree, face_offsets
+
+    @staticmethod
+    def remove(obj_name):
+        """ Removes all cached trees of the object with the given name.
+
+        :param obj_name: The name of the object.
+        """
+        BvhRegistry._geometry_revisions.pop(obj_name, None)
+        BvhRegistry._world_trees.pop(obj_name, None)
+        for names in [names for names in BvhRegistry._merged_trees if obj_name in names]:
+            del BvhRegistry._merged_trees[names]
+
+    @staticmethod
+    def clear():
+        """ Removes all cached trees. """
+        BvhRegistry._geometry_revisions = {}
+        BvhRegistry._world_trees = {}
+        BvhRegistry._merged_trees = {}
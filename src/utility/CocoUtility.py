@@ -1,7 +1,13 @@
 import datetime
-from itertools import groupby
+import json
+import multiprocessing
+import os
+import shutil
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
 
 import numpy as np
+from scipy import ndimage
 from skimage import measure
 
 
@@ -9,7 +15,7 @@ class CocoUtility:
 
     @staticmethod
     def generate_coco_annotations(segmentation_map_paths, image_paths, inst_attribute_maps, supercategory,
-                                  mask_encoding_format, existing_coco_annotations=None):
+                                  mask_encoding_format, existing_coco_annotations=None, num_workers=1):
         """Generates coco annotations for images
 
         :param segmentation_map_paths: A list of paths which points to the rendered segmentation maps.
@@ -18,6 +24,8 @@ def generate_coco_annotations(segmentation_map_paths, image_paths, inst_attribut
         :param supercategory: name of the dataset/supercategory to filter for, e.g. a specific BOP dataset
         :param mask_encoding_format: Encoding format of the binary mask. Type: string.
         :param existing_coco_annotations: If given, the new coco annotations will be appended to the given coco annotations dict.
+        :param num_workers: The number of processes used to generate the annotations of the frames in parallel. The
+                            workers are forked, on platforms without fork the frames are processed sequentially.
         :return: dict containing coco annotations
         """
 
@@ -59,33 +67,28 @@ def generate_coco_annotations(segmentation_map_paths, image_paths, inst_attribut
         images = []
         annotations = []
 
-        for segmentation_map_path, image_path in zip(segmentation_map_paths, image_paths):
-            
-            # Load instance map
-            inst_channel = int(inst_attribute_maps[0]['channel_instance'])
-            segmentation_map = np.load(segmentation_map_path)[:,:,inst_channel]
+        inst_channel = int(inst_attribute_maps[0]['channel_instance'])
+        frame_args = (segmentation_map_paths, repeat(inst_channel), repeat(instance_2_category_map),
+                      repeat(mask_encoding_format))
+        if num_workers > 1 and "fork" in multiprocessing.get_all_start_methods():
+            # The frames are independent, the results are returned in the order of the frames.
+            # Spawned workers would re-import the __main__ module of blender, so they are always forked.
+            with ProcessPoolExecutor(max_workers=num_workers,
+                                     mp_context=multiprocessing.get_context("fork")) as executor:
+                frame_results = list(executor.map(CocoUtility.generate_frame_annotations, *frame_args))
+        else:
+            frame_results = map(CocoUtility.generate_frame_annotations, *frame_args)
 
+        for image_path, (image_size, frame_annotations) in zip(image_paths, frame_results):
             # Add coco info for image
             image_id = len(images)
-            images.append(CocoUtility.create_image_info(image_id, image_path, segmentation_map.shape))
-
-            # Go through all objects visible in this image
-            instances = np.unique(segmentation_map)
-            
-            # Remove background
-            instances = np.delete(instances, np.where(instances == 0))
-            for inst in instances:
-                if inst in instance_2_category_map:
-                    # Calc object mask
-                    binary_inst_mask = np.where(segmentation_map == inst, 1, 0)
-                    # Add coco info for object in this image
-                    annotation = CocoUtility.create_annotation_info(len(annotations),
-                                                                    image_id,
-                                                                    instance_2_category_map[inst],
-                                                                    binary_inst_mask,
-                                                                    mask_encoding_format)
-                    if annotation is not None:
-                        annotations.append(annotation)
+            images.append(CocoUtility.create_image_info(image_id, image_path, image_size))
+
+            # Ids are assigned here, s.t. they only depend on the order of the frames
+            for annotation in frame_annotations:
+                annotation["id"] = len(annotations)
+                annotation["image_id"] = image_id
+                annotations.append(annotation)
 
         new_coco_annotations = {
             "info": info,
@@ -100,6 +103,38 @@ def generate_coco_annotations(segmentation_map_paths, image_paths, inst_attribut
 
         return new_coco_annotations
 
+    @staticmethod
+    def generate_frame_annotations(segmentation_map_path, inst_channel, instance_2_category_map, mask_encoding_format):
+        """ Generates the coco annotations of all objects visible in one frame.
+
+        The ids of the annotations and of the image are not set here, as they depend on the previous frames.
+
+        :param segmentation_map_path: The path to the rendered segmentation map of the frame.
+        :param inst_channel: The channel of the segmentation map which contains the instance ids.
+        :param instance_2_category_map: A dict mapping the instance ids to their category ids.
+        :param mask_encoding_format: Encoding format of the binary mask. Type: string.
+        :return: The size of the image as [H, W] and the list of annotations.
+        """
+        # Load instance map
+        segmentation_map = np.load(segmentation_map_path)[:, :, inst_channel].astype(np.int64)
+
+        annotations = []
+        # Go through all objects visible in this image, background (0) is never returned
+        for inst, area, bbox, crop_slices in CocoUtility.find_instances(segmentation_map):
+            if inst in instance_2_category_map:
+                # Calc object mask only inside the bounding box of the object
+                cropped_inst_mask = (segmentation_map[crop_slices] == inst).astype(np.uint8)
+                # Add coco info for object in this image
+                annotations.append(CocoUtility.create_annotation_info_from_crop(None,
+                                                                                None,
+                                                                                instance_2_category_map[inst],
+                                                                                cropped_inst_mask,
+                                                                                area,
+                                                                                bbox,
+                                                                                segmentation_map.shape,
+                                                                                mask_encoding_format))
+        return segmentation_map.shape, annotations
+
     @staticmethod
     def merge_coco_annotations(existing_coco_annotations, new_coco_annotations):
         """ Merges the two given coco annotation dicts into one.
@@ -132,6 +167,123 @@ def merge_coco_annotations(existing_coco_annotations, new_coco_annotations):
 
         return existing_coco_annotations
 
+    @staticmethod
+    def load_coco_shard_index(coco_data_dir):
+        """ Loads the index of the coco annotation shards stored in the given directory.
+
+        The index only contains the categories, the ids which are used next and the paths of all shards, so its size
+        does not depend on the number of images.
+
+        :param coco_data_dir: The directory containing the coco annotation shards.
+        :return: The index as dict, if no index exists yet an empty index is returned.
+        """
+        index_path = os.path.join(coco_data_dir, "coco_annotations_index.json")
+        if os.path.exists(index_path):
+            with open(index_path, 'r') as fp:
+                return json.load(fp)
+        return CocoUtility.create_coco_shard_index()
+
+    @staticmethod
+    def create_coco_shard_index():
+        """ Creates an empty index for coco annotation shards.
+
+        :return: The empty index as dict.
+        """
+        return {
+            "next_image_id": 0,
+            "next_annotation_id": 0,
+            "categories": [],
+            "shards": []
+        }
+
+    @staticmethod
+    def remove_coco_shards(coco_data_dir):
+        """ Removes all coco annotation shards and their index from the given directory.
+
+        :param coco_data_dir: The directory containing the coco annotation shards.
+        """
+        shutil.rmtree(os.path.join(coco_data_dir, "shards"), ignore_errors=True)
+        index_path = os.path.join(coco_data_dir, "coco_annotations_index.json")
+        if os.path.exists(index_path):
+            os.remove(index_path)
+
+    @staticmethod
+    def append_coco_shard(coco_data_dir, new_coco_annotations, shard_index=None):
+        """ Stores the given coco annotations as new shard and registers it in the shard index.
+
+        The image and annotation ids of the new annotations are offset using the index, so appending a batch only
+        costs O(batch) and the existing shards are never read or rewritten. The index is read, updated and written
+        without any locking, so several processes must not append to the same directory at the same time.
+
+        :param coco_data_dir: The directory containing the coco annotation shards.
+        :param new_coco_annotations: A dict describing the coco annotations of the new batch, ids starting at zero.
+        :param shard_index: The shard index to append to, if None the index stored in coco_data_dir is used.
+        :return: The path of the written shard.
+        """
+        if shard_index is None:
+            shard_index = CocoUtility.load_coco_shard_index(coco_data_dir)
+
+        image_id_offset = shard_index["next_image_id"]
+        for image in new_coco_annotations["images"]:
+            image["id"] += image_id_offset
+        annotation_id_offset = shard_index["next_annotation_id"]
+        for annotation in new_coco_annotations["annotations"]:
+            annotation["id"] += annotation_id_offset
+            annotation["image_id"] += image_id_offset
+
+        shard_index["next_image_id"] = image_id_offset + len(new_coco_annotations["images"])
+        shard_index["next_annotation_id"] = annotation_id_offset + len(new_coco_annotations["annotations"])
+        for cat_dict in new_coco_annotations["categories"]:
+            if cat_dict not in shard_index["categories"]:
+                shard_index["categories"].append(cat_dict)
+        shard_index["info"] = new_coco_annotations["info"]
+        shard_index["licenses"] = new_coco_annotations["licenses"]
+
+        os.makedirs(os.path.join(coco_data_dir, "shards"), exist_ok=True)
+        shard_path = os.path.join("shards", "coco_annotations_{:06d}.json".format(len(shard_index["shards"])))
+        with open(os.path.join(coco_data_dir, shard_path), 'w') as fp:
+            json.dump({"images": new_coco_annotations["images"],
+                       "annotations": new_coco_annotations["annotations"]}, fp)
+        shard_index["shards"].append(shard_path)
+
+        # Write the index last, s.t. a shard is only visible after it has been written completely
+        index_path = os.path.join(coco_data_dir, "coco_annotations_index.json")
+        with open(index_path + ".tmp", 'w') as fp:
+            json.dump(shard_index, fp)
+        os.replace(index_path + ".tmp", index_path)
+        return os.path.join(coco_data_dir, shard_path)
+
+    @staticmethod
+    def compact_coco_shards(coco_data_dir, output_path=None):
+        """ Merges all coco annotation shards of the given directory into one coco annotations file.
+
+        :param coco_data_dir: The directory containing the coco annotation shards.
+        :param output_path: The path of the merged .json file. Default: coco_data_dir/coco_annotations.json
+        :return: The path of the merged .json file.
+        """
+        shard_index = CocoUtility.load_coco_shard_index(coco_data_dir)
+        if output_path is None:
+            output_path = os.path.join(coco_data_dir, "coco_annotations.json")
+
+        images = []
+        annotations = []
+        for shard_path in shard_index["shards"]:
+            with open(os.path.join(coco_data_dir, shard_path), 'r') as fp:
+                shard = json.load(fp)
+            images.extend(shard["images"])
+            annotations.extend(shard["annotations"])
+
+        coco_annotations = {
+            "info": shard_index.get("info", {}),
+            "licenses": shard_index.get("licenses", []),
+            "categories": shard_index["categories"],
+            "images": images,
+            "annotations": annotations
+        }
+        with open(output_path, 'w') as fp:
+            json.dump(coco_annotations, fp)
+        return output_path
+
     @staticmethod
     def create_image_info(image_id, file_name, image_size):
         """Creates image info section of coco annotation
@@ -153,6 +305,29 @@ def create_image_info(image_id, file_name, image_size):
 
         return image_info
 
+    @staticmethod
+    def find_instances(segmentation_map):
+        """ Finds all instances in the given instance map in one pass over the image.
+
+        Instead of building one full size mask per instance, the areas of all instances are computed at once via
+        np.bincount and their bounding boxes via ndimage.find_objects.
+
+        :param segmentation_map: A 2-dim instance map with non-negative integer ids, where 0 is the background.
+        :return: A list of tuples (instance id, area, bounding box as [x, y, width, height], crop slices), one for
+                 every visible instance, sorted by instance id.
+        """
+        areas = np.bincount(segmentation_map.ravel())
+        instances = []
+        # find_objects starts counting at 1, so the background is skipped
+        for inst, crop_slices in enumerate(ndimage.find_objects(segmentation_map), start=1):
+            if crop_slices is None:
+                continue
+            row_slice, col_slice = crop_slices
+            bbox = [int(col_slice.start), int(row_slice.start), int(col_slice.stop - col_slice.start),
+                    int(row_slice.stop - row_slice.start)]
+            instances.append((inst, int(areas[inst]), bbox, crop_slices))
+        return instances
+
     @staticmethod
     def create_annotation_info(annotation_id, image_id, category_id, binary_mask, mask_encoding_format, tolerance=2):
         """Creates info section of coco annotation
@@ -170,13 +345,35 @@ def create_annotation_info(annotation_id, image_id, category_id, binary_mask, ma
             return None
 
         bounding_box = CocoUtility.bbox_from_binary_mask(binary_mask)
+        x, y, w, h = bounding_box
+        return CocoUtility.create_annotation_info_from_crop(annotation_id, image_id, category_id,
+                                                            binary_mask[y:y + h, x:x + w], area, bounding_box,
+                                                            binary_mask.shape, mask_encoding_format, tolerance)
 
-        if mask_encoding_format == 'rle':
+    @staticmethod
+    def create_annotation_info_from_crop(annotation_id, image_id, category_id, cropped_binary_mask, area, bounding_box,
+                                         image_size, mask_encoding_format, tolerance=2):
+        """Creates info section of coco annotation from the mask of the object inside its bounding box
+
+        :param annotation_id: integer to uniquly identify the annotation
+        :param image_id: integer to uniquly identify image
+        :param category_id: Id of the category
+        :param cropped_binary_mask: A binary mask of the object cropped to its bounding box, shape [h, w].
+        :param area: The number of pixels belonging to the object.
+        :param bounding_box: The bounding box of the object in the image, given as [x, y, width, height].
+        :param image_size: The size of the full image, given as [H, W].
+        :param mask_encoding_format: Encoding format of the mask. Type: string.
+        :param tolerance: The tolerance for fitting polygons to the objects mask.
+        """
+        if mask_encoding_format in ['rle', 'compressed_rle']:
             is_crowd = 1
-            segmentation = CocoUtility.binary_mask_to_rle(binary_mask)
+            segmentation = CocoUtility.cropped_binary_mask_to_rle(cropped_binary_mask, bounding_box, image_size)
+            if mask_encoding_format == 'compressed_rle':
+                segmentation['counts'] = CocoUtility.rle_counts_to_string(segmentation['counts'])
         elif mask_encoding_format == 'polygon':
             is_crowd = 0
-            segmentation = CocoUtility.binary_mask_to_polygon(binary_mask, tolerance)
+            segmentation = CocoUtility.binary_mask_to_polygon(cropped_binary_mask, tolerance,
+                                                              offset=bounding_box[:2])
         else:
             raise RuntimeError("Unknown encoding format: {}".format(mask_encoding_format))
 
@@ -188,8 +385,8 @@ def create_annotation_info(annotation_id, image_id, category_id, binary_mask, ma
             "area": area,
             "bbox": bounding_box,
             "segmentation": segmentation,
-            "width": binary_mask.shape[1],
-            "height": binary_mask.shape[0],
+            "width": image_size[1],
+            "height": image_size[0],
         }
         return annotation_info
 
@@ -233,20 +430,23 @@ def close_contour(contour):
         return contour
 
     @staticmethod
-    def binary_mask_to_polygon(binary_mask, tolerance=0):
+    def binary_mask_to_polygon(binary_mask, tolerance=0, offset=(0, 0)):
         """Converts a binary mask to COCO polygon representation
 
          :param binary_mask: a 2D binary numpy array where '1's represent the object
          :param tolerance: Maximum distance from original points of polygon to approximated polygonal chain. If
                            tolerance is 0, the original coordinate array is returned.
+         :param offset: The [x, y] position of the given mask inside the image, used if the mask is only a crop.
         """
         polygons = []
         # pad mask to close contours of shapes which start and end at an edge
         padded_binary_mask = np.pad(binary_mask, pad_width=1, mode='constant', constant_values=0)
-        contours = np.array(measure.find_contours(padded_binary_mask, 0.5))
-        # Reverse padding
-        contours = contours - 1
+        contours = measure.find_contours(padded_binary_mask, 0.5)
         for contour in contours:
+            # Reverse padding and move the contour to its position inside the image. This has to be done before the
+            # approximation, as its result depends on the absolute coordinates, s.t. a crop results in the same
+            # polygons as the full mask.
+            contour = contour - 1 + np.array([offset[1], offset[0]])
             # Make sure contour is closed
             contour = CocoUtility.close_contour(contour)
             # Approximate contour by polygon
@@ -266,11 +466,116 @@ def binary_mask_to_polygon(binary_mask, tolerance=0):
 
     @staticmethod
     def binary_mask_to_rle(binary_mask):
-        rle = {'counts': [], 'size': list(binary_mask.shape)}
-        counts = rle.get('counts')
-        for i, (value, elements) in enumerate(groupby(binary_mask.ravel(order='F'))):
-            if i == 0 and value == 1:
-                counts.append(0)
-            counts.append(len(list(elements)))
-
-        return rle
+        """ Converts a binary mask to the uncompressed COCO rle representation.
+
+        The mask is traversed in fortran order, the counts alternate between runs of 0s and 1s, starting with 0s.
+
+        :param binary_mask: A binary image mask with the shape [H, W].
+        :return: A dict containing the counts and the size of the mask.
+        """
+        flat_mask = np.asarray(binary_mask).ravel(order='F')
+        if flat_mask.size == 0:
+            return {'counts': [], 'size': list(binary_mask.shape)}
+        # Find the positions where a new run starts and compute the run lengths from them
+        run_starts = np.flatnonzero(np.diff(flat_mask)) + 1
+        counts = np.diff(np.concatenate(([0], run_starts, [flat_mask.size])))
+        # The counts always start with a run of 0s, which is empty if the first pixel is set
+        if flat_mask[0] == 1:
+            counts = np.concatenate(([0], counts))
+        return {'counts': counts.tolist(), 'size': list(binary_mask.shape)}
+
+    @staticmethod
+    def rle_to_binary_mask(rle):
+        """ Converts the given COCO rle back into a binary mask.
+
+        :param rle: A dict containing the counts and the size of the mask. The counts can either be given as list or
+                    as compressed string.
+        :return: A binary mask with the shape [H, W] and dtype uint8.
+        """
+        counts = rle['counts']
+        if isinstance(counts, str):
+            counts = CocoUtility.rle_string_to_counts(counts)
+        # Every second run consists of 1s
+        run_values = np.arange(len(counts), dtype=np.uint8) % 2
+        flat_mask = np.repeat(run_values, counts)
+        return flat_mask.reshape(rle['size'], order='F')
+
+    @staticmethod
+    def rle_counts_to_string(counts):
+        """ Compresses the given rle counts into a string, which is compatible with the one used by pycocotools.
+
+        Every count is stored as difference to the count two positions before it (except for the first three) and
+        then written in chunks of 5 bits, where each char is offset by 48.
+
+        :param counts: The uncompressed rle counts. Type: list.
+        :return: The compressed counts. Type: string.
+        """
+        chars = []
+        for i, count in enumerate(counts):
+            x = int(count)
+            if i > 2:
+                x -= int(counts[i - 2])
+            more = True
+            while more:
+                c = x & 0x1f
+                # python uses an arithmetic shift, so negative values stay negative
+                x >>= 5
+                more = x != -1 if c & 0x10 else x != 0
+                if more:
+                    c |= 0x20
+                chars.append(chr(c + 48))
+        return "".join(chars)
+
+    @staticmethod
+    def rle_string_to_counts(rle_string):
+        """ Decompresses rle counts, which were compressed via rle_counts_to_string() or pycocotools.
+
+        :param rle_string: The compressed counts. Type: string.
+        :return: The uncompressed rle counts. Type: list.
+        """
+        counts = []
+        p = 0
+        while p < len(rle_string):
+            x = 0
+            k = 0
+            more = True
+            while more:
+                c = ord(rle_string[p]) - 48
+                x |= (c & 0x1f) << 5 * k
+                more = c & 0x20
+                p += 1
+                k += 1
+                if not more and c & 0x10:
+                    # sign extend negative values
+                    x |= -1 << 5 * k
+            if len(counts) > 2:
+                x += counts[-2]
+            counts.append(x)
+        return counts
+
+    @staticmethod
+    def cropped_binary_mask_to_rle(cropped_binary_mask, bounding_box, image_size):
+        """ Computes the rle of the full image mask, only using the crop of the mask inside its bounding box.
+
+        :param cropped_binary_mask: A binary mask of the object cropped to its bounding box, shape [h, w].
+        :param bounding_box: The bounding box of the crop in the image, given as [x, y, width, height].
+        :param image_size: The size of the full image, given as [H, W].
+        :return: The rle in the same format as returned by binary_mask_to_rle() for the full image mask.
+        """
+        height, width = image_size
+        x, y = bounding_box[:2]
+        # Indices of all object pixels in the fortran ordered full image, these are already sorted
+        rows, cols = np.nonzero(cropped_binary_mask.T)[::-1]
+        indices = (cols + x) * height + (rows + y)
+        # A new run of ones starts wherever the indices are not consecutive
+        run_starts = np.concatenate(([0], np.flatnonzero(np.diff(indices) != 1) + 1))
+        run_ends = np.concatenate((run_starts[1:], [len(indices)])) - 1
+        ones_starts = indices[run_starts]
+        ones_ends = indices[run_ends] + 1
+        zeros_lengths = ones_starts - np.concatenate(([0], ones_ends[:-1]))
+        ones_lengths = ones_ends - ones_starts
+        counts = np.stack((zeros_lengths, ones_lengths), axis=1).ravel().tolist()
+        # Add the trailing zeros, a leading zero run of length 0 is kept, as the counts always start with zeros
+        if ones_ends[-1] < height * width:
+            counts.append(int(height * width - ones_ends[-1]))
+        return {'counts': counts, 'size': [height, width]}
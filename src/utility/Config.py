@@ -36,7 +36,7 @@ def has_param(self, name, block=None):
             
         return False
             
-    def _get_value(self, name, block=None, allow_invoke_provider=False, global_check=True):
+    def _get_value(self, name, block=None, allow_invoke_provider=False, global_check=True, batch_size=None):
         """ Returns the value of the parameter with the given name inside the given block.
 
         Basically just a recursive dict lookup, making sure the parameter exists, otherwise an error is thrown.
@@ -44,6 +44,7 @@ def _get_value(self, name, block=None, allow_invoke_provider=False, global_check
         :param name: The name of the parameter. "/" can be used to represent nested parameters (e.q. "render/iterations" results in ["render"]["iterations]
         :param block: A dict containing the configuration. If none, the whole data of this config object will be used.
         :param allow_invoke_provider: If set to True, then a provider is automatically invoked if the parameter value is a dict.
+        :param batch_size: If given, a list of this many values is returned, providers return all of them in one batch.
         :return: The value of the parameter.
         """
         if block is None:
@@ -53,7 +54,8 @@ def _get_value(self, name, block=None, allow_invoke_provider=False, global_check
             delimiter_pos = name.find("/")
             block_name = name[:delimiter_pos]
             if block_name in block and type(block[block_name]) is dict:
-                return self._get_value(name[delimiter_pos + 1:], block[block_name], allow_invoke_provider)
+                return self._get_value(name[delimiter_pos + 1:], block[block_name], allow_invoke_provider,
+                                       batch_size=batch_size)
             else:
                 raise NotFoundError("No such configuration block '" + block_name + "'!")
         else:
@@ -65,12 +67,20 @@ def _get_value(self, name, block=None, allow_invoke_provider=False, global_check
 
                 # If the parameter is set to a provider object, call the provider to return the parameter value
                 if isinstance(block[name], Provider):
-                    return block[name].run()
+                    if batch_size is not None and not block[name].is_pure():
+                        return block[name].run_batch(batch_size)
+                    elif batch_size is not None:
+                        # a pure provider returns the same (cached) result for all of them
+                        return [block[name].get_value() for _ in range(batch_size)]
+                    return block[name].get_value()
+                elif batch_size is not None:
+                    return [block[name]] * batch_size
                 else:
                     return block[name]
             elif global_check and GlobalStorage.has_param(name):
                 # this might also throw an NotFoundError
-                return GlobalStorage.get_global_config()._get_value(name, None, allow_invoke_provider, global_check=False)
+                return GlobalStorage.get_global_config()._get_value(name, None, allow_invoke_provider, global_check=False,
+                                                                    batch_size=batch_size)
             else:
                 raise NotFoundError("No such configuration '" + name + "'!")
             
@@ -112,6 +122,24 @@ def get_raw_value(self, name, fallback=None):
         """
         return self._get_value_with_fallback(name, fallback, True)
 
+    def get_raw_value_batch(self, name, number_of_samples, fallback=None):
+        """ Returns several raw values stored at the given parameter path at once.
+        If a provider is specified at the given parameter path, it returns all samples in one batch, otherwise the
+        raw value is repeated. The values are the same as the ones of calling get_raw_value() number_of_samples times.
+
+        :param name: The name of the parameter. "/" can be used to represent nested parameters (e.q. "render/iterations" results in ["render"]["iterations]
+        :param number_of_samples: The number of values to return.
+        :param fallback: The fallback value, returned if the parameter does not exist.
+        :return: A list of raw values.
+        """
+        try:
+            return self._get_value(name, None, True, batch_size=number_of_samples)
+        except NotFoundError:
+            if fallback is not None:
+                return [fallback] * number_of_samples
+            else:
+                raise
+
     def get_int(self, name, fallback=None):
         """ Returns the integer value stored at the given parameter path.
 
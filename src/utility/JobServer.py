@@ -0,0 +1,109 @@
+import json
+import os
+from multiprocessing.connection import Listener, Client
+
+
+class JobServer:
+    """ A long living blender process, which runs pipeline jobs submitted by a JobServerClient.
+
+    Starting blender, installing the python packages and importing all modules only has to be done once, afterwards
+    every job only costs as much as its pipeline. The server only listens on localhost, the authentication key is
+    written to a file inside a directory, which can only be accessed by the current user ($XDG_RUNTIME_DIR or
+    ~/.cache/blender_proc/servers).
+
+    The jobs are run one after another, so this class only handles the connection, the job itself is run by the
+    given function.
+
+    This class does not depend on bpy, so it can also be used from the run.py outside of blender.
+    """
+
+    def __init__(self, port):
+        """
+        :param port: The port on localhost to listen on.
+        """
+        self._authkey = os.urandom(32)
+        self._listener = Listener(("localhost", port), authkey=self._authkey)
+        self._authkey_path = JobServer.get_authkey_path(port)
+        os.makedirs(os.path.dirname(self._authkey_path), mode=0o700, exist_ok=True)
+        # remove a stale key of a previous server, s.t. the new file is always created with the permissions below
+        if os.path.lexists(self._authkey_path):
+            os.remove(self._authkey_path)
+        with open(os.open(self._authkey_path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600), "w") as f:
+            f.write(self._authkey.hex())
+
+    @staticmethod
+    def get_authkey_path(port):
+        """ Returns the path of the file, where the server stores its authentication key.
+
+        :param port: The port the server listens on.
+        :return: The path to the authentication key file.
+        """
+        # the key must not be readable by other users, so it is never stored in the shared temp dir
+        key_dir = os.environ.get("XDG_RUNTIME_DIR")
+        if not key_dir:
+            key_dir = os.path.join(os.path.expanduser("~"), ".cache", "blender_proc", "servers")
+        return os.path.join(key_dir, "blender_proc_server_{}.key".format(port))
+
+    def serve(self, run_job):
+        """ Accepts connections and runs their jobs until a shutdown is requested.
+
+        :param run_job: A function, which gets the config path and the list of arguments of a job and returns its
+                        exit code.
+        """
+        print("Waiting for jobs on {}:{}".format(*self._listener.address))
+        running = True
+        try:
+            while running:
+                with self._listener.accept() as connection:
+                    # A client can submit several jobs over the same connection
+                    while True:
+                        try:
+                            message = json.loads(connection.recv_bytes().decode())
+                        except (EOFError, OSError):
+                            break
+                        if message["type"] == "shutdown":
+                            connection.send_bytes(json.dumps({"exit_code": 0}).encode())
+                            running = False
+                            break
+                        elif message["type"] == "job":
+                            exit_code = run_job(message["config"], message["args"])
+                            try:
+                                connection.send_bytes(json.dumps({"exit_code": exit_code}).encode())
+                            except OSError:
+                                print("The client of the job disconnected before it was finished")
+                                break
+        finally:
+            self._listener.close()
+            if os.path.exists(self._authkey_path):
+                os.remove(self._authkey_path)
+
+
+class JobServerClient:
+    """ Submits pipeline jobs to a running JobServer. """
+
+    def __init__(self, port):
+        """
+        :param port: The port on localhost the server listens on.
+        """
+        with open(JobServer.get_authkey_path(port), "r") as f:
+            authkey = bytes.fromhex(f.read())
+        self._connection = Client(("localhost", port), authkey=authkey)
+
+    def submit(self, config_path, args):
+        """ Runs the given job on the server and waits until it is finished.
+
+        :param config_path: The path to the config of the job.
+        :param args: The list of arguments used for the placeholders inside the config.
+        :return: The exit code of the job, 0 on success.
+        """
+        self._connection.send_bytes(json.dumps({"type": "job", "config": config_path, "args": args}).encode())
+        return json.loads(self._connection.recv_bytes().decode())["exit_code"]
+
+    def shutdown(self):
+        """ Stops the server after its current job. """
+        self._connection.send_bytes(json.dumps({"type": "shutdown"}).encode())
+        self._connection.recv_bytes()
+
+    def close(self):
+        """ Closes the connection to the server. """
+        self._connection.close()
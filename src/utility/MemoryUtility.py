@@ -0,0 +1,155 @@
+import os
+
+import bpy
+
+
+class MemoryUtility:
+
+    @staticmethod
+    def get_tracked_data_structures():
+        """ Returns all bpy.data collections, whose datablocks are tracked and freed.
+
+        :return: A dict mapping the name of each collection to the collection itself.
+        """
+        return {
+            "meshes": bpy.data.meshes,
+            "materials": bpy.data.materials,
+            "textures": bpy.data.textures,
+            "images": bpy.data.images,
+            "node_groups": bpy.data.node_groups,
+            "brushes": bpy.data.brushes,
+            "cameras": bpy.data.cameras,
+            "actions": bpy.data.actions,
+            "lights": bpy.data.lights
+        }
+
+    @staticmethod
+    def get_rss():
+        """ Returns the current resident set size of this process.
+
+        On systems without /proc the peak resident set size is used instead, if that is also not available 0 is
+        returned.
+
+        :return: The resident set size in bytes.
+        """
+        try:
+            with open("/proc/self/statm", "r") as f:
+                return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+        except (OSError, ValueError, IndexError, AttributeError):
+            pass
+        try:
+            import resource
+            # ru_maxrss is given in bytes on mac os and in kilobytes on all other systems
+            max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+            return max_rss if os.uname().sysname == "Darwin" else max_rss * 1024
+        except ImportError:
+            return 0
+
+    @staticmethod
+    def get_peak_rss():
+        """ Returns the peak resident set size of this process.
+
+        On linux the peak can be reset via reset_peak_rss(), on all other systems it is the peak since the start of
+        the process.
+
+        :return: The peak resident set size in bytes.
+        """
+        try:
+            with open("/proc/self/status", "r") as f:
+                for line in f:
+                    if line.startswith("VmHWM:"):
+                        # the value is given in kB
+                        return int(line.split()[1]) * 1024
+        except (OSError, ValueError, IndexError):
+            pass
+        try:
+            import resource
+            # ru_maxrss is given in bytes on mac os and in kilobytes on all other systems
+            max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+            return max_rss if os.uname().sysname == "Darwin" else max_rss * 1024
+        except ImportError:
+            return 0
+
+    @staticmethod
+    def reset_peak_rss():
+        """ Resets the peak resident set size of this process to the current resident set size.
+
+        This is only supported on linux.
+
+        :return: True, if the peak could be reset.
+        """
+        try:
+            with open("/proc/self/clear_refs", "w") as f:
+                f.write("5")
+            return True
+        except OSError:
+            return False
+
+    @staticmethod
+    def count_datablocks():
+        """ Counts the datablocks in all tracked collections.
+
+        :return: A dict mapping the name of each tracked collection to its number of datablocks.
+        """
+        return {name: len(data_structure) for name, data_structure in
+                MemoryUtility.get_tracked_data_structures().items()}
+
+    @staticmethod
+    def remove_orphan_data(only_these_datablocks=None):
+        """ Removes all datablocks which are not used anymore.
+
+        As removing a datablock can make other datablocks unused, e.g. the images of a removed material, this is
+        repeated until no datablock is removed anymore.
+
+        :param only_these_datablocks: If given, only datablocks with a pointer in this set are removed.
+        :return: The number of removed datablocks.
+        """
+        total_removed = 0
+        removed = True
+        while removed:
+            removed = False
+            for data_structure in MemoryUtility.get_tracked_data_structures().values():
+                for block in list(data_structure):
+                    # If no one uses this block => remove it
+                    if block.users == 0 and (only_these_datablocks is None or
+                                             block.as_pointer() in only_these_datablocks):
+                        data_structure.remove(block)
+                        total_removed += 1
+                        removed = True
+        return total_removed
+
+    class DatablockTracker:
+        """ Tracks all datablocks which are created inside this block and reports the memory growth.
+
+        If free_orphans is set, all datablocks created inside this block, which are not used by anything at the end
+        of it, are removed again. The number of datablocks per tracked collection before and after the block are
+        afterwards available via datablocks_before and datablocks_after, e.g. for the Profiler.
+
+        Usage: with DatablockTracker('name'):
+        """
+        def __init__(self, block_name, free_orphans=False):
+            self.block_name = block_name
+            self.free_orphans = free_orphans
+
+        def __enter__(self):
+            self.start_rss = MemoryUtility.get_rss()
+            self.start_datablocks = set()
+            self.datablocks_before = {}
+            for name, data_structure in MemoryUtility.get_tracked_data_structures().items():
+                self.datablocks_before[name] = len(data_structure)
+                self.start_datablocks.update(block.as_pointer() for block in data_structure)
+            return self
+
+        def __exit__(self, type, value, traceback):
+            new_datablocks = set()
+            for data_structure in MemoryUtility.get_tracked_data_structures().values():
+                new_datablocks.update(block.as_pointer() for block in data_structure)
+            new_datablocks -= self.start_datablocks
+
+            freed = 0
+            if self.free_orphans and new_datablocks:
+                freed = MemoryUtility.remove_orphan_data(new_datablocks)
+            self.datablocks_after = MemoryUtility.count_datablocks()
+            print("Memory - {}: {} new datablocks ({} freed), rss growth: {:.1f} MB".format(
+                self.block_name, len(new_datablocks), freed,
+                (MemoryUtility.get_rss() - self.start_rss) / 1024 ** 2))
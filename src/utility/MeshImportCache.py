@@ -0,0 +1,80 @@
+import hashlib
+import os
+import uuid
+
+import bpy
+
+
+class MeshImportCache:
+    """ A persistent cache, which stores each imported .obj and .ply file once as .blend library.
+
+    Parsing the text based mesh formats is slow, so every imported file is written once as .blend file into the cache
+    directory and all later imports of the same file append the objects from this library instead. The cache entries
+    are content-addressed: they are keyed by the hash of the file content, the import options and the blender version.
+    Changes of files referenced by the mesh (e.g. a .mtl file or textures) are not detected, images are always loaded
+    from their original path.
+
+    The cache is enabled by setting the environment variable BLENDER_PROC_MESH_CACHE_DIR (or via --mesh-cache-dir in
+    the run.py). The directory can be shared between many jobs.
+    """
+
+    # Name of the environment variable, which contains the directory the cached meshes are stored in
+    ENV_NAME = "BLENDER_PROC_MESH_CACHE_DIR"
+
+    @staticmethod
+    def is_enabled():
+        """ Checks if the cache is enabled.
+
+        :return: True, if a cache directory is set.
+        """
+        return bool(os.environ.get(MeshImportCache.ENV_NAME))
+
+    @staticmethod
+    def get_cache_path(filepath, import_options):
+        """ Returns the path of the cache entry for the given file and import options.
+
+        :param filepath: The path to the .obj or .ply file.
+        :param import_options: The options handed to the bpy import operator. Type: dict.
+        :return: The path to the .blend file of the cache entry.
+        """
+        file_hash = hashlib.sha1()
+        with open(filepath, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                file_hash.update(chunk)
+        key = hashlib.sha1("{}|{}|{}".format(file_hash.hexdigest(), sorted(import_options.items()),
+                                             bpy.app.version_string).encode()).hexdigest()
+        return os.path.join(os.environ[MeshImportCache.ENV_NAME], key[:2], key + ".blend")
+
+    @staticmethod
+    def load(cache_path):
+        """ Appends all objects of the given cache entry to the scene.
+
+        :param cache_path: The path of the cache entry.
+        :return: The list of appended objects or None, if the entry does not exist.
+        """
+        if not os.path.exists(cache_path):
+            return None
+        with bpy.data.libraries.load(cache_path, link=False) as (data_from, data_to):
+            data_to.objects = data_from.objects
+        for obj in data_to.objects:
+            bpy.context.collection.objects.link(obj)
+            obj.select_set(True)
+        return list(data_to.objects)
+
+    @staticmethod
+    def store(cache_path, objects):
+        """ Writes the given objects together with their meshes and materials as new cache entry.
+
+        :param cache_path: The path of the cache entry.
+        :param objects: The imported objects.
+        """
+        os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+        # another job might write the same entry at the same time, so the file is only moved in place when finished
+        temp_path = "{}.{}.tmp.blend".format(cache_path, uuid.uuid4().hex)
+        try:
+            bpy.data.libraries.write(temp_path, set(objects), path_remap="ABSOLUTE")
+            os.replace(temp_path, cache_path)
+        except (OSError, RuntimeError) as e:
+            print("Warning: The imported objects could not be cached in {}: {}".format(cache_path, e))
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
@@ -0,0 +1,165 @@
+import json
+import os
+import time
+import uuid
+
+from src.utility.MemoryUtility import MemoryUtility
+
+
+class Profiler:
+    """ Records structured timing and memory information for the pipeline and each of its modules.
+
+    The profiler is enabled by setting the environment variable BLENDER_PROC_PROFILE_DIR (or via --profile-dir in the
+    run.py). After each pipeline run two files are written into that directory:
+     - <run_id>.jsonl: one json line per profiled block
+     - <run_id>_trace.json: a chrome trace-event file, which can be opened in chrome://tracing or perfetto
+
+    For each block the wall and cpu time, the peak resident set size and optionally the datablock counts before and
+    after it, as determined by a MemoryUtility.DatablockTracker, are recorded. The time spent in "render" blocks is
+    summed up for all enclosing blocks, s.t. the render time of each module can be split from its pre- and
+    post-processing.
+
+    Many runs can be merged into percentile tables via scripts/aggregate_profiles.py.
+    """
+
+    # Name of the environment variable, which contains the directory the profiles are written to
+    ENV_NAME = "BLENDER_PROC_PROFILE_DIR"
+
+    # the records of all blocks finished during the current run
+    _records = []
+
+    # the currently open blocks, the innermost one is the last
+    _open_blocks = []
+
+    # the start of the current run, all trace events are relative to it
+    _run_start = None
+
+    @staticmethod
+    def is_enabled():
+        """ Checks if profiling is enabled.
+
+        :return: True, if a profile directory is set.
+        """
+        return bool(os.environ.get(Profiler.ENV_NAME))
+
+    @staticmethod
+    def start_run():
+        """ Removes all records of the previous run and starts a new one. """
+        Profiler._records = []
+        Profiler._open_blocks = []
+        Profiler._run_start = time.perf_counter()
+
+    @staticmethod
+    def write_run(config_path):
+        """ Writes all records of the current run as json lines and as chrome trace into the profile directory.
+
+        :param config_path: The path to the config of the run, it is stored in every record.
+        :return: The path of the written json lines file or None, if profiling is disabled.
+        """
+        if not Profiler.is_enabled() or Profiler._run_start is None:
+            return None
+        profile_dir = os.environ[Profiler.ENV_NAME]
+        os.makedirs(profile_dir, exist_ok=True)
+        run_id = "{}_{}_{}".format(time.strftime("%Y%m%d-%H%M%S"), os.getpid(), uuid.uuid4().hex[:8])
+
+        jsonl_path = os.path.join(profile_dir, run_id + ".jsonl")
+        with open(jsonl_path, "w") as f:
+            for record in Profiler._records:
+                f.write(json.dumps(dict(record, run_id=run_id, config=config_path)) + "\n")
+
+        trace_events = []
+        for record in Profiler._records:
+            trace_events.append({
+                "name": record["name"],
+                "cat": record["category"],
+                "ph": "X",
+                "ts": record["start"] * 1e6,
+                "dur": record["wall_time"] * 1e6,
+                "pid": os.getpid(),
+                "tid": 0,
+                "args": {key: value for key, value in record.items() if key not in ["name", "category", "start"]}
+            })
+        with open(os.path.join(profile_dir, run_id + "_trace.json"), "w") as f:
+            json.dump({"traceEvents": trace_events, "displayTimeUnit": "ms",
+                       "otherData": {"run_id": run_id, "config": config_path}}, f)
+        print("Wrote profile to " + jsonl_path)
+        return jsonl_path
+
+    class Block:
+        """ Profiles the code inside this block, if profiling is enabled.
+
+        Usage: with Profiler.Block('name', 'category'):
+        """
+        def __init__(self, name, category, datablock_tracker=None):
+            """
+            :param name: The name of the block, e.g. the module name.
+            :param category: The category of the block, e.g. "pipeline", "module" or "render".
+            :param datablock_tracker: An optional MemoryUtility.DatablockTracker, which is entered and exited together
+                                      with this block, even if profiling is disabled. Its datablock counts before and
+                                      after the block are recorded.
+            """
+            self.name = name
+            self.category = category
+            self.datablock_tracker = datablock_tracker
+            self._enabled = Profiler.is_enabled()
+
+        def __enter__(self):
+            if not self._enabled:
+                if self.datablock_tracker is not None:
+                    self.datablock_tracker.__enter__()
+                return self
+            if Profiler._run_start is None:
+                Profiler.start_run()
+            self.render_time = 0.0
+            self.peak_rss = 0
+            self._update_peak_of_open_blocks()
+            Profiler._open_blocks.append(self)
+            if self.datablock_tracker is not None:
+                self.datablock_tracker.__enter__()
+            self.rss_before = MemoryUtility.get_rss()
+            self.start = time.perf_counter()
+            self.start_cpu = time.process_time()
+            return self
+
+        @staticmethod
+        def _update_peak_of_open_blocks():
+            """ Adds the peak memory since the last reset to all open blocks and resets the peak. """
+            peak_rss = MemoryUtility.get_peak_rss()
+            for block in Profiler._open_blocks:
+                block.peak_rss = max(block.peak_rss, peak_rss)
+            MemoryUtility.reset_peak_rss()
+
+        def __exit__(self, type, value, traceback):
+            if self.datablock_tracker is not None:
+                self.datablock_tracker.__exit__(type, value, traceback)
+            if not self._enabled:
+                return
+            wall_time = time.perf_counter() - self.start
+            cpu_time = time.process_time() - self.start_cpu
+            self._update_peak_of_open_blocks()
+            Profiler._open_blocks.remove(self)
+
+            if self.category == "render":
+                # the render time is split from the rest of all enclosing blocks
+                for block in Profiler._open_blocks:
+                    block.render_time += wall_time
+                self.render_time = wall_time
+
+            record = {
+                "name": self.name,
+                "category": self.category,
+                "depth": len(Profiler._open_blocks),
+                "start": self.start - Profiler._run_start,
+                "wall_time": wall_time,
+                "cpu_time": cpu_time,
+                "render_time": self.render_time,
+                "post_processing_time": wall_time - self.render_time,
+                "peak_rss": self.peak_rss,
+                "rss_before": self.rss_before,
+                "rss_after": MemoryUtility.get_rss(),
+                "failed": type is not None
+            }
+            if self.datablock_tracker is not None:
+                record["datablocks_before"] = self.datablock_tracker.datablocks_before
+                record["datablocks_after"] = self.datablock_tracker.datablocks_after
+            Profiler._records.append(record)
@@ -0,0 +1,82 @@
+import bpy
+import numpy as np
+
+
+class RayCastUtility:
+
+    @staticmethod
+    def get_frustum_ray_directions(cam, cam2world_matrix, sqrt_number_of_rays):
+        """ Computes the directions of a regular grid of rays, which are sent from the camera position through its
+        near plane.
+
+        The rays are ordered like the grid is traversed in the nested loop: for x: for y:
+
+        :param cam: The camera whose view frame is used (only FOV is relevant, pose of cam is ignored).
+        :param cam2world_matrix: Transformation matrix that transforms from the camera space to the world space.
+        :param sqrt_number_of_rays: The number of rays along each side of the near plane.
+        :return: The world space directions of all rays. Type: np.array of shape [sqrt_number_of_rays ** 2, 3].
+        """
+        # Get position of the corners of the near plane in camera space
+        frame = np.array([list(corner) for corner in cam.view_frame(scene=bpy.context.scene)])
+        steps = np.linspace(0.0, 1.0, sqrt_number_of_rays)
+        x, y = np.meshgrid(steps, steps, indexing="ij")
+        # Go in discrete grid-like steps over the plane
+        points = frame[0] + x.reshape(-1, 1) * (frame[1] - frame[0]) + y.reshape(-1, 1) * (frame[3] - frame[0])
+        # The camera position cancels out, so only the rotation (and scale) of the pose has to be applied
+        return points @ np.array(cam2world_matrix.to_3x3()).T
+
+    @staticmethod
+    def get_coarse_to_fine_order(sqrt_number_of_rays):
+        """ Returns an order of the grid rays, which first covers the whole grid coarsely and then refines it.
+
+        Checks which stop at the first violating ray find large obstacles after a few rays this way, instead of
+        going line by line through the grid.
+
+        :param sqrt_number_of_rays: The number of rays along each side of the grid.
+        :return: The indices of all rays in the order they should be cast. Type: np.array.
+        """
+        # the level of a coordinate is the number of times it can be divided by two, zero is on the coarsest level
+        levels = np.array([(i & -i).bit_length() if i > 0 else sqrt_number_of_rays.bit_length() + 1
+                           for i in range(sqrt_number_of_rays)])
+        ray_levels = np.minimum.outer(levels, levels).reshape(-1)
+        return np.argsort(-ray_levels, kind="stable")
+
+    @staticmethod
+    def cast_rays(bvh_tree, origin, directions, max_distance=None, order=None):
+        """ Casts all given rays against the bvh tree.
+
+        The rays are cast lazily, so the caller can stop as soon as a ray hits something it is not allowed to hit.
+
+        :param bvh_tree: The bvh tree to cast against.
+        :param origin: The origin of all rays.
+        :param directions: The direction of each ray. Type: np.array of shape [N, 3].
+        :param max_distance: The maximum distance of a hit. If None, the distance is not limited.
+        :param order: The order in which the rays are cast. If None, they are cast in the given order.
+        :return: A generator yielding for each ray its index, location, normal, face index and distance. If nothing
+                 was hit, all values except the index are None.
+        """
+        direction_list = directions.tolist()
+        if order is None:
+            order = range(len(direction_list))
+        for ray_index in order:
+            if max_distance is None:
+                location, normal, face_index, dist = bvh_tree.ray_cast(origin, direction_list[ray_index])
+            else:
+                location, normal, face_index, dist = bvh_tree.ray_cast(origin, direction_list[ray_index],
+                                                                       max_distance)
+            yield ray_index, location, normal, face_index, dist
+
+    @staticmethod
+    def cast_rays_in_scene(origin, directions):
+        """ Casts all given rays against the evaluated scene and returns the hit objects.
+
+        :param origin: The origin of all rays.
+        :param directions: The direction of each ray. Type: np.array of shape [N, 3].
+        :return: For each ray the hit object or None, if nothing was hit.
+        """
+        depsgraph = bpy.context.view_layer.depsgraph
+        hit_objects = []
+        for direction in directions.tolist():
+            hit, _, _, _, hit_object, _ = bpy.context.scene.ray_cast(depsgraph, origin, direction)
+            hit_objects.append(hit_object if hit else None)
+        return hit_objects
@@ -0,0 +1,135 @@
+import numpy as np
+
+
+class SpatialHashGrid:
+    """ A broad phase for collision checks, which sorts world-space axis-aligned bounding boxes into a uniform grid.
+
+    Only entries which share at least one grid cell with the query box are tested for an overlap, so a query only
+    costs as much as the number of entries in its neighbourhood and not the number of all entries.
+
+    Entries, which would span too many cells, are kept in a separate list and are tested with every query.
+    """
+
+    def __init__(self, cell_size=None, max_cells_per_axis=8):
+        """
+        :param cell_size: The edge length of one grid cell. If None, the largest extent of the first inserted box is
+                          used.
+        :param max_cells_per_axis: Entries spanning more cells along one axis are not sorted into the grid.
+        """
+        self.cell_size = cell_size
+        self.max_cells_per_axis = max_cells_per_axis
+        self._cells = {}
+        self._boxes = {}
+        self._large_entries = []
+        # used to return the candidates in the order they were inserted
+        self._insertion_index = {}
+        self._next_insertion_index = 0
+
+    @staticmethod
+    def get_world_aabb(obj, matrix_world=None):
+        """ Returns the world-space axis-aligned bounding box of the given object.
+
+        :param obj: The mesh object.
+        :param matrix_world: The world matrix to use. If None, the current matrix_world of the object is used.
+        :return: The minimum and the maximum point of the box. Type: np.array, np.array.
+        """
+        if matrix_world is None:
+            matrix_world = obj.matrix_world
+        matrix_world = np.array(matrix_world)
+        corners = np.array([list(corner) for corner in obj.bound_box]) @ matrix_world[:3, :3].T + matrix_world[:3, 3]
+        return np.min(corners, axis=0), np.max(corners, axis=0)
+
+    def _cell_range(self, aabb_min, aabb_max):
+        """ Returns the range of grid cells covered by the given box.
+
+        :param aabb_min: The minimum point of the box.
+        :param aabb_max: The maximum point of the box.
+        :return: The minimum and maximum cell index along each axis. Type: np.array, np.array.
+        """
+        min_cell = np.floor(aabb_min / self.cell_size).astype(np.int64)
+        max_cell = np.floor(aabb_max / self.cell_size).astype(np.int64)
+        return min_cell, max_cell
+
+    def _covered_cells(self, aabb_min, aabb_max):
+        """ Returns all grid cells covered by the given box.
+
+        :param aabb_min: The minimum point of the box.
+        :param aabb_max: The maximum point of the box.
+        :return: A list of cell indices or None, if the box spans too many cells.
+        """
+        min_cell, max_cell = self._cell_range(aabb_min, aabb_max)
+        if np.any(max_cell - min_cell >= self.max_cells_per_axis):
+            return None
+        return [(x, y, z) for x in range(min_cell[0], max_cell[0] + 1)
+                for y in range(min_cell[1], max_cell[1] + 1)
+                for z in range(min_cell[2], max_cell[2] + 1)]
+
+    def insert(self, key, aabb_min, aabb_max):
+        """ Adds a new entry to the grid.
+
+        :param key: The key of the entry, e.g. the object.
+        :param aabb_min: The minimum point of the box of the entry.
+        :param aabb_max: The maximum point of the box of the entry.
+        """
+        if key in self._boxes:
+            self.remove(key)
+        if self.cell_size is None:
+            # the size of the first object is a good guess for the size of all objects
+            self.cell_size = max(float(np.max(aabb_max - aabb_min)), 1e-4)
+        self._boxes[key] = (np.array(aabb_min), np.array(aabb_max))
+        self._insertion_index[key] = self._next_insertion_index
+        self._next_insertion_index += 1
+        cells = self._covered_cells(aabb_min, aabb_max)
+        if cells is None:
+            self._large_entries.append(key)
+        else:
+            for cell in cells:
+                self._cells.setdefault(cell, []).append(key)
+
+    def remove(self, key):
+        """ Removes the entry with the given key from the grid.
+
+        :param key: The key of the entry.
+        """
+        aabb_min, aabb_max = self._boxes.pop(key)
+        del self._insertion_index[key]
+        cells = self._covered_cells(aabb_min, aabb_max)
+        if cells is None:
+            self._large_entries.remove(key)
+        else:
+            for cell in cells:
+                self._cells[cell].remove(key)
+                if not self._cells[cell]:
+                    del self._cells[cell]
+
+    def query(self, aabb_min, aabb_max):
+        """ Returns all entries, whose box overlaps with the given box.
+
+        :param aabb_min: The minimum point of the query box.
+        :param aabb_max: The maximum point of the query box.
+        :return: The keys of all overlapping entries in the order they were inserted.
+        """
+        if not self._boxes:
+            return []
+        candidates = set(self._large_entries)
+        min_cell, max_cell = self._cell_range(aabb_min, aabb_max)
+        num_cells = int(np.prod(max_cell - min_cell + 1))
+        if num_cells > len(self._cells):
+            # the query box is huge, so rather go over all occupied cells
+            for cell, keys in self._cells.items():
+                if all(min_cell[i] <= cell[i] <= max_cell[i] for i in range(3)):
+                    candidates.update(keys)
+        else:
+            for x in range(min_cell[0], max_cell[0] + 1):
+                for y in range(min_cell[1], max_cell[1] + 1):
+                    for z in range(min_cell[2], max_cell[2] + 1):
+                        candidates.update(self._cells.get((x, y, z), []))
+
+        overlapping = []
+        for key in candidates:
+            other_min, other_max = self._boxes[key]
+            # Checks in each dimension, if there is an overlap if this happens it must be an overlap in 3D, too.
+            if np.all(aabb_max >= other_min) and np.all(other_max >= aabb_min):
+                overlapping.append(key)
+        overlapping.sort(key=lambda key: self._insertion_index[key])
+        return overlapping
@@ -6,6 +6,7 @@
 import inspect
 import importlib
 from src.utility.Config import Config
+from src.utility.MeshImportCache import MeshImportCache
 from mathutils import Matrix, Vector
 import numpy as np
 
@@ -375,6 +376,9 @@ def import_objects(filepath, cached_objects=None, **kwargs):
         In .obj files a list of objects can be saved in.
         In .ply files only one object can saved so the list has always at most one element
 
+        If the MeshImportCache is enabled, .obj and .ply files are only parsed once and appended from the cache
+        afterwards.
+
         :param filepath: the filepath to the location where the data is stored
         :param cached_objects: a dict of filepath to objects, which have been loaded before, to avoid reloading (the dict is updated in this function)
         :param kwargs: all other params are handed directly to the bpy loading fct. check the corresponding documentation
@@ -399,6 +403,14 @@ def import_objects(filepath, cached_objects=None, **kwargs):
                     cached_objects[filepath] = loaded_objects
                     return loaded_objects
             else:
+                # check if the file has already been imported in this or in an earlier run
+                cache_path = None
+                if MeshImportCache.is_enabled() and (filepath.endswith('.obj') or filepath.endswith('.ply')):
+                    cache_path = MeshImportCache.get_cache_path(filepath, kwargs)
+                    objects_from_cache = MeshImportCache.load(cache_path)
+                    if objects_from_cache is not None:
+                        return objects_from_cache
+
                 # save all selected objects
                 previously_selected_objects = set(bpy.context.selected_objects)
                 if filepath.endswith('.obj'):
@@ -415,6 +427,9 @@ def import_objects(filepath, cached_objects=None, **kwargs):
                         obj.data.materials.append(mat)
 
                 # return all currently selected objects
-                return list(set(bpy.context.selected_objects) - previously_selected_objects)
+                loaded_objects = list(set(bpy.context.selected_objects) - previously_selected_objects)
+                if cache_path is not None:
+                    MeshImportCache.store(cache_path, loaded_objects)
+                return loaded_objects
         else:
             raise Exception("The given filepath does not exist: {}".format(filepath))
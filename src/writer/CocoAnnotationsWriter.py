@@ -32,7 +32,19 @@ class CocoAnnotationsWriter(WriterInterface):
                                     "the rgb images will be named such that there are no collisions. Type: bool. "
                                     "Default: False."
        "mask_encoding_format", "Encoding format of the binary masks. "
-                               "Type: string. Default: 'rle'. Available: 'rle', 'polygon'."
+                               "Type: string. Default: 'rle'. Available: 'rle', 'compressed_rle', 'polygon'. "
+                               "'compressed_rle' stores the rle counts as string, like pycocotools does."
+       "write_shards", "If true, the annotations of each run are written into a separate shard file in "
+                       "coco_data/shards and only a small index file is updated, instead of rewriting the whole "
+                       "coco_annotations.json. Combined with append_to_existing_output, appending then only costs "
+                       "as much as the new batch. Use scripts/compact_coco_annotations.py to merge all shards into "
+                       "one coco_annotations.json. Without append_to_existing_output, all shards of previous runs "
+                       "are removed. Appending is not safe if several processes write into the same output "
+                       "directory at the same time, as the index is updated without locking. Type: bool. "
+                       "Default: False."
+       "num_workers", "The number of processes used to generate the annotations of the frames in parallel. The "
+                      "resulting annotations and their ids do not depend on this. The workers are forked, on platforms "
+                      "without fork (e.g. Windows) the frames are processed sequentially. Type: int. Default: 1."
     """
 
     def __init__(self, config):
@@ -45,6 +57,8 @@ def __init__(self, config):
         self.segcolormap_output_key = self.config.get_string("segcolormap_output_key", "segcolormap")
         self._coco_data_dir = os.path.join(self._determine_output_dir(False), 'coco_data')
         self.mask_encoding_format = self.config.get_string("mask_encoding_format", "rle")
+        self._write_shards = self.config.get_bool("write_shards", False)
+        self._num_workers = self.config.get_int("num_workers", 1)
         if not os.path.exists(self._coco_data_dir):
             os.makedirs(self._coco_data_dir)
 
@@ -89,8 +103,19 @@ def run(self):
                 inst_attribute_maps.append(mapping)
 
         coco_annotations_path = os.path.join(self._coco_data_dir, "coco_annotations.json")
+        shard_index = None
         # Calculate image numbering offset, if append_to_existing_output is activated and coco data exists
-        if self.config.get_bool("append_to_existing_output", False) and os.path.exists(coco_annotations_path):
+        if self._write_shards:
+            # only the small shard index is read, the existing annotations are never loaded
+            if self.config.get_bool("append_to_existing_output", False):
+                shard_index = CocoUtility.load_coco_shard_index(self._coco_data_dir)
+            else:
+                # the shards of previous runs would not be part of the new index anymore
+                CocoUtility.remove_coco_shards(self._coco_data_dir)
+                shard_index = CocoUtility.create_coco_shard_index()
+            image_offset = shard_index["next_image_id"]
+            existing_coco_annotations = None
+        elif self.config.get_bool("append_to_existing_output", False) and os.path.exists(coco_annotations_path):
             with open(coco_annotations_path, 'r') as fp:
                 existing_coco_annotations = json.load(fp)
             image_offset = max([image["id"] for image in existing_coco_annotations["images"]]) + 1
@@ -115,8 +140,13 @@ def run(self):
                                                             inst_attribute_maps,
                                                             self._supercategory,
                                                             self.mask_encoding_format,
-                                                            existing_coco_annotations)
+                                                            existing_coco_annotations,
+                                                            self._num_workers)
 
-        print("Writing coco annotations to " + coco_annotations_path)
-        with open(coco_annotations_path, 'w') as fp:
-            json.dump(coco_output, fp)
+        if self._write_shards:
+            shard_path = CocoUtility.append_coco_shard(self._coco_data_dir, coco_output, shard_index)
+            print("Writing coco annotations shard to " + shard_path)
+        else:
+            print("Writing coco annotations to " + coco_annotations_path)
+            with open(coco_annotations_path, 'w') as fp:
+                json.dump(coco_output, fp)
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# The tests import the modules the same way the run.py does, via the src package in the repository root
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
@@ -0,0 +1,43 @@
+""" Checks that the polygons created from the crop of an instance match the ones created from the full mask.
+
+Only numpy, scipy and scikit-image are needed, so these tests can be run without blender.
+"""
+
+import numpy as np
+from skimage import measure
+
+from src.utility.CocoUtility import CocoUtility
+
+
+def full_frame_polygons(binary_mask, tolerance):
+    """ The polygon encoding on the full image mask, as it was done before the masks were cropped. """
+    polygons = []
+    padded_binary_mask = np.pad(binary_mask, pad_width=1, mode='constant', constant_values=0)
+    for contour in measure.find_contours(padded_binary_mask, 0.5):
+        contour = CocoUtility.close_contour(contour - 1)
+        polygon = measure.approximate_polygon(contour, tolerance)
+        if len(polygon) < 3:
+            continue
+        polygon = np.flip(polygon, axis=1).ravel()
+        polygon[polygon < 0] = 0
+        polygons.append(polygon.tolist())
+    return polygons
+
+
+def test_cropped_polygons_match_full_frame_polygons():
+    rng = np.random.default_rng(0)
+    for _ in range(200):
+        height, width = rng.integers(5, 60, 2)
+        binary_mask = (rng.random((height, width)) < rng.uniform(0.05, 0.9)).astype(np.uint8)
+        if binary_mask.sum() == 0:
+            continue
+        annotation = CocoUtility.create_annotation_info(0, 0, 1, binary_mask, "polygon")
+        assert annotation["segmentation"] == full_frame_polygons(binary_mask, 2)
+
+
+def test_polygons_of_object_at_image_border():
+    binary_mask = np.zeros((20, 30), dtype=np.uint8)
+    binary_mask[0:5, 25:30] = 1
+    binary_mask[12:20, 0:3] = 1
+    annotation = CocoUtility.create_annotation_info(0, 0, 1, binary_mask, "polygon")
+    assert annotation["segmentation"] == full_frame_polygons(binary_mask, 2)
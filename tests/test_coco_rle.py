@@ -0,0 +1,80 @@
+""" Checks the vectorized rle encoding against the previous encoder and the decoding against the encoding.
+
+Only numpy, scipy and scikit-image are needed, so these tests can be run without blender.
+"""
+
+from itertools import groupby
+
+import numpy as np
+import pytest
+
+from src.utility.CocoUtility import CocoUtility
+
+
+def groupby_binary_mask_to_rle(binary_mask):
+    """ The rle encoder, which was used before the encoding was vectorized. """
+    rle = {'counts': [], 'size': list(binary_mask.shape)}
+    counts = rle.get('counts')
+    for i, (value, elements) in enumerate(groupby(binary_mask.ravel(order='F'))):
+        if i == 0 and value == 1:
+            counts.append(0)
+        counts.append(len(list(elements)))
+    return rle
+
+
+def get_test_masks():
+    """ Returns random masks and edge cases like empty and full masks and masks starting with a 1. """
+    masks = [np.zeros((7, 5), dtype=np.uint8), np.ones((7, 5), dtype=np.uint8), np.ones((1, 1), dtype=np.uint8),
+             np.zeros((1, 1), dtype=np.uint8)]
+    starts_with_one = np.zeros((6, 9), dtype=np.uint8)
+    starts_with_one[0, 0] = 1
+    starts_with_one[3:, 4:] = 1
+    masks.append(starts_with_one)
+    ends_with_one = np.zeros((6, 9), dtype=np.uint8)
+    ends_with_one[-1, -1] = 1
+    masks.append(ends_with_one)
+
+    rng = np.random.default_rng(0)
+    for _ in range(200):
+        height, width = rng.integers(1, 40, 2)
+        masks.append((rng.random((height, width)) < rng.uniform(0.0, 1.0)).astype(np.uint8))
+    return masks
+
+
+def test_rle_matches_groupby_encoder():
+    for binary_mask in get_test_masks():
+        assert CocoUtility.binary_mask_to_rle(binary_mask) == groupby_binary_mask_to_rle(binary_mask)
+
+
+def test_cropped_rle_matches_groupby_encoder():
+    for binary_mask in get_test_masks():
+        if binary_mask.sum() == 0:
+            # empty masks get no annotation
+            continue
+        x, y, w, h = CocoUtility.bbox_from_binary_mask(binary_mask)
+        rle = CocoUtility.cropped_binary_mask_to_rle(binary_mask[y:y + h, x:x + w], [x, y, w, h], binary_mask.shape)
+        assert rle == groupby_binary_mask_to_rle(binary_mask)
+
+
+def test_rle_round_trip():
+    for binary_mask in get_test_masks():
+        rle = CocoUtility.binary_mask_to_rle(binary_mask)
+        assert np.array_equal(CocoUtility.rle_to_binary_mask(rle), binary_mask)
+
+
+def test_compressed_rle_round_trip():
+    for binary_mask in get_test_masks():
+        rle = CocoUtility.binary_mask_to_rle(binary_mask)
+        compressed_counts = CocoUtility.rle_counts_to_string(rle['counts'])
+        assert isinstance(compressed_counts, str)
+        assert CocoUtility.rle_string_to_counts(compressed_counts) == rle['counts']
+        compressed_rle = {'counts': compressed_counts, 'size': rle['size']}
+        assert np.array_equal(CocoUtility.rle_to_binary_mask(compressed_rle), binary_mask)
+
+
+def test_compressed_counts_match_pycocotools():
+    mask_utils = pytest.importorskip("pycocotools.mask")
+    for binary_mask in get_test_masks():
+        counts = CocoUtility.binary_mask_to_rle(binary_mask)['counts']
+        expected = mask_utils.encode(np.asfortranarray(binary_mask))['counts'].decode()
+        assert CocoUtility.rle_counts_to_string(counts) == expected